@@ -11,6 +11,12 @@ python manage.py collectstatic --no-input
 # Apply database migrations
 python manage.py migrate
 
+# Index lesson content for search (it is also updated whenever content changes)
+python manage.py rebuild_search_index
+
+# Snapshot the lesson catalog (it is also rebuilt whenever content changes)
+python manage.py build_catalog
+
 # Create superuser (or ignore if it already exists)
 # The "|| true" part prevents the build from crashing if the admin already exists
 python manage.py createsuperuser --noinput || true
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""
+Gunicorn configuration for production serving.
+Usage: gunicorn hindpesh_backend.wsgi:application
+       (run from this directory; gunicorn picks up ./gunicorn.conf.py by itself)
+
+- The Django app is imported once in the master (preload_app) and the
+  master's heap is frozen with gc.freeze() before each fork, so the garbage
+  collector in the workers never touches (and copies) the shared pages.
+- Workers and threads are sized from the CPUs this container may use.
+- max_requests with jitter recycles workers gradually, never all at once.
+- `kill -HUP <master pid>` re-reads this file, starts fresh workers and
+  gracefully stops the old ones. Because the app is preloaded, new code is
+  only picked up by a full restart (or `kill -USR2` + `kill -QUIT` of the old master).
+
+Every setting can be overridden from the environment (see below) or the command line.
+"""
+import gc
+import math
+import os
+
+
+def available_cpus():
+    """CPUs usable by this process, honoring the affinity mask and a cgroup v2 CPU quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+
+workers = int(os.environ.get('GUNICORN_WORKERS', 2 * available_cpus() + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 2))
+# gunicorn switches to the gthread worker by itself when threads > 1
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+
+preload_app = True
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far (the preloaded app) into the permanent
+    # generation so it stays shared copy-on-write with the children
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Never share a database connection opened while preloading
+    from django.db import connections
+    connections.close_all()
@@ -3,6 +3,9 @@ ASGI config for hindpesh_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Run it with an ASGI server, e.g.:
+    uvicorn hindpesh_backend.asgi:application --workers 4
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
@@ -12,6 +15,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hindpesh_backend.settings')
+# Serve the I/O-bound endpoints through their async views
+os.environ.setdefault('ROOT_URLCONF', 'hindpesh_backend.asgi_urls')
 
 application = get_asgi_application()
 
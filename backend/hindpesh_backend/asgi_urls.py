@@ -0,0 +1,16 @@
+"""
+URL configuration used when serving over ASGI.
+
+Routes the I/O-bound endpoints to their async views and falls back to the
+regular URL configuration for everything else.
+"""
+from django.urls import path, include
+from lessons import async_views
+
+urlpatterns = [
+    path('api/lessons/', async_views.lesson_list),
+    path('api/lessons/login/', async_views.password_login),
+    path('api/lessons/<int:pk>/', async_views.lesson_detail),
+    path('api/auth/google/', async_views.google_login),
+    path('', include('hindpesh_backend.urls')),
+]
@@ -2,6 +2,7 @@
 Django settings for hindpesh_backend project.
 """
 
+from datetime import timedelta
 from pathlib import Path
 from decouple import config
 import os
@@ -40,8 +41,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its total covers every other middleware
+    'lessons.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # WhiteNoise, plus the catalog snapshot bundles (see lessons/catalog.py)
+    'lessons.catalog.CatalogWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,7 +55,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'hindpesh_backend.urls'
+# hindpesh_backend/asgi.py switches this to hindpesh_backend.asgi_urls
+ROOT_URLCONF = config('ROOT_URLCONF', default='hindpesh_backend.urls')
 
 TEMPLATES = [
     {
@@ -83,6 +88,23 @@ DATABASES = {
 }
 
 
+# Cache
+# Defaults to a per-process in-memory cache. Point CACHE_BACKEND/CACHE_LOCATION at a
+# shared backend (e.g. Redis or Memcached) when running several worker processes so
+# that cached payloads are shared and quiz and JWT invalidations reach every worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='hindpesh'),
+    }
+}
+
+# Seconds a serialized lesson payload may stay cached (entries are keyed by
+# the content version, so an edit moves readers to a new entry)
+LESSON_CACHE_TIMEOUT = config('LESSON_CACHE_TIMEOUT', default=300, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -130,7 +152,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'lessons.authentication.CachedTokenAuthentication',
+        'lessons.authentication.StatelessJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -139,6 +162,49 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 100,
 }
 
+# In-process cache of authenticated API tokens (see lessons/authentication.py):
+# seconds an entry may be reused and the maximum number of entries
+TOKEN_AUTH_CACHE_TTL = config('TOKEN_AUTH_CACHE_TTL', default=60, cast=int)
+TOKEN_AUTH_CACHE_SIZE = config('TOKEN_AUTH_CACHE_SIZE', default=10000, cast=int)
+
+# In-process cache of quiz answer keys (see lessons/quiz.py): seconds an
+# entry may be reused without seeing other processes' edits and the maximum
+# number of lessons kept
+QUIZ_ANSWER_KEY_CACHE_TTL = config('QUIZ_ANSWER_KEY_CACHE_TTL', default=300, cast=int)
+QUIZ_ANSWER_KEY_CACHE_SIZE = config('QUIZ_ANSWER_KEY_CACHE_SIZE', default=1000, cast=int)
+
+# JWTs (Authorization: Bearer <access>) issued by Google sign-in, by the login
+# endpoint with "token_type": "jwt", and by /api/auth/token/refresh/
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=config('JWT_ACCESS_TOKEN_MINUTES', default=15, cast=int)),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=config('JWT_REFRESH_TOKEN_DAYS', default=7, cast=int)),
+    'AUTH_HEADER_TYPES': ('Bearer',),
+}
+# Longest a process keeps accepting a revoked JWT access token when the cache
+# backend is not shared (refresh tokens are checked against the database)
+JWT_REVOCATION_RELOAD_INTERVAL = config('JWT_REVOCATION_RELOAD_INTERVAL', default=5, cast=float)
+
+# Credentials returned by POST /api/lessons/login/ when the body has no token_type:
+# 'token' (DRF token) or 'jwt'
+LOGIN_TOKEN_TYPE = config('LOGIN_TOKEN_TYPE', default='token')
+
+# Default pagination mode of the lesson/file endpoints: 'page' or 'cursor'
+# (clients can pick per request with ?pagination=page|cursor)
+LESSON_PAGINATION_MODE = config('LESSON_PAGINATION_MODE', default='page')
+
+# Write-behind buffering of UserProgress.last_accessed touches:
+# the longest a touch may wait before it is written, and the number of distinct
+# (user, lesson) touches held before an immediate flush
+LAST_ACCESSED_MAX_STALENESS = config('LAST_ACCESSED_MAX_STALENESS', default=30, cast=float)
+LAST_ACCESSED_BUFFER_SIZE = config('LAST_ACCESSED_BUFFER_SIZE', default=10000, cast=int)
+
+# Per-request instrumentation (see lessons/timing.py): whether responses carry a
+# Server-Timing header, and the durations above which requests and single
+# queries are logged with their view name and SQL
+SERVER_TIMING_HEADER = config('SERVER_TIMING_HEADER', default=True, cast=bool)
+SLOW_REQUEST_MS = config('SLOW_REQUEST_MS', default=500, cast=float)
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=100, cast=float)
+
 # CORS settings - Allow frontend to access API
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
@@ -158,4 +224,44 @@ CORS_ALLOW_METHODS = [
     'PUT',
 ]
 
-FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:3000')
\ No newline at end of file
+FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:3000')
+
+# Size of the thread pool the async views use for CPU-heavy work such as password hashing
+ASYNC_BLOCKING_THREADS = config('ASYNC_BLOCKING_THREADS', default=4, cast=int)
+
+# Google sign-in
+# Certificates used to verify Google ID tokens; may point at a local JWKS stand-in
+GOOGLE_OAUTH2_CERTS_URL = config('GOOGLE_OAUTH2_CERTS_URL', default='https://www.googleapis.com/oauth2/v1/certs')
+# Seconds before the certificates expire at which a background refresh starts
+GOOGLE_CERTS_REFRESH_MARGIN = config('GOOGLE_CERTS_REFRESH_MARGIN', default=300, cast=int)
+# OAuth client id the ID tokens must be issued for (audience is not checked when empty)
+GOOGLE_OAUTH2_CLIENT_ID = config('GOOGLE_OAUTH2_CLIENT_ID', default='') or None
+
+# Directory holding generated lesson QR code images
+QR_CODE_ROOT = Path(config('QR_CODE_ROOT', default=str(BASE_DIR / 'qr_codes')))
+
+# Catalog snapshot bundles (see lessons/catalog.py): directory and URL they
+# are served from, seconds a rebuild waits after a content change to merge
+# bursts of edits, number of bundles kept, and brotli quality (0-11)
+CATALOG_ROOT = Path(config('CATALOG_ROOT', default=str(BASE_DIR / 'catalog')))
+CATALOG_URL = config('CATALOG_URL', default='/catalog/')
+CATALOG_REBUILD_DELAY = config('CATALOG_REBUILD_DELAY', default=2, cast=float)
+CATALOG_KEEP = config('CATALOG_KEEP', default=5, cast=int)
+CATALOG_BROTLI_QUALITY = config('CATALOG_BROTLI_QUALITY', default=9, cast=int)
+
+# Caching proxy for the Google Drive audio and PDF files (see lessons/media.py):
+# cache directory, total size it may use and largest file it downloads (bytes),
+# seconds before a cached file is downloaded again, and Cache-Control max-age
+# of the proxied responses. The upstream URL may point at a local stand-in;
+# MEDIA_PROXY_FETCHER replaces the downloader altogether.
+MEDIA_CACHE_ROOT = Path(config('MEDIA_CACHE_ROOT', default=str(BASE_DIR / 'media_cache')))
+MEDIA_CACHE_MAX_BYTES = config('MEDIA_CACHE_MAX_BYTES', default=2 * 1024 ** 3, cast=int)
+MEDIA_CACHE_MAX_FILE_BYTES = config('MEDIA_CACHE_MAX_FILE_BYTES', default=200 * 1024 ** 2, cast=int)
+MEDIA_CACHE_TTL = config('MEDIA_CACHE_TTL', default=7 * 24 * 3600, cast=int)
+MEDIA_PROXY_MAX_AGE = config('MEDIA_PROXY_MAX_AGE', default=86400, cast=int)
+MEDIA_PROXY_TIMEOUT = config('MEDIA_PROXY_TIMEOUT', default=30, cast=float)
+MEDIA_PROXY_UPSTREAM_URL = config(
+    'MEDIA_PROXY_UPSTREAM_URL',
+    default='https://drive.usercontent.google.com/download?id={file_id}&export=download&confirm=t',
+)
+MEDIA_PROXY_FETCHER = config('MEDIA_PROXY_FETCHER', default='lessons.media.DriveFetcher')
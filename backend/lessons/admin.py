@@ -1,11 +1,13 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from django.conf import settings
-import qrcode
-from io import BytesIO
-import base64
+from django.urls import reverse
 import nested_admin
-from .models import Lesson, AudioFile, PDFFile, Question, Choice, LessonFAQ
+from . import qr
+from . import search
+from .models import (
+    Lesson, AudioFile, PDFFile, Question, Choice, LessonFAQ,
+    LessonProgressStats, DailyCompletionStats, QuizAttempt,
+)
 
 # 1. Define Inline classes FIRST so they are available for LessonAdmin
 class ChoiceInline(nested_admin.NestedTabularInline):
@@ -68,48 +70,40 @@ class LessonAdmin(nested_admin.NestedModelAdmin):
         }),
     )
 
-    def generate_qr_code(self, lesson_id):
-        """Helper to generate base64 QR code image"""
-        # Ensure FRONTEND_URL is set in settings.py, or fallback to localhost
-        base_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:3000')
-        url = f"{base_url}/#/lesson/{lesson_id}"
-        
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(url)
-        qr.make(fit=True)
+    def qr_code_urls(self, lesson_id):
+        """Return the encoded lesson URL and a cache-busting image URL factory"""
+        url = qr.lesson_url(lesson_id)
+        version = qr.url_digest(url)
+
+        def image_url(image_format):
+            path = reverse('lesson_qr_code', kwargs={'pk': lesson_id, 'image_format': image_format})
+            return f"{path}?v={version}"
 
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        img_str = base64.b64encode(buffer.getvalue()).decode()
-        return url, img_str
+        return url, image_url
 
     def qr_code_display(self, obj):
-        """Displays the QR code with a download button in the detail view"""
+        """Displays the QR code with download buttons in the detail view"""
         if not obj.pk:
             return "Save the lesson first to generate QR code."
-            
-        url, img_str = self.generate_qr_code(obj.pk)
-        
+
+        url, image_url = self.qr_code_urls(obj.pk)
+
         return format_html(
             '''
             <div style="display: flex; align-items: flex-start; gap: 20px;">
-                <img src="data:image/png;base64,{}" width="200" height="200" style="border: 1px solid #ddd; border-radius: 8px;" />
+                <img src="{}" width="200" height="200" style="border: 1px solid #ddd; border-radius: 8px;" />
                 <div style="padding-top: 10px;">
                     <p style="margin-bottom: 10px; color: #666;"><strong>Scans to:</strong> <a href="{}" target="_blank">{}</a></p>
-                    <a href="data:image/png;base64,{}" download="lesson_{}_qr.png" class="button" style="padding: 10px 15px; background: #417690; color: white; text-decoration: none; border-radius: 4px; font-weight: bold;">
+                    <a href="{}" download="lesson_{}_qr.png" class="button" style="padding: 10px 15px; background: #417690; color: white; text-decoration: none; border-radius: 4px; font-weight: bold;">
                         Download QR Code Image
                     </a>
+                    <a href="{}" download="lesson_{}_qr.svg" class="button" style="padding: 10px 15px; margin-left: 8px; text-decoration: none; border-radius: 4px;">
+                        Download SVG
+                    </a>
                 </div>
             </div>
             ''',
-            img_str, url, url, img_str, obj.number
+            image_url('png'), url, url, image_url('png'), obj.number, image_url('svg'), obj.number
         )
     qr_code_display.short_description = "QR Code Download"
 
@@ -117,25 +111,31 @@ class LessonAdmin(nested_admin.NestedModelAdmin):
         """Small preview for the list view"""
         if not obj.pk:
             return "-"
-        _, img_str = self.generate_qr_code(obj.pk)
-        return format_html('<img src="data:image/png;base64,{}" width="50" height="50" />', img_str)
+        _, image_url = self.qr_code_urls(obj.pk)
+        return format_html('<img src="{}" width="50" height="50" loading="lazy" />', image_url('svg'))
     qr_code_preview.short_description = "QR"
 
+    def get_search_results(self, request, queryset, search_term):
+        """Search through the full-text index (which also covers questions, choices and FAQs)"""
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=search.matching_lessons(search_term)), False
+
 
 # 3. Register other models
 @admin.register(AudioFile)
 class AudioFileAdmin(admin.ModelAdmin):
-    list_display = ['lesson', 'title', 'order', 'created_at']
+    list_display = ['lesson', 'title', 'drive_file_id', 'order', 'created_at']
     list_filter = ['lesson', 'created_at']
-    search_fields = ['title', 'lesson__title']
+    search_fields = ['title', 'lesson__title', '=drive_file_id']
     ordering = ['lesson', 'order']
 
 
 @admin.register(PDFFile)
 class PDFFileAdmin(admin.ModelAdmin):
-    list_display = ['lesson', 'title', 'order', 'created_at']
+    list_display = ['lesson', 'title', 'drive_file_id', 'order', 'created_at']
     list_filter = ['lesson', 'created_at']
-    search_fields = ['title', 'lesson__title']
+    search_fields = ['title', 'lesson__title', '=drive_file_id']
     ordering = ['lesson', 'order']
 
 @admin.register(Question)
@@ -143,4 +143,45 @@ class QuestionAdmin(nested_admin.NestedModelAdmin):
     list_display = ['text', 'lesson', 'order']
     list_filter = ['lesson']
     search_fields = ['text', 'lesson__title']
-    inlines = [ChoiceInline]
\ No newline at end of file
+    inlines = [ChoiceInline]
+
+
+class ReadOnlyStatsAdmin(admin.ModelAdmin):
+    """Rollups are maintained by lessons/rollups.py; the admin only displays them"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LessonProgressStats)
+class LessonProgressStatsAdmin(ReadOnlyStatsAdmin):
+    list_display = ['lesson', 'started_count', 'completed_count']
+    list_select_related = ['lesson']
+    ordering = ['lesson__number']
+
+
+@admin.register(DailyCompletionStats)
+class DailyCompletionStatsAdmin(ReadOnlyStatsAdmin):
+    list_display = ['date', 'completed_count']
+    date_hierarchy = 'date'
+    ordering = ['-date']
+
+
+@admin.register(QuizAttempt)
+class QuizAttemptAdmin(admin.ModelAdmin):
+    """Attempts are recorded by the submit_quiz endpoint; they can be viewed and deleted"""
+    list_display = ['user', 'lesson', 'score', 'total', 'created_at']
+    list_filter = ['lesson']
+    list_select_related = ['user', 'lesson']
+    search_fields = ['user__username', 'lesson__title']
+    date_hierarchy = 'created_at'
+    readonly_fields = ['user', 'lesson', 'score', 'total', 'choices', 'created_at']
+
+    def has_add_permission(self, request):
+        return False
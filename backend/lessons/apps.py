@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class LessonsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'lessons'
+
+    def ready(self):
+        # Register signal handlers
+        from . import signals  # noqa: F401
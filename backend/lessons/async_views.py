@@ -0,0 +1,150 @@
+"""
+Async versions of the I/O-bound API endpoints, used when serving over ASGI
+(see hindpesh_backend/asgi.py and hindpesh_backend/asgi_urls.py).
+
+Under ASGI, Django runs sync views one at a time on a single shared thread,
+so a slow Google token verification or password check would stall every
+other request. These views keep the event loop free instead:
+- login endpoints are native async views; password hashing runs in a
+  bounded thread pool (ASYNC_BLOCKING_THREADS) so it cannot starve the loop
+- read-only lesson endpoints run the regular DRF views in worker threads,
+  keeping caching, conditional GETs, sparse fields and pagination identical
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .google_certs import verify_oauth2_token
+from .views import (
+    LessonViewSet,
+    GoogleLoginView,
+    LOGIN_MISSING_ERROR,
+    LOGIN_INVALID_ERROR,
+    LOGIN_TOKEN_TYPE_ERROR,
+    get_login_token_type,
+    password_login_payload,
+    google_login_payload,
+)
+
+_blocking_pool = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ASYNC_BLOCKING_THREADS', 4),
+    thread_name_prefix='hindpesh-blocking',
+)
+
+
+def worker_thread(func):
+    """
+    Wrap `func` for a thread other than the one Django's request_started and
+    request_finished handlers run on. Those handlers only recycle that
+    thread's database connections, so connections opened here are checked
+    (and dropped when broken or older than CONN_MAX_AGE) around every call.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return wrapper
+
+
+_lesson_list_view = worker_thread(LessonViewSet.as_view({'get': 'list', 'post': 'create'}))
+_lesson_detail_view = worker_thread(LessonViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}))
+_google_login_view = worker_thread(GoogleLoginView.as_view())
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run CPU-heavy work (e.g. password hashing) in the bounded thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_blocking_pool, partial(worker_thread(func), *args, **kwargs))
+
+
+def _json_response(data, status=200):
+    # Match DRF's JSONRenderer, which keeps Arabic text unescaped
+    return JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def _request_data(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+        # A JSON array, string or number carries no fields
+        return data if isinstance(data, dict) else {}
+    return request.POST
+
+
+@csrf_exempt
+async def lesson_list(request):
+    """GET /api/lessons/ (other methods fall through to the regular viewset)"""
+    return await sync_to_async(_lesson_list_view, thread_sensitive=False)(request)
+
+
+@csrf_exempt
+async def lesson_detail(request, pk):
+    """GET /api/lessons/{id}/ (other methods fall through to the regular viewset)"""
+    return await sync_to_async(_lesson_detail_view, thread_sensitive=False)(request, pk=str(pk))
+
+
+@csrf_exempt
+@require_POST
+async def password_login(request):
+    """
+    Async counterpart of LessonViewSet.login.
+    POST /api/lessons/login/
+    """
+    data = _request_data(request)
+    username = data.get('username')
+    password = data.get('password')
+
+    if not username or not password:
+        return _json_response({'error': LOGIN_MISSING_ERROR}, status=400)
+
+    token_type = get_login_token_type(data)
+    if token_type is None:
+        return _json_response({'error': LOGIN_TOKEN_TYPE_ERROR}, status=400)
+
+    user = await run_blocking(authenticate, username=username, password=password)
+    if user is None:
+        return _json_response({'error': LOGIN_INVALID_ERROR}, status=401)
+    return _json_response(await sync_to_async(password_login_payload)(user, token_type))
+
+
+@csrf_exempt
+async def google_login(request):
+    """
+    Async counterpart of GoogleLoginView.
+    POST /api/auth/google/
+    """
+    if request.method != 'POST':
+        return await sync_to_async(_google_login_view, thread_sensitive=False)(request)
+
+    token = _request_data(request).get('token')
+    if not token:
+        return _json_response({'error': 'No token provided'}, status=400)
+
+    try:
+        # Certificates are usually cached; a cold fetch is network I/O and waits
+        # in a worker thread rather than in the CPU-bound pool
+        idinfo = await sync_to_async(verify_oauth2_token, thread_sensitive=False)(
+            token, audience=getattr(settings, 'GOOGLE_OAUTH2_CLIENT_ID', None)
+        )
+        return _json_response(await sync_to_async(google_login_payload)(idinfo))
+    except ValueError as e:
+        return _json_response({'error': f'Invalid token: {str(e)}'}, status=400)
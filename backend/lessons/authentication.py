@@ -0,0 +1,238 @@
+"""
+API authentication: cached DRF tokens and stateless JWTs.
+
+Token authentication:
+DRF's TokenAuthentication joins Token and User on every authenticated
+request. CachedTokenAuthentication keeps recently used token -> (user, token)
+pairs in a TTL-bounded LRU map instead.
+
+Entries are tagged with the CredentialGeneration counter, a single row read
+by primary key on every request (cheaper than the Token/User join it
+replaces). The signal handlers in lessons/signals.py bump it in the
+transaction that rotates or deletes a token or deactivates a user, so the
+change and the new generation become visible together and a revoked token
+stops working on the next request in every process, including changes made
+by another process such as a manage.py create_token run. New tokens need no
+bump: their key cannot be cached yet.
+
+JWT authentication:
+StatelessJWTAuthentication accepts SimpleJWT access tokens
+(`Authorization: Bearer <access>`) and builds request.user from the token's
+claims, so verifying a request needs neither a database query nor a network
+call. Revoked tokens (logout, deactivated or deleted users) are kept in the
+RevokedToken table and mirrored into an in-memory revocation list. The list
+is reloaded when its generation number in the shared cache changes, which
+other processes sharing the cache backend see on their next request, and at
+least every JWT_REVOCATION_RELOAD_INTERVAL seconds, which bounds how long a
+revoked access token keeps working in processes that do not (the default
+locmem backend under several gunicorn workers). Refreshing checks the table
+itself, so a revoked refresh token can never mint another access token.
+"""
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import CredentialGeneration, RevokedToken
+from .ttl_cache import TTLCache
+
+_CREDENTIAL_GENERATION_PK = 1
+_JWT_GENERATION_KEY = 'auth:jwt-revocation-generation'
+
+# Claims copied from the user into every JWT so requests need no user lookup
+USER_CLAIMS = ('username', 'is_staff', 'is_superuser')
+
+
+def _generation(key):
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, 1, timeout=None)
+        generation = cache.get(key, 1)
+    return generation
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 2, timeout=None)
+
+
+token_cache = TTLCache(
+    max_entries=getattr(settings, 'TOKEN_AUTH_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 60),
+)
+
+
+def _credential_generation():
+    generation = (
+        CredentialGeneration.objects.filter(pk=_CREDENTIAL_GENERATION_PK)
+        .values_list('value', flat=True).first()
+    )
+    return generation or 0
+
+
+def invalidate_tokens():
+    """
+    Retire every cached token in all processes. Call it inside the
+    transaction making the change, so both become visible together.
+    """
+    bumped = CredentialGeneration.objects.filter(pk=_CREDENTIAL_GENERATION_PK).update(value=F('value') + 1)
+    if not bumped:
+        try:
+            with transaction.atomic():
+                CredentialGeneration.objects.create(pk=_CREDENTIAL_GENERATION_PK, value=1)
+        except IntegrityError:
+            # Created concurrently
+            CredentialGeneration.objects.filter(pk=_CREDENTIAL_GENERATION_PK).update(value=F('value') + 1)
+    transaction.on_commit(token_cache.clear)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in replacement for TokenAuthentication (same `Token <key>` header)"""
+
+    def authenticate_credentials(self, key):
+        # Read the generation before the lookup, so an invalidation racing with
+        # it leaves a stale-tagged entry rather than a stale valid one
+        generation = _credential_generation()
+        credentials = token_cache.get(key, generation)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            token_cache.set(key, credentials, generation)
+        return credentials
+
+
+def tokens_for_user(user):
+    """Mint a SimpleJWT refresh/access pair carrying the user's claims"""
+    refresh = RefreshToken.for_user(user)
+    for claim in USER_CLAIMS:
+        refresh[claim] = getattr(user, claim)
+    return {
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+    }
+
+
+def get_reload_interval():
+    return getattr(settings, 'JWT_REVOCATION_RELOAD_INTERVAL', 5)
+
+
+class RevocationList:
+    """In-memory mirror of the RevokedToken table"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._loaded_at = 0.0
+        self._jtis = frozenset()
+        self._users = {}
+
+    def _load(self, generation):
+        loaded_at = time.monotonic()
+        jtis = set()
+        users = {}
+        for jti, user_id, revoked_at in RevokedToken.objects.filter(
+            expires_at__gt=timezone.now()
+        ).values_list('jti', 'user_id', 'revoked_at'):
+            if jti:
+                jtis.add(jti)
+            if user_id is not None:
+                users[user_id] = max(users.get(user_id, 0), revoked_at.timestamp())
+        with self._lock:
+            self._jtis, self._users, self._generation = frozenset(jtis), users, generation
+            self._loaded_at = loaded_at
+
+    def is_revoked(self, token):
+        generation = _generation(_JWT_GENERATION_KEY)
+        if generation != self._generation or time.monotonic() - self._loaded_at > get_reload_interval():
+            self._load(generation)
+        if token.get(jwt_settings.JTI_CLAIM) in self._jtis:
+            return True
+        revoked_before = self._users.get(token.get(jwt_settings.USER_ID_CLAIM))
+        # iat has one-second resolution; a token issued in the same second as a
+        # revocation is treated as revoked
+        return revoked_before is not None and token.get('iat', 0) <= revoked_before
+
+    def clear(self):
+        with self._lock:
+            self._generation = None
+
+
+revocation_list = RevocationList()
+
+
+def is_revoked_in_db(token):
+    """Check a JWT against the RevokedToken table itself rather than the in-memory list"""
+    revoked = Q(pk__in=[])
+    if token.get(jwt_settings.JTI_CLAIM):
+        revoked |= Q(jti=token[jwt_settings.JTI_CLAIM])
+    if token.get(jwt_settings.USER_ID_CLAIM) is not None:
+        # Same rule as the in-memory list: issued no later than the revocation
+        revoked |= Q(user_id=token[jwt_settings.USER_ID_CLAIM],
+                     revoked_at__gte=datetime.fromtimestamp(token.get('iat', 0), tz=dt_timezone.utc))
+    return RevokedToken.objects.filter(revoked, expires_at__gt=timezone.now()).exists()
+
+
+def _token_expiry(token):
+    return datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+
+
+def revoke_token(token):
+    """Revoke a single validated JWT (access or refresh) until it expires"""
+    RevokedToken.objects.create(jti=token[jwt_settings.JTI_CLAIM], expires_at=_token_expiry(token))
+    _revocations_changed()
+
+
+def revoke_user_tokens(user_id):
+    """Revoke every JWT issued to a user so far"""
+    RevokedToken.objects.create(
+        user_id=user_id,
+        expires_at=timezone.now() + jwt_settings.REFRESH_TOKEN_LIFETIME,
+    )
+    _revocations_changed()
+
+
+def _revocations_changed():
+    RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    # After the commit, so no process reloads the list before it holds the new row
+    transaction.on_commit(_reload_revocations)
+
+
+def _reload_revocations():
+    revocation_list.clear()
+    _bump(_JWT_GENERATION_KEY)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that trusts the token's claims instead of loading the user"""
+
+    def get_user(self, validated_token):
+        if revocation_list.is_revoked(validated_token):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            # Issued before the user claims were added
+            return super().get_user(validated_token)
+
+        user = User(
+            pk=user_id,
+            is_active=True,
+            **{claim: validated_token[claim] for claim in USER_CLAIMS},
+        )
+        # Behave like a loaded row (e.g. when assigned to a foreign key)
+        user._state.adding = False
+        return user
@@ -0,0 +1,92 @@
+"""
+Cache of serialized lesson payloads.
+
+Detail payloads are stored per lesson and list pages are stored per query
+string. Both are keyed by scope ("public" for anonymous users who only see
+active lessons, "staff" for authenticated users who also see inactive ones)
+and by the ETag the view computed for the response, which covers the lesson
+rows' updated_at. An entry therefore only ever answers the content version
+it was built from: an edit moves readers to a new key instead of relying on
+every process deleting the old one.
+
+The content version of a list (row count and newest updated_at) is read
+with one aggregate query per request, so every process sees an edit as
+soon as it is committed, whatever the cache backend; no entry is ever
+invalidated.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = 'lessons'
+
+_HITS_KEY = f'{KEY_PREFIX}:stats:hits'
+_MISSES_KEY = f'{KEY_PREFIX}:stats:misses'
+
+
+def get_timeout():
+    """Upper bound on how long an entry may live, even without invalidation"""
+    return getattr(settings, 'LESSON_CACHE_TIMEOUT', 300)
+
+
+def scope_for(request):
+    """Return the cache scope matching LessonViewSet.get_queryset for this request"""
+    return 'staff' if request.user.is_authenticated else 'public'
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key missing (first use or evicted); add() keeps concurrent writers safe
+        if cache.add(key, 1, timeout=None):
+            return 1
+        return cache.incr(key)
+
+
+def _version_tag(etag):
+    return etag.strip('"')
+
+
+def detail_key(scope, lesson_id, etag):
+    """Key for a lesson's payload at the version `etag` was computed from"""
+    return f'{KEY_PREFIX}:{scope}:detail:{lesson_id}:{_version_tag(etag)}'
+
+
+def list_key(scope, request, etag):
+    """
+    Key for an assembled list page at the version `etag` was computed from.
+    The host is part of the key because the pagination links in the payload
+    are absolute URLs.
+    """
+    raw = f'{request.get_host()}?{request.META.get("QUERY_STRING", "")}'
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:{scope}:list:{_version_tag(etag)}:{digest}'
+
+
+def get_payload(key):
+    """Fetch a cached payload and record the hit or miss"""
+    payload = cache.get(key)
+    _incr(_MISSES_KEY if payload is None else _HITS_KEY)
+    return payload
+
+
+def set_payload(key, payload):
+    cache.set(key, payload, timeout=get_timeout())
+
+
+def stats():
+    """Hit/miss counters since the counters were last reset"""
+    hits = cache.get(_HITS_KEY, 0)
+    misses = cache.get(_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
+
+
+def reset_stats():
+    cache.delete_many([_HITS_KEY, _MISSES_KEY])
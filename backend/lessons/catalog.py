@@ -0,0 +1,241 @@
+"""
+Versioned snapshot of the public lesson catalog.
+
+build() renders every active lesson with its files, questions and FAQs (in
+LessonSerializer's shape) into one JSON bundle named after a hash of its
+content, catalog-<hash>.json, plus .gz and .br variants, under CATALOG_ROOT.
+CatalogWhiteNoiseMiddleware serves the bundles at CATALOG_URL as immutable
+files (WhiteNoise picks the variant matching Accept-Encoding), so clients
+download each version once. manifest.json names the current bundle and is
+returned by GET /api/catalog/manifest.
+
+Every file is written to a temporary file and renamed into place, the bundle
+and its variants before the manifest, so readers never see a partial file
+and the manifest never names a missing bundle. The newest CATALOG_KEEP
+bundles are kept for clients still holding an older manifest.
+
+Content changes (lessons/signals.py) schedule a rebuild in a background
+thread CATALOG_REBUILD_DELAY seconds after the transaction commits, so a
+burst of edits leads to one build. The manifest endpoint also compares the
+manifest's content version with the database and schedules a rebuild when
+they differ, which covers bulk inserts that send no signals and other
+processes; the current snapshot is served until the new one is written.
+Only a missing snapshot is built inside the request.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import re
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Max
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.responders import MissingFileError
+
+from . import representations
+from .models import Lesson
+from .qr import write_atomic
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it only the gzip variant is written
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+BUNDLE_NAME = re.compile(r'catalog-[0-9a-f]{16}\.json')
+
+_build_lock = threading.Lock()
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def get_root():
+    return Path(getattr(settings, 'CATALOG_ROOT', Path(settings.BASE_DIR) / 'catalog'))
+
+
+def get_url_prefix():
+    prefix = getattr(settings, 'CATALOG_URL', '/catalog/')
+    return '/' + prefix.strip('/') + '/'
+
+
+def _version(aggregate):
+    """
+    Content version of the active lessons from their count and newest
+    updated_at, and of the representation's field layout
+    """
+    last_modified = aggregate['last_modified']
+    return (
+        f"{representations.LAYOUT_VERSION}:{aggregate['count']}:"
+        f"{last_modified.isoformat() if last_modified else ''}"
+    )
+
+
+def _aggregate():
+    return Lesson.objects.filter(is_active=True).aggregate(count=Count('pk'), last_modified=Max('updated_at'))
+
+
+def current_version():
+    """Content version of the catalog, read from the database"""
+    return _version(_aggregate())
+
+
+def read_manifest():
+    """The current manifest, or None if no snapshot has been built yet"""
+    try:
+        with open(get_root() / MANIFEST_NAME, 'rb') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_current(manifest, version):
+    return (
+        manifest is not None and manifest.get('version') == version
+        and (get_root() / f"catalog-{manifest.get('hash')}.json").exists()
+    )
+
+
+def build(if_stale=False):
+    """
+    Snapshot the current catalog and point the manifest at it; returns the
+    manifest. Writes nothing but the manifest when the content is unchanged.
+    With `if_stale`, an up-to-date manifest is returned without rendering,
+    so builds queued behind a concurrent one do not repeat it.
+    """
+    with _build_lock:
+        # Read the version first: a change racing with the build leaves an
+        # older version next to newer content, which only causes another build
+        version = current_version()
+        if if_stale:
+            previous = read_manifest()
+            if _is_current(previous, version):
+                return previous
+        lessons = representations.represent_lessons(
+            representations.lesson_values(Lesson.objects.filter(is_active=True))
+        )
+        # Rendered like the lesson API responses
+        body = JSONRenderer().render({'lessons': lessons})
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        name = f'catalog-{digest}.json'
+        root = get_root()
+        path = root / name
+
+        if not path.exists():
+            # mtime=0 keeps the gzip variant byte-identical across rebuilds
+            write_atomic(root / f'{name}.gz', gzip.compress(body, compresslevel=9, mtime=0))
+            if brotli is not None:
+                quality = getattr(settings, 'CATALOG_BROTLI_QUALITY', 9)
+                write_atomic(root / f'{name}.br', brotli.compress(body, quality=quality))
+            # The plain file last: WhiteNoise only looks for variants next to it
+            write_atomic(path, body)
+
+        manifest = {
+            'hash': digest,
+            'url': f'{get_url_prefix()}{name}',
+            'size': len(body),
+            'lessons': len(lessons),
+            'version': version,
+            'built_at': timezone.now().isoformat(),
+        }
+        previous = read_manifest()
+        if previous is None or previous.get('hash') != digest or previous.get('version') != version:
+            write_atomic(root / MANIFEST_NAME, json.dumps(manifest).encode('utf-8'))
+        else:
+            manifest = previous
+        _prune(root, keep=getattr(settings, 'CATALOG_KEEP', 5), current=name)
+        return manifest
+
+
+def _prune(root, keep, current):
+    """Delete all but the `keep` newest bundles (never the current one) with their variants"""
+    bundles = sorted(
+        (path for path in root.glob('catalog-*.json') if BUNDLE_NAME.fullmatch(path.name)),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True,
+    )
+    for path in bundles[keep:]:
+        if path.name == current:
+            continue
+        for variant in (path, path.with_name(f'{path.name}.gz'), path.with_name(f'{path.name}.br')):
+            variant.unlink(missing_ok=True)
+
+
+def get_manifest():
+    """
+    The manifest of the current snapshot. If the content changed since it
+    was built, a rebuild is scheduled and this one is served meanwhile; a
+    missing snapshot is built first.
+    """
+    manifest = read_manifest()
+    if manifest is None:
+        return build(if_stale=True)
+    if not _is_current(manifest, current_version()):
+        schedule_rebuild()
+    return manifest
+
+
+def schedule_rebuild():
+    """Rebuild in a background thread CATALOG_REBUILD_DELAY seconds from now; calls in between are merged"""
+    global _timer
+    with _timer_lock:
+        if _timer is not None:
+            return
+        _timer = threading.Timer(getattr(settings, 'CATALOG_REBUILD_DELAY', 2), _scheduled_rebuild)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _scheduled_rebuild():
+    global _timer
+    with _timer_lock:
+        _timer = None
+    try:
+        build(if_stale=True)
+    except Exception:
+        logger.exception('Catalog snapshot rebuild failed')
+    finally:
+        # This thread's database connection is never reused
+        connections.close_all()
+
+
+class CatalogWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that also serves the catalog bundles. They are written after
+    startup, so they are looked up on disk per request rather than indexed
+    once like the static files, and are always cached as immutable.
+    """
+
+    def __init__(self, get_response=None, settings=settings):
+        # Set first: indexing the static files in super().__init__ calls immutable_file_test
+        self.catalog_prefix = get_url_prefix()
+        super().__init__(get_response, settings)
+
+    def __call__(self, request):
+        if request.path_info.startswith(self.catalog_prefix):
+            static_file = self.find_catalog_file(request.path_info)
+            if static_file is not None:
+                return self.serve(static_file, request)
+        return super().__call__(request)
+
+    def find_catalog_file(self, url):
+        name = url[len(self.catalog_prefix):]
+        if not BUNDLE_NAME.fullmatch(name):
+            return None
+        try:
+            return self.get_static_file(str(get_root() / name), url)
+        except MissingFileError:
+            return None
+
+    def immutable_file_test(self, path, url):
+        if url.startswith(self.catalog_prefix):
+            return True
+        return super().immutable_file_test(path, url)
@@ -0,0 +1,61 @@
+"""
+Google Drive file ids of the audio and PDF links.
+
+Lessons link their files as whatever share URL was pasted into the admin
+(/file/d/<id>/view, open?id=<id>, uc?export=download&id=<id>, ...).
+AudioFile and PDFFile store the file id extracted from it in an indexed
+drive_file_id column when they are saved, so the API can return ready-made
+stream and view URLs and the same file can be found across lessons without
+parsing every link. Links that are not Google Drive URLs leave it blank.
+"""
+import re
+from urllib.parse import parse_qs, urlsplit
+
+# Hosts serving Drive files; docs.google.com covers Docs/Sheets/Slides exports
+HOSTS = ('drive.google.com', 'docs.google.com', 'drive.usercontent.google.com')
+
+# Size of the drive_file_id column
+MAX_ID_LENGTH = 128
+
+# Drive ids are URL-safe base64: 28 characters for old files, 33 for newer ones
+_FILE_ID = re.compile(rf'[A-Za-z0-9_-]{{10,{MAX_ID_LENGTH}}}')
+# /file/d/<id>/..., /document/d/<id>/..., /uc/d/<id> and similar
+_PATH_ID = re.compile(rf'/d/([A-Za-z0-9_-]{{10,{MAX_ID_LENGTH}}})(?:/|$)')
+
+STREAM_URL = 'https://drive.google.com/uc?export=download&id={}'
+VIEW_URL = 'https://drive.google.com/uc?export=view&id={}'
+
+
+def extract_file_id(link):
+    """The Drive file id in a share link; '' if it is not a Google Drive link"""
+    try:
+        parts = urlsplit((link or '').strip())
+    except ValueError:
+        return ''
+    if (parts.hostname or '') not in HOSTS:
+        return ''
+    match = _PATH_ID.search(parts.path)
+    if match:
+        return match.group(1)
+    for file_id in parse_qs(parts.query).get('id', ()):
+        if _FILE_ID.fullmatch(file_id):
+            return file_id
+    return ''
+
+
+def normalize(value):
+    """A file id given either as a share link or as the bare id; '' if it is neither"""
+    value = (value or '').strip()
+    if _FILE_ID.fullmatch(value):
+        return value
+    return extract_file_id(value)
+
+
+def stream_url(file_id):
+    """Direct download URL, usable as an <audio> source; None without a file id"""
+    return STREAM_URL.format(file_id) if file_id else None
+
+
+def view_url(file_id):
+    """URL opening the file in the browser; None without a file id"""
+    return VIEW_URL.format(file_id) if file_id else None
@@ -0,0 +1,163 @@
+"""
+Process-wide cache of Google's ID token signing certificates.
+
+google.oauth2.id_token.verify_oauth2_token downloads the certificates on
+every call. This module keeps them in memory for as long as the response's
+Cache-Control max-age allows, refreshes them in a background thread shortly
+before they expire, and fetches them over a pooled requests session.
+
+GOOGLE_OAUTH2_CERTS_URL may point at Google's PEM endpoint
+(``{"kid": "-----BEGIN CERTIFICATE-----..."}``) or at any JWKS document
+(``{"keys": [{"kid": ..., "n": ..., "e": ...}]}``), e.g. a local stand-in.
+"""
+import base64
+import logging
+import re
+import threading
+import time
+
+import requests
+import rsa
+from django.conf import settings
+from google.auth import jwt
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_ISSUERS = ['accounts.google.com', 'https://accounts.google.com']
+DEFAULT_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+def _b64url_to_int(value):
+    padded = value + '=' * (-len(value) % 4)
+    return int.from_bytes(base64.urlsafe_b64decode(padded), 'big')
+
+
+def jwks_to_pem(jwks):
+    """Convert RSA keys of a JWKS document into a {kid: PEM public key} mapping"""
+    certs = {}
+    for key in jwks.get('keys', []):
+        if key.get('kty') != 'RSA' or 'kid' not in key:
+            continue
+        public_key = rsa.PublicKey(_b64url_to_int(key['n']), _b64url_to_int(key['e']))
+        certs[key['kid']] = public_key.save_pkcs1().decode('ascii')
+    return certs
+
+
+class GoogleCertCache:
+    """Thread-safe certificate cache honoring the endpoint's Cache-Control max-age"""
+
+    def __init__(self, certs_url, default_max_age=3600, refresh_margin=300, timeout=5,
+                 min_refresh_interval=60):
+        self.certs_url = certs_url
+        self.default_max_age = default_max_age
+        self.refresh_margin = refresh_margin
+        self.timeout = timeout
+        self.min_refresh_interval = min_refresh_interval
+        self.session = requests.Session()
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=4))
+        self.session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=4))
+        self._certs = None
+        self._expires_at = 0.0
+        self._fetched_at = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _fetch(self):
+        response = self.session.get(self.certs_url, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        certs = jwks_to_pem(data) if 'keys' in data else data
+
+        match = _MAX_AGE_RE.search(response.headers.get('Cache-Control', ''))
+        max_age = int(match.group(1)) if match else self.default_max_age
+        return certs, max_age
+
+    def refresh(self):
+        """Fetch the certificates now and return them"""
+        try:
+            certs, max_age = self._fetch()
+        except (requests.RequestException, ValueError):
+            with self._lock:
+                self._refreshing = False
+                if self._certs is None:
+                    raise
+                # Keep serving the previous certificates; Google overlaps key rotations
+                logger.warning('Could not refresh Google certificates from %s', self.certs_url, exc_info=True)
+                return self._certs
+
+        with self._lock:
+            self._fetched_at = time.monotonic()
+            self._certs = certs
+            self._expires_at = self._fetched_at + max_age
+            self._refreshing = False
+        return certs
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name='google-certs-refresh', daemon=True).start()
+
+    def get_certs(self):
+        """Return cached certificates, fetching or refreshing them as needed"""
+        with self._lock:
+            certs, expires_at = self._certs, self._expires_at
+        now = time.monotonic()
+        if certs is None or now >= expires_at:
+            return self.refresh()
+        if now >= expires_at - self.refresh_margin:
+            self._refresh_in_background()
+        return certs
+
+    def get_certs_for_key(self, key_id):
+        """
+        Like get_certs(), but refetch early when `key_id` is unknown, which
+        happens right after Google publishes a new key. Refetches are rate
+        limited so tokens with bogus key ids cannot trigger a fetch storm.
+        """
+        certs = self.get_certs()
+        if key_id and key_id not in certs:
+            with self._lock:
+                recently_fetched = (
+                    self._fetched_at is not None
+                    and time.monotonic() - self._fetched_at < self.min_refresh_interval
+                )
+            if not recently_fetched:
+                certs = self.refresh()
+        return certs
+
+
+_cert_cache = None
+_cert_cache_lock = threading.Lock()
+
+
+def get_cert_cache():
+    """Return the process-wide certificate cache for the configured endpoint"""
+    global _cert_cache
+    certs_url = getattr(settings, 'GOOGLE_OAUTH2_CERTS_URL', DEFAULT_CERTS_URL)
+    with _cert_cache_lock:
+        if _cert_cache is None or _cert_cache.certs_url != certs_url:
+            _cert_cache = GoogleCertCache(
+                certs_url,
+                refresh_margin=getattr(settings, 'GOOGLE_CERTS_REFRESH_MARGIN', 300),
+            )
+        return _cert_cache
+
+
+def verify_oauth2_token(token, audience=None, clock_skew_in_seconds=0):
+    """
+    Drop-in replacement for google.oauth2.id_token.verify_oauth2_token that
+    uses the cached certificates. Raises ValueError if the token is invalid.
+    """
+    key_id = jwt.decode_header(token).get('kid')
+    certs = get_cert_cache().get_certs_for_key(key_id)
+    idinfo = jwt.decode(
+        token, certs=certs, audience=audience, clock_skew_in_seconds=clock_skew_in_seconds,
+    )
+
+    if idinfo.get('iss') not in GOOGLE_ISSUERS:
+        raise ValueError(f"Wrong issuer. 'iss' should be one of the following: {GOOGLE_ISSUERS}")
+    return idinfo
@@ -0,0 +1,156 @@
+"""
+Write-behind buffer for UserProgress.last_accessed.
+
+Heartbeat-style "still watching" touches would otherwise each write a row.
+Touches are kept in a bounded in-process map of (user_id, lesson_id) ->
+newest timestamp and flushed in batched UPDATEs:
+- by a background thread at most LAST_ACCESSED_MAX_STALENESS seconds after
+  the first buffered touch
+- immediately when LAST_ACCESSED_BUFFER_SIZE distinct keys are pending
+- at interpreter shutdown
+
+Touches of a batch that fails (e.g. "database is locked") are put back and
+retried by the next flush; the request whose touch triggered a flush never
+sees the error.
+
+Each UPDATE keeps the newest timestamp (GREATEST of the stored and buffered
+values), so a late flush never moves last_accessed backwards. Only existing
+progress rows are touched; rows are created through the progress endpoints.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .models import UserProgress
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 200
+
+
+class LastAccessedBuffer:
+    def __init__(self, max_entries=10000, max_staleness=30.0):
+        self.max_entries = max_entries
+        self.max_staleness = max_staleness
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self.touches = 0
+        self.rows_flushed = 0
+        self.statements = 0
+
+    def touch(self, user_id, lesson_id, timestamp):
+        """Record an access; the newest timestamp per (user, lesson) wins"""
+        with self._lock:
+            self.touches += 1
+            key = (user_id, lesson_id)
+            current = self._pending.get(key)
+            if current is None or timestamp > current:
+                self._pending[key] = timestamp
+            full = len(self._pending) >= self.max_entries
+            if not full:
+                self._schedule()
+        if full:
+            try:
+                self.flush()
+            except Exception:
+                # The touches stay buffered for the next flush
+                logger.exception('Flushing buffered last_accessed touches failed')
+
+    def _schedule(self):
+        """Start the staleness timer unless it is running; the caller holds self._lock"""
+        if self._timer is None:
+            self._timer = threading.Timer(self.max_staleness, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _requeue(self, items):
+        """Buffer touches again after a failed flush, unless a newer touch of the same row arrived"""
+        with self._lock:
+            for key, timestamp in items:
+                current = self._pending.get(key)
+                if current is None or timestamp > current:
+                    self._pending[key] = timestamp
+            self._schedule()
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Flushing buffered last_accessed touches failed')
+        finally:
+            # The timer thread owns its own database connection
+            connections.close_all()
+
+    def flush(self):
+        """
+        Write all pending touches; returns the number of rows updated.
+        If a batch fails, it and the batches after it are buffered again
+        before the error is raised.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not pending:
+                return 0
+
+            updated = 0
+            flushed = 0
+            items = list(pending.items())
+            try:
+                for start in range(0, len(items), FLUSH_BATCH_SIZE):
+                    batch = items[start:start + FLUSH_BATCH_SIZE]
+                    match = Q()
+                    whens = []
+                    for (user_id, lesson_id), timestamp in batch:
+                        match |= Q(user_id=user_id, lesson_id=lesson_id)
+                        whens.append(When(
+                            user_id=user_id, lesson_id=lesson_id,
+                            then=Greatest(F('last_accessed'), Value(timestamp)),
+                        ))
+                    # queryset.update() bypasses auto_now, so the buffered time is kept
+                    updated += UserProgress.objects.filter(match).update(
+                        last_accessed=Case(*whens, default=F('last_accessed'))
+                    )
+                    self.statements += 1
+                    flushed += len(batch)
+            except Exception:
+                self._requeue(items[flushed:])
+                raise
+            finally:
+                self.rows_flushed += flushed
+            return updated
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'touches': self.touches,
+            'pending': pending,
+            'rows_flushed': self.rows_flushed,
+            'update_statements': self.statements,
+            'writes_avoided': max(self.touches - self.rows_flushed - pending, 0),
+        }
+
+
+buffer = LastAccessedBuffer(
+    max_entries=getattr(settings, 'LAST_ACCESSED_BUFFER_SIZE', 10000),
+    max_staleness=getattr(settings, 'LAST_ACCESSED_MAX_STALENESS', 30),
+)
+
+
+@atexit.register
+def _flush_on_shutdown():
+    try:
+        buffer.flush()
+    except Exception:
+        logger.exception('Flushing buffered last_accessed touches at shutdown failed')
@@ -0,0 +1,248 @@
+"""
+Management command to benchmark the API offline against a seeded throwaway database
+Usage: python manage.py benchmark_api
+       python manage.py benchmark_api --output results.json --baseline benchmarks/baseline.json
+       python manage.py benchmark_api --lessons 500 --requests 500 --scenario lessons_list_anon
+
+Requests go through Django's test client in this process (no network, one at
+a time), so the numbers measure the application itself. The data lives in a
+test database created for the run (the configured database is never touched)
+and the cache is a private in-memory cache. With --baseline, the run fails when
+a scenario needs more SQL queries per request than the baseline, or its p95
+latency exceeds the baseline's by more than --tolerance (and --min-delta-ms).
+"""
+import gc
+import json
+import platform
+import statistics
+import time
+from urllib.parse import quote
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from lessons import synthetic
+from lessons.models import Lesson
+
+SEED = 20240101
+PASSWORD = 'benchmark-password'
+
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark-api',
+    }
+}
+
+# name -> (client, method, path template, share of --requests)
+# Login hashes a password on every request, so it gets fewer iterations.
+SCENARIOS = {
+    'lessons_list_anon': ('anon', 'get', '/api/lessons/', 1),
+    'lessons_list_auth': ('student', 'get', '/api/lessons/', 1),
+    'lesson_detail': ('anon', 'get', '/api/lessons/{lesson}/', 1),
+    'lesson_search': ('anon', 'get', '/api/lessons/search/?q={query}', 1),
+    'progress_list': ('student', 'get', '/api/progress/', 1),
+    'progress_post': ('student', 'post', '/api/progress/', 1),
+    'login': ('anon', 'post', '/api/lessons/login/', 0.05),
+    'admin_lesson_changelist': ('admin', 'get', '/admin/lessons/lesson/', 0.25),
+    'admin_audiofile_changelist': ('admin', 'get', '/admin/lessons/audiofile/', 0.25),
+    'admin_progress_stats_changelist': ('admin', 'get', '/admin/lessons/lessonprogressstats/', 0.25),
+}
+
+
+# Search queries cycled through by lesson_search: words of the synthetic
+# vocabulary, partly with harakat, tatweel or without the article
+SEARCH_QUERIES = [
+    'العربية', 'الْعَرَبِيَّة', 'قواعد النحو', 'تمارين', 'المفـــردات', 'إملاء', 'الفعل',
+    'القراءة والكتابة', 'بلاغه', 'المُبْتَدَأ', 'الفاعل المفعول', 'حوار',
+]
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the lessons API offline and compare the results with a stored baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lessons', type=int, default=100,
+                            help='Number of lessons to seed (default: 100)')
+        parser.add_argument('--users', type=int, default=50,
+                            help='Number of students with progress to seed (default: 50)')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Measured requests per scenario (default: 200)')
+        parser.add_argument('--warmup', type=int, default=10,
+                            help='Unmeasured requests per scenario before measuring (default: 10)')
+        parser.add_argument('--rounds', type=int, default=3,
+                            help='Rounds per scenario; the round with the lowest p95 is reported (default: 3)')
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                            help='Only run this scenario (may be repeated)')
+        parser.add_argument('--output', default='benchmark_results.json',
+                            help='Path of the JSON results file')
+        parser.add_argument('--baseline', default=None,
+                            help='JSON results of an earlier run to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative p95 latency increase over the baseline (default: 0.25)')
+        parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                            help='Ignore p95 increases smaller than this many ms (default: 2)')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read baseline {options["baseline"]}: {e}')
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES, DEBUG=False):
+                self.stdout.write(f'Seeding {options["lessons"]} lesson(s) and {options["users"]} student(s)...')
+                lesson_ids = self._seed(options['lessons'], options['users'])
+                results = self._run(lesson_ids, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            'meta': {
+                'lessons': options['lessons'],
+                'users': options['users'],
+                'requests': options['requests'],
+                'rounds': options['rounds'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+        self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+        if baseline is not None:
+            self._compare(results, baseline, options)
+
+    def _seed(self, lesson_count, user_count):
+        """Deterministic dataset from the synthetic data generator (see lessons/synthetic.py)"""
+        generator = synthetic.Generator(seed=SEED)
+        lesson_ids = generator.lessons(lesson_count, audio_files=2, pdf_files=1, questions=3, choices=4, faqs=2,
+                                       inactive_ratio=0.1)
+        user_ids = generator.users(user_count, prefix='bench-user-')
+        generator.progress(user_ids, lesson_ids, density=0.1)
+
+        User.objects.create_superuser('bench-admin', 'admin@example.com', PASSWORD)
+        User.objects.create_user('bench-student', 'student@example.com', PASSWORD)
+        # Anonymous users only see active lessons
+        return list(Lesson.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True))
+
+    def _clients(self):
+        student = User.objects.get(username='bench-student')
+        token, _ = Token.objects.get_or_create(user=student)
+        admin = Client()
+        admin.force_login(User.objects.get(username='bench-admin'))
+        return {
+            'anon': Client(),
+            'student': Client(HTTP_AUTHORIZATION=f'Token {token.key}'),
+            'admin': admin,
+        }
+
+    def _request(self, client, method, template, lesson_ids, index):
+        lesson = lesson_ids[index % len(lesson_ids)]
+        path = template.format(lesson=lesson, query=quote(SEARCH_QUERIES[index % len(SEARCH_QUERIES)]))
+        if method == 'get':
+            return client.get(path)
+        if path == '/api/lessons/login/':
+            data = {'username': 'bench-student', 'password': PASSWORD}
+        else:
+            data = {'lesson': lesson, 'is_completed': index % 2 == 0}
+        return client.post(path, data, content_type='application/json')
+
+    def _measure(self, name, client, method, template, lesson_ids, count, warmup):
+        # Every round starts from the same state: empty cache, collected garbage
+        cache.clear()
+        gc.collect()
+        for index in range(warmup):
+            self._request(client, method, template, lesson_ids, index)
+
+        latencies = []
+        queries = 0
+        started = time.perf_counter()
+        for index in range(count):
+            with CaptureQueriesContext(connection) as captured:
+                request_started = time.perf_counter()
+                response = self._request(client, method, template, lesson_ids, index)
+                latencies.append((time.perf_counter() - request_started) * 1000)
+            if response.status_code >= 400:
+                raise CommandError(f'{name}: {method.upper()} returned {response.status_code}')
+            queries += len(captured)
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'requests': count,
+            'p50_ms': round(statistics.median(latencies), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'rps': round(count / elapsed, 1),
+            'queries_per_request': round(queries / count, 2),
+        }
+
+    def _run(self, lesson_ids, options):
+        clients = self._clients()
+        names = options['scenario'] or list(SCENARIOS)
+        results = {}
+        self.stdout.write(f'{"scenario":34} {"reqs":>5} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"rps":>8} {"queries":>8}')
+        for name in names:
+            client_name, method, template, share = SCENARIOS[name]
+            count = max(5, int(options['requests'] * share))
+            rounds = [
+                self._measure(name, clients[client_name], method, template, lesson_ids, count, options['warmup'])
+                for _ in range(options['rounds'])
+            ]
+            # Report the least noisy round (lowest p95); query counts can differ
+            # between rounds (e.g. the first progress_post round inserts rows), so
+            # the worst one is kept to make them comparable across runs
+            result = dict(min(rounds, key=lambda round_result: round_result['p95_ms']))
+            result['queries_per_request'] = max(round_result['queries_per_request'] for round_result in rounds)
+            results[name] = result
+            self.stdout.write(
+                f'{name:34} {count:>5} {result["p50_ms"]:>8.2f} {result["p95_ms"]:>8.2f} '
+                f'{result["p99_ms"]:>8.2f} {result["rps"]:>8.1f} {result["queries_per_request"]:>8.2f}'
+            )
+        return results
+
+    def _compare(self, results, baseline, options):
+        regressions = []
+        for name, result in results.items():
+            expected = baseline.get('results', {}).get(name)
+            if expected is None:
+                self.stdout.write(self.style.WARNING(f'{name}: not in the baseline'))
+                continue
+            if result['queries_per_request'] > expected['queries_per_request']:
+                regressions.append(
+                    f'{name}: {result["queries_per_request"]} queries/request, '
+                    f'baseline {expected["queries_per_request"]}'
+                )
+            limit = expected['p95_ms'] * (1 + options['tolerance'])
+            if result['p95_ms'] > limit and result['p95_ms'] - expected['p95_ms'] >= options['min_delta_ms']:
+                regressions.append(
+                    f'{name}: p95 {result["p95_ms"]:.2f} ms, baseline {expected["p95_ms"]:.2f} ms '
+                    f'(limit {limit:.2f} ms)'
+                )
+
+        if regressions:
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(f'  {regression}'))
+            raise CommandError(f'{len(regressions)} performance regression(s) against {options["baseline"]}')
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {options["baseline"]}'))
@@ -0,0 +1,97 @@
+"""
+Management command to time the fast lesson read path against LessonSerializer
+Usage: python manage.py benchmark_lesson_representations
+       python manage.py benchmark_lesson_representations --lessons 1000 --rounds 5
+
+Runs in a throwaway test database (the configured database is never touched)
+seeded with lessons whose amount of nested content varies randomly. The full
+catalog is rendered through both LessonSerializer (with prefetching) and
+lessons.representations and the best of --rounds is reported, queries
+included. That both render byte-identical JSON is checked by the test suite.
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from lessons import synthetic
+from lessons.management.commands.benchmark_api import BENCHMARK_CACHES
+from lessons.models import Lesson
+from lessons.representations import lesson_values, represent_lessons
+from lessons.serializers import LessonSerializer
+
+SEED = 20240101
+
+
+class Command(BaseCommand):
+    help = 'Time the fast lesson representations against LessonSerializer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lessons', type=int, default=1000,
+                            help='Number of lessons to seed (default: 1000)')
+        parser.add_argument('--rounds', type=int, default=5,
+                            help='Timed renderings of the full catalog per path (default: 5)')
+        parser.add_argument('--seed', type=int, default=SEED, help='Random seed')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES, DEBUG=False):
+                self.stdout.write(f'Seeding {options["lessons"]} lesson(s)...')
+                self._seed(rng, options['lessons'])
+                self._benchmark(options['rounds'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _seed(self, rng, count):
+        """Lessons in groups with different amounts of content (including none)"""
+        generator = synthetic.Generator(seed=rng.randrange(2 ** 32))
+        groups = 10
+        for group in range(groups):
+            size = count // groups + (1 if group < count % groups else 0)
+            generator.lessons(
+                size,
+                audio_files=rng.randint(0, 3),
+                pdf_files=rng.randint(0, 2),
+                questions=rng.randint(0, 5),
+                choices=rng.randint(0, 5),
+                faqs=rng.randint(0, 3),
+                start_number=group * count + 1,
+                inactive_ratio=0.2,
+            )
+        ids = list(Lesson.objects.values_list('pk', flat=True))
+        Lesson.objects.filter(pk__in=rng.sample(ids, len(ids) // 2)).update(
+            thumbnail='https://img.youtube.com/vi/example/hqdefault.jpg'
+        )
+
+    def _render_serializer(self, queryset, fields):
+        data = LessonSerializer(queryset.with_content(relations=fields), many=True, fields=fields).data
+        return JSONRenderer().render(data)
+
+    def _render_fast(self, queryset, fields):
+        return JSONRenderer().render(represent_lessons(lesson_values(queryset), fields))
+
+    def _benchmark(self, rounds):
+        queryset = Lesson.objects.all()
+        count = queryset.count()
+        timings = {}
+        for name, render in (('LessonSerializer', self._render_serializer), ('representations', self._render_fast)):
+            best = None
+            for _ in range(rounds):
+                started = time.perf_counter()
+                body = render(queryset, None)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+            self.stdout.write(
+                f'{name:18} {count} lessons: {best * 1000:8.1f} ms '
+                f'({best / count * 1e6:6.1f} us/lesson, {len(body) / 1024:,.0f} KiB)'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Speedup: {timings["LessonSerializer"] / timings["representations"]:.1f}x'
+        ))
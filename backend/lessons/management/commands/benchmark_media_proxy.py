@@ -0,0 +1,211 @@
+"""
+Management command to check and time the media proxy against a local upstream stand-in
+Usage: python manage.py benchmark_media_proxy
+       python manage.py benchmark_media_proxy --files 20 --size-kib 2048 --clients 32 --latency-ms 200
+
+A local HTTP server stands in for Google Drive (MEDIA_PROXY_UPSTREAM_URL is
+pointed at it): it serves deterministic bytes for every file id after
+--latency-ms and counts its downloads. The files belong to seeded lessons in
+a throwaway test database and are cached in a temporary directory, so neither
+the configured database nor MEDIA_CACHE_ROOT is touched. The command checks
+that every response body matches the upstream bytes and reports:
+- cold: --clients threads asking for the same uncached file at once, and the
+  number of upstream downloads they caused (1 when coalesced)
+- full / range: warm whole-file and random Range requests through the view
+- eviction: the cache size after downloading every file with
+  MEDIA_CACHE_MAX_BYTES at half of their total
+"""
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from lessons import media, synthetic
+from lessons.models import AudioFile
+
+SEED = 20240101
+
+
+def upstream_bytes(file_id, size):
+    """The content the stand-in serves for `file_id`"""
+    return random.Random(file_id).randbytes(size)
+
+
+class Upstream(ThreadingHTTPServer):
+    """Drive stand-in on a free local port, serving GET /download?id=<file id>"""
+    daemon_threads = True
+
+    def __init__(self, size, latency):
+        self.size = size
+        self.latency = latency
+        self.downloads = Counter()
+        self.lock = threading.Lock()
+        super().__init__(('127.0.0.1', 0), UpstreamHandler)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/download?id={{file_id}}'
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        file_id = parse_qs(urlsplit(self.path).query).get('id', [''])[0]
+        with self.server.lock:
+            self.server.downloads[file_id] += 1
+        time.sleep(self.server.latency)
+        body = upstream_bytes(file_id, self.server.size)
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = 'Check and time the caching media proxy against a local upstream stand-in'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=10,
+                            help='Number of audio files to seed (default: 10)')
+        parser.add_argument('--size-kib', type=int, default=1024,
+                            help='Size of every upstream file in KiB (default: 1024)')
+        parser.add_argument('--clients', type=int, default=16,
+                            help='Concurrent first requests for the same file (default: 16)')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Measured requests per warm scenario (default: 200)')
+        parser.add_argument('--latency-ms', type=float, default=100,
+                            help='Delay before the stand-in answers, in ms (default: 100)')
+
+    def handle(self, *args, **options):
+        size = options['size_kib'] * 1024
+        upstream = Upstream(size, options['latency_ms'] / 1000)
+        threading.Thread(target=upstream.serve_forever, daemon=True).start()
+        root = tempfile.mkdtemp(prefix='media-cache-')
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(MEDIA_CACHE_ROOT=root, MEDIA_PROXY_UPSTREAM_URL=upstream.url,
+                                   MEDIA_PROXY_FETCHER='lessons.media.DriveFetcher',
+                                   MEDIA_CACHE_MAX_BYTES=size * options['files'] * 2, DEBUG=False):
+                synthetic.Generator(seed=SEED).lessons(options['files'], audio_files=1, pdf_files=0,
+                                                       questions=0, faqs=0)
+                files = list(AudioFile.objects.order_by('pk').values_list('pk', 'drive_file_id'))
+                self._cold(upstream, files[0][1], options['clients'])
+                self._warm(upstream, files, size, options['requests'])
+                self._eviction(files, size)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            upstream.shutdown()
+            shutil.rmtree(root, ignore_errors=True)
+
+    def _cold(self, upstream, file_id, clients):
+        media_cache = media.get_media_cache()
+        barrier = threading.Barrier(clients)
+        latencies = []
+        errors = []
+
+        def fetch():
+            barrier.wait()
+            started = time.perf_counter()
+            try:
+                media_cache.get(file_id)
+            except Exception as e:
+                errors.append(e)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        threads = [threading.Thread(target=fetch) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise CommandError(f'cold: {errors[0]}')
+        downloads = upstream.downloads[file_id]
+        self.stdout.write(
+            f'cold: {clients} concurrent first requests, {downloads} upstream download(s), '
+            f'max latency {max(latencies):.0f} ms'
+        )
+        if downloads != 1:
+            raise CommandError(f'cold: expected 1 upstream download, got {downloads}')
+
+    def _warm(self, upstream, files, size, count):
+        client = Client()
+        rng = random.Random(SEED)
+        expected = {file_id: upstream_bytes(file_id, size) for _, file_id in files}
+
+        def full(index):
+            pk, file_id = files[index % len(files)]
+            return client.get(f'/api/audio-files/{pk}/stream'), expected[file_id]
+
+        def ranged(index):
+            pk, file_id = files[index % len(files)]
+            start = rng.randrange(size)
+            end = min(size - 1, start + rng.randrange(64 * 1024))
+            response = client.get(f'/api/audio-files/{pk}/stream', HTTP_RANGE=f'bytes={start}-{end}')
+            return response, expected[file_id][start:end + 1]
+
+        # Downloads every file once, and checks the conditional and error paths
+        for pk, file_id in files:
+            response = client.get(f'/api/audio-files/{pk}/stream')
+            b''.join(response.streaming_content)
+            etag = response['ETag']
+            if client.get(f'/api/audio-files/{pk}/stream', HTTP_IF_NONE_MATCH=etag).status_code != 304:
+                raise CommandError('If-None-Match did not return 304')
+            if client.get(f'/api/audio-files/{pk}/stream', HTTP_RANGE=f'bytes={size}-').status_code != 416:
+                raise CommandError('An unsatisfiable range did not return 416')
+        before = sum(upstream.downloads.values())
+
+        self.stdout.write(f'{"scenario":10} {"reqs":>5} {"p50 ms":>8} {"p95 ms":>8} {"MiB/s":>8}')
+        for name, request in (('full', full), ('range', ranged)):
+            latencies = []
+            sent = 0
+            started = time.perf_counter()
+            for index in range(count):
+                request_started = time.perf_counter()
+                response, body = request(index)
+                content = b''.join(response.streaming_content)
+                latencies.append((time.perf_counter() - request_started) * 1000)
+                if response.status_code not in (200, 206) or content != body:
+                    raise CommandError(f'{name}: response {index} does not match the upstream bytes')
+                if name == 'range' and int(response['Content-Length']) != len(body):
+                    raise CommandError(f'{name}: wrong Content-Length')
+                sent += len(content)
+            elapsed = time.perf_counter() - started
+            latencies.sort()
+            self.stdout.write(
+                f'{name:10} {count:>5} {statistics.median(latencies):>8.2f} '
+                f'{percentile(latencies, 0.95):>8.2f} {sent / elapsed / 1024 ** 2:>8.1f}'
+            )
+        if sum(upstream.downloads.values()) != before:
+            raise CommandError('Warm requests went upstream')
+
+    def _eviction(self, files, size):
+        limit = size * len(files) // 2
+        with override_settings(MEDIA_CACHE_MAX_BYTES=limit):
+            media_cache = media.get_media_cache()
+            media_cache.evict()
+            for _, file_id in files:
+                media_cache.get(file_id)
+        used = sum(path.stat().st_size for path in media_cache.root.iterdir() if not path.name.startswith('.')
+                   and path.suffix != '.json')
+        self.stdout.write(f'eviction: {used / 1024 ** 2:.1f} MiB cached with a {limit / 1024 ** 2:.1f} MiB limit')
+        if used > limit:
+            raise CommandError('eviction: cache exceeds MEDIA_CACHE_MAX_BYTES')
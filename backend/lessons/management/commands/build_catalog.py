@@ -0,0 +1,18 @@
+"""
+Management command to build the catalog snapshot bundle
+Usage: python manage.py build_catalog
+"""
+from django.core.management.base import BaseCommand
+
+from lessons import catalog
+
+
+class Command(BaseCommand):
+    help = 'Build the versioned catalog snapshot (JSON, gzip, brotli) and update its manifest'
+
+    def handle(self, *args, **options):
+        manifest = catalog.build()
+        self.stdout.write(self.style.SUCCESS(
+            f"Catalog {manifest['hash']}: {manifest['lessons']} lesson(s), "
+            f"{manifest['size']:,} bytes at {manifest['url']}"
+        ))
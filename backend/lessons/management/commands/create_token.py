@@ -5,6 +5,7 @@ Usage: python manage.py create_token <username>
 """
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
+from django.db import transaction
 from rest_framework.authtoken.models import Token
 
 
@@ -43,9 +44,11 @@ class Command(BaseCommand):
                 defaults={'key': token_string}
             )
             if not created and token.key != token_string:
-                # Update existing token
-                token.key = token_string
-                token.save()
+                # The key is the primary key, so rotating means replacing the row;
+                # deleting the old token revokes it (including cached credentials)
+                with transaction.atomic():
+                    token.delete()
+                    token = Token.objects.create(user=user, key=token_string)
                 self.stdout.write(
                     self.style.WARNING(f'Updated token for user "{username}"')
                 )
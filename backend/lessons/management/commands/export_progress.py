@@ -0,0 +1,68 @@
+"""
+Management command to export user progress as CSV or JSON Lines
+Usage: python manage.py export_progress > progress.csv
+       python manage.py export_progress --format jsonl --output progress.jsonl --completed true
+       python manage.py export_progress --date-from 2024-01-01 --date-to 2024-01-31 --lesson-from 1 --lesson-to 20
+
+Rows are streamed in chunks (see lessons/progress_export.py), so memory use
+stays flat however many rows are exported. A summary with the row count,
+the export rate and the process's peak memory is written to stderr.
+"""
+import resource
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lessons import progress_export
+
+
+class Command(BaseCommand):
+    help = 'Stream UserProgress rows as CSV or JSON Lines to a file or stdout'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='output_format', choices=sorted(progress_export.FORMATS),
+                            default='csv', help='Output format (default: csv)')
+        parser.add_argument('--output', default='-', help='File to write (default: stdout)')
+        parser.add_argument('--completed', choices=['true', 'false'],
+                            help='Only completed (true) or only unfinished (false) progress')
+        parser.add_argument('--date-field', choices=progress_export.DATE_FIELDS,
+                            help='Field --date-from/--date-to apply to (default: last_accessed)')
+        parser.add_argument('--date-from', help='ISO date or datetime (inclusive)')
+        parser.add_argument('--date-to', help='ISO date or datetime (inclusive)')
+        parser.add_argument('--lesson-from', help='Lowest lesson number (inclusive)')
+        parser.add_argument('--lesson-to', help='Highest lesson number (inclusive)')
+        parser.add_argument('--chunk-size', type=int, default=progress_export.CHUNK_SIZE,
+                            help=f'Rows fetched from the database at a time (default: {progress_export.CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        try:
+            filters = progress_export.parse_filters({
+                name: options[name]
+                for name in ('completed', 'date_field', 'date_from', 'date_to', 'lesson_from', 'lesson_to')
+                if options[name]
+            })
+        except ValueError as e:
+            raise CommandError(str(e))
+        export = progress_export.ProgressExport(filters, options['output_format'], options['chunk_size'])
+
+        started = time.perf_counter()
+        if options['output'] == '-':
+            self._write(export, sys.stdout.buffer)
+            sys.stdout.flush()
+        else:
+            with open(options['output'], 'wb') as f:
+                self._write(export, f)
+        elapsed = time.perf_counter() - started
+
+        # ru_maxrss is in KiB on Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stderr.write(
+            f'Exported {export.rows} row(s) in {elapsed:.1f}s '
+            f'({export.rows / elapsed if elapsed > 0 else 0:,.0f} rows/s, peak memory {peak:.0f} MiB)'
+        )
+
+    @staticmethod
+    def _write(export, f):
+        for chunk in export:
+            f.write(chunk)
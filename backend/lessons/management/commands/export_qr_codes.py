@@ -0,0 +1,144 @@
+"""
+Management command to export QR codes for all lessons (or a number range)
+Usage: python manage.py export_qr_codes
+       python manage.py export_qr_codes --from 1 --to 50 --format png,svg --contact-sheet
+"""
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image, ImageDraw, ImageFont
+
+from lessons import qr
+from lessons.models import Lesson
+
+# A4 at 300 dpi
+SHEET_SIZE = (2480, 3508)
+SHEET_COLUMNS = 4
+SHEET_ROWS = 5
+SHEET_MARGIN = 120
+LABEL_HEIGHT = 60
+
+
+def _render_to_store(job):
+    """Worker: render one QR image into the store (runs in a child process)"""
+    url, path, image_format = job
+    qr.write_atomic(path, qr.render(url, image_format))
+    return path
+
+
+class Command(BaseCommand):
+    help = 'Export QR codes for lessons as a ZIP, with an optional print-ready contact sheet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', type=int, default=None,
+                            help='First lesson number to export (inclusive)')
+        parser.add_argument('--to', dest='end', type=int, default=None,
+                            help='Last lesson number to export (inclusive)')
+        parser.add_argument('--format', default='png',
+                            help='Comma-separated image formats: png, svg (default: png)')
+        parser.add_argument('--output', default='lesson_qr_codes.zip',
+                            help='Path of the ZIP file to write')
+        parser.add_argument('--contact-sheet', default=None, metavar='PDF',
+                            help='Also write a print-ready A4 contact sheet PDF to this path')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of worker processes (default: CPU count)')
+
+    def handle(self, *args, **options):
+        formats = [f.strip() for f in options['format'].split(',') if f.strip()]
+        unknown = set(formats) - set(qr.FORMATS)
+        if not formats or unknown:
+            raise CommandError(f'Unsupported format(s): {", ".join(sorted(unknown)) or "none given"}')
+
+        lessons = Lesson.objects.order_by('number')
+        if options['start'] is not None:
+            lessons = lessons.filter(number__gte=options['start'])
+        if options['end'] is not None:
+            lessons = lessons.filter(number__lte=options['end'])
+        lessons = list(lessons.values_list('pk', 'number'))
+        if not lessons:
+            self.stdout.write(self.style.WARNING('No lessons in the requested range.'))
+            return
+
+        # The contact sheet is built from the PNG images
+        needed_formats = set(formats)
+        if options['contact_sheet']:
+            needed_formats.add('png')
+
+        # Images are stored under a digest of the encoded URL, so an existing
+        # file means the lesson's URL has not changed since the last run
+        jobs = []
+        skipped = 0
+        for pk, _ in lessons:
+            url = qr.lesson_url(pk)
+            for image_format in sorted(needed_formats):
+                path = qr.get_path(pk, image_format)
+                if path.exists():
+                    skipped += 1
+                else:
+                    jobs.append((url, path, image_format))
+
+        started = time.perf_counter()
+        if jobs:
+            workers = max(1, min(options['workers'], len(jobs)))
+            if workers == 1:
+                for job in jobs:
+                    _render_to_store(job)
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    for _ in pool.map(_render_to_store, jobs, chunksize=max(1, len(jobs) // (workers * 4))):
+                        pass
+        elapsed = time.perf_counter() - started
+
+        self._write_zip(options['output'], lessons, formats)
+        if options['contact_sheet']:
+            self._write_contact_sheet(options['contact_sheet'], lessons)
+
+        rate = len(jobs) / elapsed if elapsed > 0 else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {len(lessons)} lesson(s) to {options["output"]}: '
+            f'{len(jobs)} image(s) generated, {skipped} unchanged and reused'
+        ))
+        if jobs:
+            self.stdout.write(f'Throughput: {rate:.1f} codes/s ({elapsed:.2f}s)')
+
+    def _write_zip(self, output, lessons, formats):
+        with zipfile.ZipFile(output, 'w') as archive:
+            for pk, number in lessons:
+                for image_format in formats:
+                    # PNG is already compressed; SVG text deflates well
+                    compression = zipfile.ZIP_STORED if image_format == 'png' else zipfile.ZIP_DEFLATED
+                    archive.write(
+                        qr.get_path(pk, image_format),
+                        arcname=f'lesson_{number:03d}_qr.{image_format}',
+                        compress_type=compression,
+                    )
+
+    def _write_contact_sheet(self, output, lessons):
+        cell_width = (SHEET_SIZE[0] - 2 * SHEET_MARGIN) // SHEET_COLUMNS
+        cell_height = (SHEET_SIZE[1] - 2 * SHEET_MARGIN) // SHEET_ROWS
+        code_size = min(cell_width, cell_height - LABEL_HEIGHT) - 40
+        font = ImageFont.load_default(size=40)
+        per_page = SHEET_COLUMNS * SHEET_ROWS
+
+        # Each page is written as soon as it is drawn (appended to the PDF
+        # after the first), so memory stays at one page whatever the range
+        for offset in range(0, len(lessons), per_page):
+            # Grayscale: a third of the memory of RGB for black-and-white codes
+            page = Image.new('L', SHEET_SIZE, 'white')
+            draw = ImageDraw.Draw(page)
+            for index, (pk, number) in enumerate(lessons[offset:offset + per_page]):
+                column, row = index % SHEET_COLUMNS, index // SHEET_COLUMNS
+                left = SHEET_MARGIN + column * cell_width
+                top = SHEET_MARGIN + row * cell_height
+                with Image.open(qr.get_path(pk, 'png')) as code:
+                    code = code.convert('L').resize((code_size, code_size), Image.NEAREST)
+                page.paste(code, (left + (cell_width - code_size) // 2, top))
+                draw.text(
+                    (left + cell_width // 2, top + code_size + LABEL_HEIGHT // 2),
+                    f'Lesson {number}', fill='black', font=font, anchor='mm',
+                )
+            page.save(output, 'PDF', resolution=300, append=offset > 0)
+            page.close()
@@ -0,0 +1,33 @@
+"""
+Management command to rebuild the UserProgress rollup tables from scratch
+Usage: python manage.py rebuild_progress_rollups
+       python manage.py rebuild_progress_rollups --verify-only
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from lessons import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-lesson and per-day progress rollups and verify them against UserProgress'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Only compare the rollups with the raw data, without rebuilding'
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            lesson_count, day_count = rollups.rebuild()
+            self.stdout.write(
+                self.style.SUCCESS(f'Rebuilt rollups for {lesson_count} lesson(s) and {day_count} day(s)')
+            )
+
+        mismatches = rollups.verify()
+        if mismatches:
+            for mismatch in mismatches:
+                self.stdout.write(self.style.ERROR(f'  {mismatch}'))
+            raise CommandError(f'{len(mismatches)} rollup mismatch(es) found')
+        self.stdout.write(self.style.SUCCESS('Rollups match the raw progress data'))
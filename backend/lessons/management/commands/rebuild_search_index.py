@@ -0,0 +1,31 @@
+"""
+Management command to rebuild the lesson search index
+Usage: python manage.py rebuild_search_index
+       python manage.py rebuild_search_index --chunk-size 500
+
+Rewrites the search document of every lesson from its current content (see
+lessons/search.py); the full-text index is updated by the database.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from lessons import search
+
+
+class Command(BaseCommand):
+    help = 'Rewrite the normalized search documents of all lessons'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Lessons indexed per transaction (default: 1000)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        indexed = search.rebuild(
+            chunk_size=options['chunk_size'],
+            on_progress=lambda done, total: self.stdout.write(f'  {done}/{total} lesson(s)'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {indexed} lesson(s) in {time.perf_counter() - started:.1f}s'
+        ))
@@ -1,86 +1,129 @@
 """
-Management command to seed initial lesson data
+Management command to seed the database with synthetic lessons, users and progress
 Usage: python manage.py seed_lessons
+       python manage.py seed_lessons --lessons 1000 --users 10000 --progress-density 0.1
+       python manage.py seed_lessons --flush --seed 7 --questions-per-lesson 5
+       python manage.py seed_lessons --flush --noinput
 """
-from django.core.management.base import BaseCommand
+import sys
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+
+from lessons import synthetic
 from lessons.models import Lesson
 
 
 class Command(BaseCommand):
-    help = 'Seeds the database with initial lesson data'
+    help = 'Seeds the database with deterministic synthetic lessons, users and progress'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lessons', type=int, default=5, help='Number of lessons (default: 5)')
+        parser.add_argument('--audio-per-lesson', type=int, default=1)
+        parser.add_argument('--pdf-per-lesson', type=int, default=1)
+        parser.add_argument('--questions-per-lesson', type=int, default=3)
+        parser.add_argument('--choices-per-question', type=int, default=4)
+        parser.add_argument('--faqs-per-lesson', type=int, default=2)
+        parser.add_argument('--inactive-ratio', type=float, default=0.0,
+                            help='Share of lessons created inactive (default: 0)')
+        parser.add_argument('--users', type=int, default=0, help='Number of users (default: 0)')
+        parser.add_argument('--user-prefix', default='seed-user-',
+                            help='Username prefix of the generated users (default: seed-user-)')
+        parser.add_argument('--user-password', default=None,
+                            help='Password of every generated user (default: unusable password)')
+        parser.add_argument('--progress-density', type=float, default=0.1,
+                            help='Share of the lessons each user has progress on (default: 0.1)')
+        parser.add_argument('--completed-ratio', type=float, default=0.6,
+                            help='Share of progress rows that are completed (default: 0.6)')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Rows per INSERT statement (default: 2000)')
+        parser.add_argument('--chunk-size', type=int, default=20000,
+                            help='Rows per transaction (default: 20000)')
+        parser.add_argument('--flush', action='store_true',
+                            help='Delete ALL lessons (not only generated ones), all progress and '
+                                 'previously generated users first; asks for confirmation')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Do not ask for confirmation of --flush')
 
     def handle(self, *args, **options):
-        lessons_data = [
-            {
-                'number': 1,
-                'title': 'مقدمة في الأساسيات',
-                'description': 'تعرف على الحروف العربية وكيفية نطقها بشكل صحيح مع أمثلة بسيطة.',
-                'youtube_id': 'dQw4w9WgXcQ',
-                'audio_file_id': 'audio_001',
-                'pdf_file_id': 'pdf_001',
-                'duration': '10:00',
-            },
-            {
-                'number': 2,
-                'title': 'فهم المفاهيم الأساسية',
-                'description': 'شرح قواعد النحو البسيطة وتكوين الجمل الاسمية والفعلية.',
-                'youtube_id': 'M7lc1UVf-VE',
-                'audio_file_id': 'audio_002',
-                'pdf_file_id': 'pdf_002',
-                'duration': '15:30',
-            },
-            {
-                'number': 3,
-                'title': 'التطبيق العملي',
-                'description': 'تمارين عملية على القراءة والكتابة لتعزيز المهارات المكتسبة.',
-                'youtube_id': 'ScMzIvxBSi4',
-                'audio_file_id': 'audio_003',
-                'pdf_file_id': 'pdf_003',
-                'duration': '12:45',
-            },
-            {
-                'number': 4,
-                'title': 'حل المشاكل المتقدمة',
-                'description': 'استراتيجيات متقدمة لفهم النصوص المعقدة وتحليلها.',
-                'youtube_id': 'L_jWHffIx5E',
-                'audio_file_id': 'audio_004',
-                'pdf_file_id': 'pdf_004',
-                'duration': '20:00',
-            },
-            {
-                'number': 5,
-                'title': 'المراجعة والتقييم',
-                'description': 'مراجعة شاملة لجميع الدروس السابقة مع اختبار قصير.',
-                'youtube_id': 'tgbNymZ7vqY',
-                'audio_file_id': 'audio_005',
-                'pdf_file_id': 'pdf_005',
-                'duration': '08:15',
-            },
-        ]
+        if options['flush']:
+            if options['interactive']:
+                answer = input(
+                    f'This deletes ALL {Lesson.objects.count()} lesson(s) with their content and all progress, '
+                    f'and every user whose username starts with {options["user_prefix"]!r}.\n'
+                    "Type 'yes' to continue: "
+                )
+                if answer != 'yes':
+                    raise CommandError('Flush cancelled.')
+            synthetic.flush(options['user_prefix'])
+            self.stdout.write(self.style.WARNING('Deleted existing lessons and generated users'))
+
+        self._stage_started = time.perf_counter()
+        generator = synthetic.Generator(
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            chunk_size=options['chunk_size'],
+            on_progress=self._report,
+        )
+        started = time.perf_counter()
 
-        created_count = 0
-        updated_count = 0
+        start_number = (Lesson.objects.aggregate(Max('number'))['number__max'] or 0) + 1
+        lesson_ids = generator.lessons(
+            options['lessons'],
+            audio_files=options['audio_per_lesson'],
+            pdf_files=options['pdf_per_lesson'],
+            questions=options['questions_per_lesson'],
+            choices=options['choices_per_question'],
+            faqs=options['faqs_per_lesson'],
+            start_number=start_number,
+            inactive_ratio=options['inactive_ratio'],
+        )
 
-        for lesson_data in lessons_data:
-            lesson, created = Lesson.objects.update_or_create(
-                number=lesson_data['number'],
-                defaults=lesson_data
+        progress_rows = 0
+        if options['users']:
+            password = options['user_password']
+            user_ids = generator.users(
+                options['users'],
+                prefix=options['user_prefix'],
+                start_index=User.objects.filter(username__startswith=options['user_prefix']).count(),
+                password_hash=make_password(password) if password else make_password(None),
             )
-            if created:
-                created_count += 1
-                self.stdout.write(
-                    self.style.SUCCESS(f'Created lesson: {lesson.title}')
-                )
-            else:
-                updated_count += 1
-                self.stdout.write(
-                    self.style.WARNING(f'Updated lesson: {lesson.title}')
+            if lesson_ids and options['progress_density'] > 0:
+                progress_rows = generator.progress(
+                    user_ids, lesson_ids,
+                    density=options['progress_density'],
+                    completed_ratio=options['completed_ratio'],
                 )
 
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'\nSuccessfully processed {len(lessons_data)} lessons '
-                f'({created_count} created, {updated_count} updated)'
-            )
+        elapsed = time.perf_counter() - started
+        rows_per_lesson = (
+            1 + options['audio_per_lesson'] + options['pdf_per_lesson'] + options['faqs_per_lesson']
+            + options['questions_per_lesson'] * (1 + options['choices_per_question'])
         )
+        rows = len(lesson_ids) * rows_per_lesson + options['users'] + progress_rows
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(lesson_ids)} lesson(s) (numbers {start_number}-{start_number + len(lesson_ids) - 1}), '
+            f'{options["users"]} user(s) and {progress_rows} progress row(s): '
+            f'{rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed > 0 else 0:,.0f} rows/s)'
+        ))
 
+    def _report(self, stage, done, total):
+        """Single-line progress bar with the stage's insert rate"""
+        if done <= 0:
+            return
+        elapsed = time.perf_counter() - self._stage_started
+        width = 30
+        filled = int(width * done / total) if total else width
+        rate = done / elapsed if elapsed > 0 else 0
+        self.stdout.write(
+            f'\r{stage:>9} [{"#" * filled}{"." * (width - filled)}] {done}/{total} ({rate:,.0f}/s)',
+            ending='',
+        )
+        if done >= total:
+            self.stdout.write('')
+            self._stage_started = time.perf_counter()
+        sys.stdout.flush()
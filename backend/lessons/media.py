@@ -0,0 +1,330 @@
+"""
+Caching proxy for the Google Drive audio and PDF files.
+
+The drive.google.com download URLs are throttled, sometimes blocked and
+cannot be read cross-origin, so audio players and PDF links go through
+GET /api/audio-files/{id}/stream and /api/pdf-files/{id}/stream instead.
+Each Drive file is downloaded once into MEDIA_CACHE_ROOT (named after its
+drive_file_id, with a small JSON sidecar for the content type, size and
+digest) and served from disk with FileResponse, which hands the open file to
+the server's sendfile when it has one. Range requests are answered with 206
+from the same file, so players can seek.
+
+The cache is bounded by MEDIA_CACHE_MAX_BYTES: after each download the least
+recently served files are deleted (serving a file refreshes its mtime).
+Entries older than MEDIA_CACHE_TTL are downloaded again. Concurrent first
+requests for the same file wait for a single download: threads of a process
+through an in-flight map, processes sharing the directory through a lock
+file.
+
+Downloading is done by MEDIA_PROXY_FETCHER, a callable taking the file id
+and a binary file to write to and returning the content type. The default
+fetches MEDIA_PROXY_UPSTREAM_URL, which may point at a local stand-in.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .qr import write_atomic
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows: concurrent downloads are then only coalesced within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Skips the virus-scan interstitial Drive shows for large files
+DEFAULT_UPSTREAM_URL = 'https://drive.usercontent.google.com/download?id={file_id}&export=download&confirm=t'
+DEFAULT_FETCHER = 'lessons.media.DriveFetcher'
+
+CHUNK_SIZE = 64 * 1024
+# Serving a file refreshes its mtime (its LRU position) at most this often
+TOUCH_INTERVAL = 60
+
+_FILE_ID = re.compile(r'[A-Za-z0-9_-]+')
+_RANGE = re.compile(r'bytes=(\d*)-(\d*)')
+
+# A cached file: its path, content type, size in bytes and content digest
+Entry = namedtuple('Entry', ['path', 'content_type', 'size', 'digest'])
+
+
+class UpstreamError(Exception):
+    """The file could not be downloaded from the upstream"""
+
+
+class DriveFetcher:
+    """Downloads Drive files over a pooled requests session"""
+
+    def __init__(self, url=None, timeout=None):
+        self.url = url or getattr(settings, 'MEDIA_PROXY_UPSTREAM_URL', DEFAULT_UPSTREAM_URL)
+        self.timeout = timeout or getattr(settings, 'MEDIA_PROXY_TIMEOUT', 30)
+        self.session = requests.Session()
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=8))
+        self.session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=8))
+
+    def __call__(self, file_id, f):
+        try:
+            with self.session.get(self.url.format(file_id=file_id), stream=True, timeout=self.timeout) as response:
+                if response.status_code != 200:
+                    raise UpstreamError(f'Upstream answered {response.status_code} for {file_id}')
+                content_type = response.headers.get('Content-Type', 'application/octet-stream').split(';')[0].strip()
+                # Files that are not shared publicly come back as a sign-in or error page
+                if content_type == 'text/html':
+                    raise UpstreamError(f'Upstream returned an HTML page instead of {file_id}')
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+        except requests.RequestException as e:
+            raise UpstreamError(f'Could not download {file_id}: {e}') from e
+        return content_type
+
+
+class _Writer:
+    """Writes a download to a temporary file, hashing it and enforcing the size limit"""
+
+    def __init__(self, f, max_bytes):
+        self.f = f
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hash = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise UpstreamError(f'File is larger than MEDIA_CACHE_MAX_FILE_BYTES ({self.max_bytes})')
+        self.hash.update(data)
+        self.f.write(data)
+
+
+class MediaCache:
+    """Size-bounded LRU directory of downloaded files, keyed by Drive file id"""
+
+    def __init__(self, root, fetcher, max_bytes, max_file_bytes=0, ttl=0, wait_timeout=300):
+        self.root = Path(root)
+        self.fetcher = fetcher
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        # file id -> Event set when the download in progress finishes
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, file_id):
+        return self.root / file_id, self.root / f'{file_id}.json'
+
+    def lookup(self, file_id):
+        """The cached Entry for `file_id`, or None if it is missing or expired"""
+        path, meta_path = self._paths(file_id)
+        try:
+            with open(meta_path, 'rb') as f:
+                meta = json.load(f)
+            mtime = path.stat().st_mtime
+        except (OSError, ValueError):
+            return None
+        if self.ttl and time.time() - meta.get('fetched_at', 0) > self.ttl:
+            return None
+        if time.time() - mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except OSError:
+                return None
+        return Entry(path, meta['content_type'], meta['size'], meta['digest'])
+
+    def get(self, file_id):
+        """
+        The Entry for `file_id`, downloading it first if it is not cached.
+        Raises UpstreamError if the download fails.
+        """
+        if not _FILE_ID.fullmatch(file_id or ''):
+            raise ValueError(f'Invalid file id: {file_id!r}')
+        entry = self.lookup(file_id)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        with self._lock:
+            event = self._inflight.get(file_id)
+            leader = event is None
+            if leader:
+                event = self._inflight[file_id] = threading.Event()
+        if not leader:
+            # Another thread of this process is downloading it
+            event.wait(self.wait_timeout)
+            entry = self.lookup(file_id)
+            if entry is None:
+                raise UpstreamError(f'Download of {file_id} failed')
+            self.hits += 1
+            return entry
+
+        try:
+            return self._download(file_id)
+        finally:
+            with self._lock:
+                del self._inflight[file_id]
+            event.set()
+
+    def _download(self, file_id):
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / f'.{file_id}.lock', 'wb') as lock_file:
+            if fcntl is not None:
+                # Another process may be downloading it: wait, then use its copy
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                entry = self.lookup(file_id)
+                if entry is not None:
+                    self.hits += 1
+                    return entry
+
+            self.misses += 1
+            path, meta_path = self._paths(file_id)
+            started = time.perf_counter()
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as tmp:
+                    writer = _Writer(tmp, self.max_file_bytes)
+                    content_type = self.fetcher(file_id, writer)
+                os.chmod(tmp_path, 0o644)
+                # Replacing an expired copy: stop serving its sidecar first
+                meta_path.unlink(missing_ok=True)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            # The sidecar last: an entry without one is never served
+            meta = {
+                'content_type': content_type,
+                'size': writer.size,
+                'digest': writer.hash.hexdigest()[:16],
+                'fetched_at': time.time(),
+            }
+            write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+            logger.info('Cached %s (%d bytes) in %.0f ms', file_id, writer.size,
+                        (time.perf_counter() - started) * 1000)
+
+        self.evict(keep=file_id)
+        return Entry(path, content_type, meta['size'], meta['digest'])
+
+    def evict(self, keep=None):
+        """Delete the least recently served files until the cache fits in max_bytes"""
+        files = []
+        total = 0
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or entry.name.endswith('.json') or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.name))
+                total += stat.st_size
+        files.sort()
+        for _, size, name in files:
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            path, meta_path = self._paths(name)
+            # Sidecar first, so the entry stops being served before its data goes;
+            # responses that already opened the file keep reading it
+            meta_path.unlink(missing_ok=True)
+            path.unlink(missing_ok=True)
+            (self.root / f'.{name}.lock').unlink(missing_ok=True)
+            total -= size
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'downloading': len(self._inflight)}
+
+
+_media_cache = None
+_media_cache_key = None
+_media_cache_lock = threading.Lock()
+
+
+def get_media_cache():
+    """Return the process-wide media cache, rebuilt when its settings change"""
+    global _media_cache, _media_cache_key
+    key = (
+        Path(getattr(settings, 'MEDIA_CACHE_ROOT', Path(settings.BASE_DIR) / 'media_cache')),
+        getattr(settings, 'MEDIA_PROXY_FETCHER', DEFAULT_FETCHER),
+        getattr(settings, 'MEDIA_PROXY_UPSTREAM_URL', DEFAULT_UPSTREAM_URL),
+        getattr(settings, 'MEDIA_CACHE_MAX_BYTES', 2 * 1024 ** 3),
+        getattr(settings, 'MEDIA_CACHE_MAX_FILE_BYTES', 200 * 1024 ** 2),
+        getattr(settings, 'MEDIA_CACHE_TTL', 7 * 24 * 3600),
+    )
+    with _media_cache_lock:
+        if _media_cache is None or _media_cache_key != key:
+            root, fetcher, _, max_bytes, max_file_bytes, ttl = key
+            _media_cache = MediaCache(root, import_string(fetcher)(), max_bytes, max_file_bytes, ttl)
+            _media_cache_key = key
+        return _media_cache
+
+
+def parse_range(header, size):
+    """
+    (start, end), inclusive, of a single-range `Range: bytes=...` header.
+    None when the whole file should be sent (no header, an invalid one such
+    as bytes=5-3, or one this does not handle such as multiple ranges);
+    raises ValueError if unsatisfiable (RFC 9110: a start at or past the end
+    of the file, or a zero suffix length).
+    """
+    match = _RANGE.fullmatch((header or '').strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        # bytes=-N: the last N bytes
+        if not last:
+            return None
+        length = int(last)
+        if length == 0:
+            raise ValueError('Unsatisfiable range')
+        if size == 0:
+            # Satisfiable, but there are no bytes to slice: send the empty file
+            return None
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError('Unsatisfiable range')
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+class RangeFile:
+    """
+    Read-only view of bytes start..end of an open file for FileResponse.
+    fileno() is kept, so servers using sendfile (gunicorn) send the range
+    straight from the file, starting at its current position and stopping
+    at Content-Length; read() stops at the end of the range otherwise.
+    """
+
+    def __init__(self, f, start, end):
+        self.f = f
+        f.seek(start)
+        self.remaining = end - start + 1
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.f.fileno()
+
+    def close(self):
+        self.f.close()
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0005_content_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCompletionStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('completed_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily Completion Stats',
+                'verbose_name_plural': 'Daily Completion Stats',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LessonProgressStats',
+            fields=[
+                ('lesson', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='progress_stats', serialize=False, to='lessons.lesson')),
+                ('started_count', models.IntegerField(default=0)),
+                ('completed_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Lesson Progress Stats',
+                'verbose_name_plural': 'Lesson Progress Stats',
+                'ordering': ['lesson'],
+            },
+        ),
+    ]
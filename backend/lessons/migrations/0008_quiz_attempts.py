@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-17 19:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0007_revoked_tokens'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveSmallIntegerField()),
+                ('total', models.PositiveSmallIntegerField()),
+                ('choices', models.JSONField(default=list, help_text='Ids of the selected choices')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_attempts', to='lessons.lesson')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_attempts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Quiz Attempt',
+                'verbose_name_plural': 'Quiz Attempts',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'lesson', '-created_at'], name='lessons_qui_user_id_6554a9_idx')],
+            },
+        ),
+    ]
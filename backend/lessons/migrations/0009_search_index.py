@@ -0,0 +1,95 @@
+# Generated by Django 5.0.1 on 2026-10-17 19:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The full-text index over LessonSearchDocument (see lessons/search.py).
+# SQLite: an external-content FTS5 table kept in sync by triggers, with the
+# document's lesson_id as rowid. PostgreSQL: a generated tsvector column
+# (title weighted A, description B, quiz and FAQs C) with a GIN index.
+# Other databases get no index; search falls back to substring matching.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE lessons_search_fts USING fts5(
+        title, description, questions, faqs,
+        content='lessons_lessonsearchdocument', content_rowid='lesson_id'
+    )
+    """,
+    """
+    CREATE TRIGGER lessons_search_fts_insert AFTER INSERT ON lessons_lessonsearchdocument BEGIN
+        INSERT INTO lessons_search_fts(rowid, title, description, questions, faqs)
+        VALUES (new.lesson_id, new.title, new.description, new.questions, new.faqs);
+    END
+    """,
+    """
+    CREATE TRIGGER lessons_search_fts_delete AFTER DELETE ON lessons_lessonsearchdocument BEGIN
+        INSERT INTO lessons_search_fts(lessons_search_fts, rowid, title, description, questions, faqs)
+        VALUES ('delete', old.lesson_id, old.title, old.description, old.questions, old.faqs);
+    END
+    """,
+    """
+    CREATE TRIGGER lessons_search_fts_update AFTER UPDATE ON lessons_lessonsearchdocument BEGIN
+        INSERT INTO lessons_search_fts(lessons_search_fts, rowid, title, description, questions, faqs)
+        VALUES ('delete', old.lesson_id, old.title, old.description, old.questions, old.faqs);
+        INSERT INTO lessons_search_fts(rowid, title, description, questions, faqs)
+        VALUES (new.lesson_id, new.title, new.description, new.questions, new.faqs);
+    END
+    """,
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS lessons_search_fts_update',
+    'DROP TRIGGER IF EXISTS lessons_search_fts_delete',
+    'DROP TRIGGER IF EXISTS lessons_search_fts_insert',
+    'DROP TABLE IF EXISTS lessons_search_fts',
+]
+POSTGRESQL_FORWARD = [
+    """
+    ALTER TABLE lessons_lessonsearchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', title), 'A')
+        || setweight(to_tsvector('simple', description), 'B')
+        || setweight(to_tsvector('simple', questions), 'C')
+        || setweight(to_tsvector('simple', faqs), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX lessons_search_vector_idx ON lessons_lessonsearchdocument USING GIN (search_vector)',
+]
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS lessons_search_vector_idx',
+    'ALTER TABLE lessons_lessonsearchdocument DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+create_index = _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD})
+drop_index = _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0008_quiz_attempts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonSearchDocument',
+            fields=[
+                ('lesson', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='lessons.lesson')),
+                ('title', models.TextField(blank=True)),
+                ('description', models.TextField(blank=True)),
+                ('questions', models.TextField(blank=True)),
+                ('faqs', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Lesson Search Document',
+                'verbose_name_plural': 'Lesson Search Documents',
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-17 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0009_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiofile',
+            name='drive_file_id',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Google Drive file id, extracted from the link on save', max_length=128),
+        ),
+        migrations.AddField(
+            model_name='pdffile',
+            name='drive_file_id',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Google Drive file id, extracted from the link on save', max_length=128),
+        ),
+    ]
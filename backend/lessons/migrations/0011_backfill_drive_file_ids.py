@@ -0,0 +1,42 @@
+from django.db import migrations, transaction
+
+from lessons.drive import extract_file_id
+
+CHUNK_SIZE = 1000
+
+
+def backfill(apps, schema_editor):
+    """
+    Extract drive_file_id for every existing audio/PDF row, CHUNK_SIZE rows
+    per transaction. Only rows still without an id are visited, so a run that
+    was interrupted resumes where it stopped.
+    """
+    for model_name in ('AudioFile', 'PDFFile'):
+        model = apps.get_model('lessons', model_name)
+        rows = model.objects.filter(drive_file_id='').order_by('pk')
+        last_pk = 0
+        while True:
+            chunk = list(rows.filter(pk__gt=last_pk).only('pk', 'google_drive_link')[:CHUNK_SIZE])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            changed = []
+            for row in chunk:
+                row.drive_file_id = extract_file_id(row.google_drive_link)
+                if row.drive_file_id:
+                    changed.append(row)
+            with transaction.atomic():
+                model.objects.bulk_update(changed, ['drive_file_id'])
+
+
+class Migration(migrations.Migration):
+    # Each chunk commits on its own instead of the whole table in one transaction
+    atomic = False
+
+    dependencies = [
+        ('lessons', '0010_drive_file_ids'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
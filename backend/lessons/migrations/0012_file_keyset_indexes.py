@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-17 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0011_backfill_drive_file_ids'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='audiofile',
+            index=models.Index(fields=['lesson', 'order', 'created_at', 'id'], name='lessons_aud_lesson__bfcf0c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pdffile',
+            index=models.Index(fields=['lesson', 'order', 'created_at', 'id'], name='lessons_pdf_lesson__c9f78d_idx'),
+        ),
+    ]
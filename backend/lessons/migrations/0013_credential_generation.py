@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-17 20:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0012_file_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CredentialGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Credential Generation',
+                'verbose_name_plural': 'Credential Generations',
+            },
+        ),
+    ]
@@ -1,6 +1,53 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 
+from .drive import MAX_ID_LENGTH, extract_file_id
+
+
+class LessonQuerySet(models.QuerySet):
+    """QuerySet helpers for loading lessons together with their content"""
+
+    # Order of the rows of each relation nested by LessonSerializer; mirrors
+    # each model's Meta.ordering so they come back in the same order as the
+    # plain related managers. Shared with lessons/representations.py.
+    CONTENT_ORDERING = {
+        'audio_files': ('order', 'created_at'),
+        'pdf_files': ('order', 'created_at'),
+        'questions': ('order', 'created_at'),
+        'choices': ('order',),
+        'faqs': ('order', 'created_at'),
+    }
+
+    def with_content(self, relations=None):
+        """
+        Prefetch the relations nested by LessonSerializer (all of them unless
+        a subset of relation names is given), in CONTENT_ORDERING order.
+        """
+        ordering = self.CONTENT_ORDERING
+        plan = {
+            'audio_files': models.Prefetch(
+                'audio_files',
+                queryset=AudioFile.objects.order_by(*ordering['audio_files']),
+            ),
+            'pdf_files': models.Prefetch(
+                'pdf_files',
+                queryset=PDFFile.objects.order_by(*ordering['pdf_files']),
+            ),
+            'questions': models.Prefetch(
+                'questions',
+                queryset=Question.objects.order_by(*ordering['questions']).prefetch_related(
+                    models.Prefetch('choices', queryset=Choice.objects.order_by(*ordering['choices']))
+                ),
+            ),
+            'faqs': models.Prefetch(
+                'faqs',
+                queryset=LessonFAQ.objects.order_by(*ordering['faqs']),
+            ),
+        }
+        if relations is not None:
+            plan = {name: prefetch for name, prefetch in plan.items() if name in relations}
+        return self.prefetch_related(*plan.values())
+
 
 class Lesson(models.Model):
     """Model for storing lesson information"""
@@ -33,6 +80,8 @@ class Lesson(models.Model):
         help_text="Whether the lesson is active and visible"
     )
 
+    objects = LessonQuerySet.as_manager()
+
     class Meta:
         ordering = ['number']
         verbose_name = "Lesson"
@@ -58,20 +107,37 @@ class AudioFile(models.Model):
     google_drive_link = models.URLField(
         help_text="Full Google Drive shareable link to the audio file"
     )
+    drive_file_id = models.CharField(
+        max_length=MAX_ID_LENGTH,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Google Drive file id, extracted from the link on save"
+    )
     order = models.PositiveIntegerField(
         default=0,
         help_text="Order of display (lower numbers appear first)"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['lesson', 'order', 'created_at']
+        # Seek index of FileCursorPagination's (lesson, order, created_at, id) keyset
+        indexes = [models.Index(fields=['lesson', 'order', 'created_at', 'id'])]
         verbose_name = "Audio File"
         verbose_name_plural = "Audio Files"
 
     def __str__(self):
         return f"Audio: {self.lesson.title} - {self.title or 'Untitled'}"
 
+    def save(self, *args, **kwargs):
+        self.drive_file_id = extract_file_id(self.google_drive_link)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'google_drive_link' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'drive_file_id'}
+        super().save(*args, **kwargs)
+
 
 class PDFFile(models.Model):
     """Model for storing PDF file links (Google Drive)"""
@@ -88,20 +154,37 @@ class PDFFile(models.Model):
     google_drive_link = models.URLField(
         help_text="Full Google Drive shareable link to the PDF file"
     )
+    drive_file_id = models.CharField(
+        max_length=MAX_ID_LENGTH,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Google Drive file id, extracted from the link on save"
+    )
     order = models.PositiveIntegerField(
         default=0,
         help_text="Order of display (lower numbers appear first)"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['lesson', 'order', 'created_at']
+        # Seek index of FileCursorPagination's (lesson, order, created_at, id) keyset
+        indexes = [models.Index(fields=['lesson', 'order', 'created_at', 'id'])]
         verbose_name = "PDF File"
         verbose_name_plural = "PDF Files"
 
     def __str__(self):
         return f"PDF: {self.lesson.title} - {self.title}"
 
+    def save(self, *args, **kwargs):
+        self.drive_file_id = extract_file_id(self.google_drive_link)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'google_drive_link' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'drive_file_id'}
+        super().save(*args, **kwargs)
+
 
 class UserProgress(models.Model):
     """Model for tracking user progress on lessons"""
@@ -128,6 +211,77 @@ class UserProgress(models.Model):
         return f"{self.user.username} - {self.lesson.title}"
 
 
+class LessonProgressStats(models.Model):
+    """Rollup of UserProgress per lesson, maintained incrementally (see lessons/rollups.py)"""
+    lesson = models.OneToOneField(
+        Lesson,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='progress_stats'
+    )
+    started_count = models.IntegerField(default=0)
+    completed_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['lesson']
+        verbose_name = "Lesson Progress Stats"
+        verbose_name_plural = "Lesson Progress Stats"
+
+    def __str__(self):
+        return f"{self.lesson.title}: {self.completed_count}/{self.started_count}"
+
+
+class DailyCompletionStats(models.Model):
+    """Rollup of lesson completions per day, maintained incrementally (see lessons/rollups.py)"""
+    date = models.DateField(unique=True)
+    completed_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name = "Daily Completion Stats"
+        verbose_name_plural = "Daily Completion Stats"
+
+    def __str__(self):
+        return f"{self.date}: {self.completed_count}"
+
+
+class RevokedToken(models.Model):
+    """
+    A revoked JWT (by jti), or all JWTs of a user issued before revoked_at.
+    Checked in memory by lessons.authentication.StatelessJWTAuthentication;
+    rows are pruned once every token they cover has expired.
+    """
+    jti = models.CharField(max_length=255, blank=True, db_index=True)
+    # Not a foreign key: revocations must outlive a deleted user
+    user_id = models.IntegerField(null=True, blank=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Revoked Token"
+        verbose_name_plural = "Revoked Tokens"
+
+    def __str__(self):
+        return f"jti {self.jti}" if self.jti else f"user {self.user_id} before {self.revoked_at}"
+
+
+class CredentialGeneration(models.Model):
+    """
+    Single-row counter bumped in the transaction that rotates or deletes a
+    DRF token or deactivates a user. Cached token credentials are tagged
+    with it (see lessons.authentication), so every process sees a
+    revocation on its next request, whatever the cache backend.
+    """
+    value = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Credential Generation"
+        verbose_name_plural = "Credential Generations"
+
+    def __str__(self):
+        return f"generation {self.value}"
+
+
 class Question(models.Model):
     """Model for storing MCQ questions"""
     lesson = models.ForeignKey(
@@ -142,6 +296,7 @@ class Question(models.Model):
         help_text="Order of display"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['order', 'created_at']
@@ -166,6 +321,7 @@ class Choice(models.Model):
         default=0,
         help_text="Order of display"
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['order']
@@ -176,6 +332,65 @@ class Choice(models.Model):
         return f"{self.question.text[:30]} - {self.text}"
 
 
+class QuizAttempt(models.Model):
+    """
+    A graded quiz submission (see lessons/quiz.py). Only the selected choice
+    ids are stored; which question each belongs to and whether it was right
+    can be derived from the Choice rows.
+    """
+    user = models.ForeignKey(
+        'auth.User',
+        on_delete=models.CASCADE,
+        related_name='quiz_attempts'
+    )
+    lesson = models.ForeignKey(
+        Lesson,
+        on_delete=models.CASCADE,
+        related_name='quiz_attempts'
+    )
+    score = models.PositiveSmallIntegerField()
+    total = models.PositiveSmallIntegerField()
+    choices = models.JSONField(default=list, help_text="Ids of the selected choices")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['user', 'lesson', '-created_at'])]
+        verbose_name = "Quiz Attempt"
+        verbose_name_plural = "Quiz Attempts"
+
+    def __str__(self):
+        return f"{self.user.username} - {self.lesson.title}: {self.score}/{self.total}"
+
+
+class LessonSearchDocument(models.Model):
+    """
+    Normalized text of a lesson, its quiz and its FAQs, maintained by
+    lessons/search.py. The full-text index over it (an FTS5 table on SQLite,
+    a tsvector column with a GIN index on PostgreSQL) is created by migration
+    0009 and kept in sync by the database itself.
+    """
+    lesson = models.OneToOneField(
+        Lesson,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+    title = models.TextField(blank=True)
+    description = models.TextField(blank=True)
+    # Question and choice texts, one per line
+    questions = models.TextField(blank=True)
+    # FAQ questions and answers, one per line
+    faqs = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Lesson Search Document"
+        verbose_name_plural = "Lesson Search Documents"
+
+    def __str__(self):
+        return self.title
+
+
 class LessonFAQ(models.Model):
     """Model for storing additional Q&A shown after quiz"""
     lesson = models.ForeignKey(
@@ -191,6 +406,7 @@ class LessonFAQ(models.Model):
         help_text="Order of display"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['order', 'created_at']
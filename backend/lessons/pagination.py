@@ -0,0 +1,170 @@
+"""
+Pagination for the lessons API.
+
+Page-number pagination runs a COUNT(*) and an OFFSET scan for every page, so
+its cost grows with the size of the table. Cursor (keyset) pagination seeks
+directly to the last row of the previous page instead. Clients opt into it
+with `?pagination=cursor` (or by following a `cursor` link); the default mode
+comes from the LESSON_PAGINATION_MODE setting.
+"""
+import json
+
+from django.conf import settings
+from django.db.models import DateTimeField, F, Field, Func, Q, Value
+from django.db.models.lookups import GreaterThan, LessThan
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+
+PAGE_MODE = 'page'
+CURSOR_MODE = 'cursor'
+
+
+class _Row(Func):
+    """A row value, (a, b, ...); row values compare element by element, like a sort key"""
+    template = '(%(expressions)s)'
+    output_field = Field()
+
+
+class LessonCursorPagination(CursorPagination):
+    """Keyset pagination on the unique Lesson.number"""
+    ordering = ('number',)
+
+
+class FileCursorPagination(CursorPagination):
+    """
+    Keyset pagination for audio/PDF files in (lesson, order, created_at, id)
+    order. DRF's CursorPagination seeks on the first ordering field only and
+    offsets within equal values of it, which is a plain OFFSET scan once the
+    list is filtered to one lesson (?lesson=). Here the cursor holds the whole
+    sort key of the row it starts after, and a page is the rows whose
+    (lesson_id, order, created_at, id) sorts after it, read from the matching
+    index with a row-value comparison. id makes the key unique, so rows inserted or deleted concurrently
+    never make a later page repeat or skip rows that were already there.
+    """
+    ordering = ('lesson_id', 'order', 'created_at', 'id')
+    # The views' filter on a single lesson
+    lesson_query_param = 'lesson'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        key = self._decode_key(self.cursor.position) if self.cursor is not None else None
+
+        if reverse:
+            queryset = queryset.order_by(*(f'-{field}' for field in self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if key is not None:
+            queryset = queryset.filter(self._beyond(key, reverse))
+
+        # One extra row tells whether there is a page beyond this one
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, key is not None
+        if not self.page:
+            # Only after concurrent deletes: there is no row to build links from
+            self.has_next = self.has_previous = False
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self._encode_key(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self._encode_key(self.page[0])))
+
+    def _beyond(self, key, reverse):
+        """
+        Rows after `key` in sort order (before it when paging backwards), as
+        a row-value comparison the database answers with an index seek. When
+        the request is filtered to the cursor's lesson, that is
+        lesson_id = key[0] AND (order, created_at, id) > key[1:].
+        """
+        lookup = LessThan if reverse else GreaterThan
+        values = [Value(key[0]), Value(key[1]), Value(key[2], output_field=DateTimeField()), Value(key[3])]
+        if self.request.query_params.get(self.lesson_query_param) == str(key[0]):
+            return Q(**{self.ordering[0]: key[0]}) & Q(lookup(_Row(*map(F, self.ordering[1:])), _Row(*values[1:])))
+        return Q(lookup(_Row(*map(F, self.ordering)), _Row(*values)))
+
+    def _encode_key(self, instance):
+        lesson_id, order, created_at, pk = (getattr(instance, field) for field in self.ordering)
+        return json.dumps([lesson_id, order, created_at.isoformat(), pk])
+
+    def _decode_key(self, position):
+        try:
+            lesson_id, order, created_at, pk = json.loads(position)
+            created_at = parse_datetime(created_at)
+            if created_at is None or not all(isinstance(value, int) for value in (lesson_id, order, pk)):
+                raise ValueError(position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return lesson_id, order, created_at, pk
+
+
+class SelectablePagination:
+    """
+    Delegates to page-number or cursor pagination depending on the request.
+    Subclasses set `cursor_class` to the keyset paginator for their model.
+    """
+    page_class = PageNumberPagination
+    cursor_class = None
+
+    def __init__(self):
+        self.paginator = None
+
+    def get_mode(self, request):
+        if CursorPagination.cursor_query_param in request.query_params:
+            return CURSOR_MODE
+        mode = request.query_params.get('pagination')
+        if mode in (PAGE_MODE, CURSOR_MODE):
+            return mode
+        return getattr(settings, 'LESSON_PAGINATION_MODE', PAGE_MODE)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.get_mode(request) == CURSOR_MODE:
+            self.paginator = self.cursor_class()
+        else:
+            self.paginator = self.page_class()
+        return self.paginator.paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_class().get_schema_operation_parameters(view)
+
+    def __getattr__(self, name):
+        # Everything else (page controls for the browsable API, ...) comes from the active paginator
+        paginator = self.__dict__.get('paginator')
+        if paginator is None:
+            raise AttributeError(name)
+        return getattr(paginator, name)
+
+
+class LessonPagination(SelectablePagination):
+    cursor_class = LessonCursorPagination
+
+
+class FilePagination(SelectablePagination):
+    cursor_class = FileCursorPagination
@@ -0,0 +1,189 @@
+"""
+Streaming export of UserProgress rows for reporting, as CSV or JSON Lines.
+
+Rows are read with iterator(chunk_size=...) (a server-side cursor where the
+database supports one) and written out in ~64 KiB chunks of a
+StreamingHttpResponse or a file, so memory use does not depend on the number
+of rows exported. Used by GET /api/progress/export/ and the export_progress
+management command, which accept the same filters (see parse_filters).
+"""
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import UserProgress
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+COLUMNS = (
+    'user_id', 'username', 'lesson_id', 'lesson_number', 'lesson_title',
+    'is_completed', 'completed_at', 'last_accessed',
+)
+DATE_FIELDS = ('last_accessed', 'completed_at')
+CHUNK_SIZE = 2000
+# Bytes collected before a chunk is handed to the response or file
+BUFFER_SIZE = 64 * 1024
+
+_BOOLEANS = {'true': True, '1': True, 'yes': True, 'false': False, '0': False, 'no': False}
+
+
+def _parse_bound(value, name):
+    """(aware datetime, whether a plain date was given) from an ISO date or datetime"""
+    try:
+        day = parse_date(value)
+        parsed = datetime.combine(day, time.min) if day is not None else parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError(f'{name} must be an ISO date or datetime')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed, day is not None
+
+
+def _parse_number(value, name):
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a lesson number')
+    if number < 1:
+        raise ValueError(f'{name} must be a lesson number')
+    return number
+
+
+def parse_filters(params):
+    """
+    Queryset filters from request query parameters or command options:
+    - completed: true/false
+    - date_field: last_accessed (default) or completed_at, the field date_from/date_to apply to
+    - date_from, date_to: ISO dates (inclusive) or datetimes
+    - lesson_from, lesson_to: lesson numbers (inclusive)
+    Raises ValueError with a message for the client.
+    """
+    filters = {}
+    completed = params.get('completed')
+    if completed:
+        if completed.lower() not in _BOOLEANS:
+            raise ValueError('completed must be true or false')
+        filters['is_completed'] = _BOOLEANS[completed.lower()]
+
+    date_field = params.get('date_field') or DATE_FIELDS[0]
+    if date_field not in DATE_FIELDS:
+        raise ValueError(f"date_field must be one of: {', '.join(DATE_FIELDS)}")
+    if params.get('date_from'):
+        filters[f'{date_field}__gte'], _ = _parse_bound(params['date_from'], 'date_from')
+    if params.get('date_to'):
+        bound, is_date = _parse_bound(params['date_to'], 'date_to')
+        if is_date:
+            # A date includes the whole day
+            filters[f'{date_field}__lt'] = bound + timedelta(days=1)
+        else:
+            filters[f'{date_field}__lte'] = bound
+    if params.get('lesson_from'):
+        filters['lesson__number__gte'] = _parse_number(params['lesson_from'], 'lesson_from')
+    if params.get('lesson_to'):
+        filters['lesson__number__lte'] = _parse_number(params['lesson_to'], 'lesson_to')
+    return filters
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+class ProgressExport:
+    """Iterable of the encoded export; `rows` counts the rows written so far"""
+
+    def __init__(self, filters=None, output='csv', chunk_size=CHUNK_SIZE):
+        if output not in FORMATS:
+            raise ValueError(f"output must be one of: {', '.join(FORMATS)}")
+        self.filters = filters or {}
+        self.output = output
+        self.chunk_size = chunk_size
+        self.rows = 0
+
+    def queryset(self):
+        return (
+            UserProgress.objects.filter(**self.filters)
+            .select_related('user', 'lesson')
+            .only(
+                'user', 'lesson', 'is_completed', 'completed_at', 'last_accessed',
+                'user__username', 'lesson__number', 'lesson__title',
+            )
+            .order_by('pk')
+        )
+
+    def records(self):
+        for progress in self.queryset().iterator(chunk_size=self.chunk_size):
+            self.rows += 1
+            yield (
+                progress.user_id,
+                progress.user.username,
+                progress.lesson_id,
+                progress.lesson.number,
+                progress.lesson.title,
+                progress.is_completed,
+                _isoformat(progress.completed_at),
+                _isoformat(progress.last_accessed),
+            )
+
+    def __iter__(self):
+        buffer = io.StringIO()
+        if self.output == 'csv':
+            writer = csv.writer(buffer)
+            writer.writerow(COLUMNS)
+            for record in self.records():
+                writer.writerow(['true' if value is True else 'false' if value is False else value
+                                 for value in record])
+                if buffer.tell() >= BUFFER_SIZE:
+                    yield self._drain(buffer)
+        else:
+            for record in self.records():
+                buffer.write(json.dumps(dict(zip(COLUMNS, record)), ensure_ascii=False))
+                buffer.write('\n')
+                if buffer.tell() >= BUFFER_SIZE:
+                    yield self._drain(buffer)
+        if buffer.tell():
+            yield self._drain(buffer)
+
+    @staticmethod
+    def _drain(buffer):
+        chunk = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+
+async def _aiterate(iterable):
+    """
+    Async iterator over a sync one. Django's ASGI handler would otherwise
+    collect a sync iterator into a list before sending it. Every step runs in
+    the shared sync thread, where the database cursor lives.
+    """
+    iterator = iter(iterable)
+    step = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await step(iterator, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def streaming_response(request, export):
+    """StreamingHttpResponse downloading `export` as an attachment"""
+    content = export
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        content = _aiterate(export)
+    response = StreamingHttpResponse(content, content_type=FORMATS[export.output])
+    filename = f"progress-{timezone.now().strftime('%Y%m%d-%H%M%S')}.{export.output}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    return response
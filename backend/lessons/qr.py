@@ -0,0 +1,95 @@
+"""
+On-disk store of lesson QR codes.
+
+Each image is generated once per (FRONTEND_URL, lesson id) and written under
+QR_CODE_ROOT with a filename derived from the encoded URL, so changing
+FRONTEND_URL automatically leads to fresh images on the next request.
+"""
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+from pathlib import Path
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+
+FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+def get_root():
+    return Path(getattr(settings, 'QR_CODE_ROOT', Path(settings.BASE_DIR) / 'qr_codes'))
+
+
+def lesson_url(lesson_id):
+    """The frontend URL a lesson's QR code points to"""
+    base_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:3000')
+    return f"{base_url}/#/lesson/{lesson_id}"
+
+
+def url_digest(url):
+    """Short content key for an encoded URL, used in filenames and as a cache-busting version"""
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+
+
+def get_path(lesson_id, image_format='png'):
+    url = lesson_url(lesson_id)
+    return get_root() / f"lesson_{lesson_id}_{url_digest(url)}.{image_format}"
+
+
+def delete(lesson_ids):
+    """Delete the stored images of the given lessons, whatever FRONTEND_URL they were generated for"""
+    root = get_root()
+    for lesson_id in lesson_ids:
+        for path in root.glob(f"lesson_{lesson_id}_*"):
+            path.unlink(missing_ok=True)
+
+
+def render(url, image_format='png'):
+    """Render a QR code for `url` and return the encoded image bytes"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+
+    if image_format == 'svg':
+        img = qr.make_image(image_factory=qrcode.image.svg.SvgPathImage)
+        return img.to_string()
+
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def write_atomic(path, data):
+    """Write `data` to `path` so readers never observe a partially written file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        # mkstemp creates files only the owner can read; these are served to everyone
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def get_or_create(lesson_id, image_format='png'):
+    """Return the path of a lesson's QR image, generating it on first use"""
+    if image_format not in FORMATS:
+        raise ValueError(f"Unsupported QR code format: {image_format}")
+    path = get_path(lesson_id, image_format)
+    if not path.exists():
+        write_atomic(path, render(lesson_url(lesson_id), image_format))
+    return path
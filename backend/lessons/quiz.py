@@ -0,0 +1,153 @@
+"""
+Server-side quiz grading.
+
+The public lesson payload does not say which choices are correct. Clients
+POST their answers to /api/lessons/{id}/submit_quiz/ and get back the score
+and, per question, whether it was answered correctly, in one round-trip.
+The correct choices are only returned for questions that were answered, so
+a submission does not give away the rest of the answer key.
+
+Answer keys (question id -> choice ids and correct choice ids) are kept per
+process in a TTL-bounded LRU map keyed by lesson id. Entries are tagged with
+the lesson's generation number in the shared Django cache, which the signal
+handlers in lessons/signals.py bump whenever the lesson, one of its
+questions or one of its choices changes (bulk writes that send no signals
+bump a global one instead). Grading from a cached key therefore reads
+nothing from the database; only the attempt row is written. With the
+default per-process locmem backend, other processes (e.g. an admin edit
+served by another worker) are only seen once QUIZ_ANSWER_KEY_CACHE_TTL
+expires.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Lesson, LessonQuerySet, Question, QuizAttempt
+from .ttl_cache import TTLCache
+
+_GENERATION_KEY = 'quiz:answer-key-generation'
+_LESSON_GENERATION_KEY = 'quiz:answer-key-generation:{}'
+
+# `questions` maps question id -> (frozenset of its choice ids, tuple of the
+# correct ones in display order), in display order
+AnswerKey = namedtuple('AnswerKey', ['is_active', 'questions'])
+QuizResult = namedtuple('QuizResult', ['score', 'total', 'results', 'choices'])
+
+
+def _generation(lesson_id):
+    """(global generation, lesson generation), read with one cache round-trip"""
+    keys = [_GENERATION_KEY, _LESSON_GENERATION_KEY.format(lesson_id)]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, 1, timeout=None)
+            generations[key] = cache.get(key, 1)
+    return tuple(generations[key] for key in keys)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 2, timeout=None)
+
+
+# Keyed by lesson id
+answer_keys = TTLCache(
+    max_entries=getattr(settings, 'QUIZ_ANSWER_KEY_CACHE_SIZE', 1000),
+    ttl=getattr(settings, 'QUIZ_ANSWER_KEY_CACHE_TTL', 300),
+)
+
+
+def _load(lesson_id):
+    """Build a lesson's answer key with two queries; None if the lesson does not exist"""
+    is_active = Lesson.objects.filter(pk=lesson_id).values_list('is_active', flat=True).first()
+    if is_active is None:
+        return None
+    ordering = LessonQuerySet.CONTENT_ORDERING
+    rows = (
+        Question.objects.filter(lesson_id=lesson_id)
+        .order_by(*ordering['questions'], *(f'choices__{name}' for name in ordering['choices']), 'choices__pk')
+        .values_list('pk', 'choices__pk', 'choices__is_correct')
+    )
+    choices = {}
+    correct = {}
+    for question_id, choice_id, is_correct in rows:
+        choices.setdefault(question_id, [])
+        correct.setdefault(question_id, [])
+        # A question without choices comes back once with NULL choice columns
+        if choice_id is not None:
+            choices[question_id].append(choice_id)
+            if is_correct:
+                correct[question_id].append(choice_id)
+    return AnswerKey(is_active, {
+        question_id: (frozenset(choice_ids), tuple(correct[question_id]))
+        for question_id, choice_ids in choices.items()
+    })
+
+
+def get_answer_key(lesson_id):
+    """The lesson's AnswerKey, from the in-process cache when current; None if there is no such lesson"""
+    # Read the generation before loading, so an invalidation racing with the
+    # load leaves a stale-tagged entry rather than a stale valid one
+    generation = _generation(lesson_id)
+    answer_key = answer_keys.get(lesson_id, generation)
+    if answer_key is None:
+        answer_key = _load(lesson_id)
+        if answer_key is not None:
+            answer_keys.set(lesson_id, answer_key, generation)
+    return answer_key
+
+
+def invalidate_answer_key(lesson_id=None):
+    """
+    Retire the lesson's cached answer key (every lesson's without an id) in
+    all processes sharing the cache backend
+    """
+    if lesson_id is None:
+        answer_keys.clear()
+        _bump(_GENERATION_KEY)
+    else:
+        _bump(_LESSON_GENERATION_KEY.format(lesson_id))
+
+
+def grade(answer_key, answers):
+    """
+    Grade `answers` ({question id: [choice ids]}) against an AnswerKey.
+    A question is answered correctly when exactly its correct choices are
+    selected; unanswered questions count as wrong, and their correct choices
+    are left out of the results. Raises ValueError for questions or choices
+    that are not part of the quiz.
+    """
+    unknown = sorted(set(answers) - set(answer_key.questions))
+    if unknown:
+        raise ValueError(f'Unknown question id(s): {unknown}')
+
+    score = 0
+    results = []
+    selected_choices = []
+    for question_id, (choice_ids, correct) in answer_key.questions.items():
+        selected = answers.get(question_id, ())
+        invalid = sorted(set(selected) - choice_ids)
+        if invalid:
+            raise ValueError(f'Choice id(s) {invalid} do not belong to question {question_id}')
+        is_correct = set(selected) == set(correct)
+        score += is_correct
+        result = {'question': question_id, 'correct': is_correct}
+        if selected:
+            result['correct_choices'] = list(correct)
+        results.append(result)
+        selected_choices.extend(sorted(set(selected)))
+    return QuizResult(score, len(answer_key.questions), results, selected_choices)
+
+
+def record_attempt(user, lesson_id, result):
+    """Store a graded submission as a QuizAttempt"""
+    return QuizAttempt.objects.create(
+        user_id=user.pk,
+        lesson_id=lesson_id,
+        score=result.score,
+        total=result.total,
+        choices=result.choices,
+    )
@@ -0,0 +1,138 @@
+"""
+Fast read path producing LessonSerializer's output.
+
+DRF's nested ModelSerializers build a model instance per row and walk a
+field object per value, which dominates the CPU time of the lesson list and
+detail endpoints. Here lessons and each nested table are fetched as flat
+values() rows (one query per table, like the prefetching path) and the same
+JSON shape is assembled with plain dicts grouped by foreign key.
+
+The field layout is derived from LessonSerializer itself, so adding a field
+there adds it here. Values of field types whose to_representation is the
+identity on database values (text, integers, booleans) are copied as is;
+any other type (e.g. datetimes) still goes through the DRF field.
+lessons/tests.py checks that both paths render byte-identical JSON;
+`python manage.py benchmark_lesson_representations` measures the speedup.
+"""
+import hashlib
+from collections import defaultdict
+from functools import lru_cache
+
+from rest_framework import serializers
+
+from .models import LessonQuerySet
+from .serializers import LessonSerializer
+
+# DRF field types whose to_representation returns database values unchanged
+_IDENTITY_FIELDS = (
+    serializers.CharField,
+    serializers.URLField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+)
+
+
+class _Plan:
+    """Columns to fetch and output entries of one serializer"""
+
+    def __init__(self, serializer):
+        self.model = serializer.Meta.model
+        self.pk = self.model._meta.pk.attname
+        self.columns = [self.pk]
+        # (output key, column, converter) in serializer order; column is None for nested rows
+        self.entries = []
+        # (output key, relation plan, foreign key column, ordering)
+        self.relations = []
+        for name, field in serializer.fields.items():
+            if isinstance(field, serializers.ListSerializer):
+                relation = self.model._meta.get_field(field.source)
+                self.entries.append((name, None, None))
+                self.relations.append((
+                    name,
+                    _Plan(field.child),
+                    relation.field.attname,
+                    LessonQuerySet.CONTENT_ORDERING[field.source],
+                ))
+            else:
+                converter = None if type(field) in _IDENTITY_FIELDS else field.to_representation
+                self.entries.append((name, field.source, converter))
+                if field.source not in self.columns:
+                    self.columns.append(field.source)
+
+    def layout(self):
+        """Output keys in order, with the layout of nested relations"""
+        nested = {name: plan for name, plan, _, _ in self.relations}
+        return tuple(
+            (name, nested[name].layout()) if name in nested else name
+            for name, _, _ in self.entries
+        )
+
+    def represent(self, rows):
+        """Representations of `rows` (values() dicts holding self.columns), in order"""
+        pk = self.pk
+        nested = {}
+        if self.relations:
+            ids = [row[pk] for row in rows]
+            for name, plan, foreign_key, ordering in self.relations:
+                nested[name] = plan.children(foreign_key, ordering, ids)
+
+        result = []
+        for row in rows:
+            item = {}
+            for name, column, converter in self.entries:
+                if column is None:
+                    item[name] = nested[name].get(row[pk], [])
+                    continue
+                value = row[column]
+                item[name] = value if converter is None or value is None else converter(value)
+            result.append(item)
+        return result
+
+    def children(self, foreign_key, ordering, parent_ids):
+        """Representations of the rows pointing at `parent_ids`, grouped by parent"""
+        if not parent_ids:
+            return {}
+        rows = list(
+            self.model._default_manager
+            .filter(**{f'{foreign_key}__in': parent_ids})
+            .order_by(*ordering)
+            .values(foreign_key, *self.columns)
+        )
+        grouped = defaultdict(list)
+        for row, item in zip(rows, self.represent(rows)):
+            grouped[row[foreign_key]].append(item)
+        return grouped
+
+
+_full_plan = _Plan(LessonSerializer())
+
+# Lesson columns fetched by lesson_values(); cursor pagination needs `number`
+LESSON_COLUMNS = tuple(_full_plan.columns)
+
+# Changes whenever a field is added to or dropped from the representation;
+# part of the lesson ETags and the catalog version, so copies held by
+# clients are not revalidated across such a change
+LAYOUT_VERSION = hashlib.md5(repr(_full_plan.layout()).encode('utf-8')).hexdigest()[:8]
+
+
+@lru_cache(maxsize=64)
+def _plan(fields):
+    return _Plan(LessonSerializer(fields=fields))
+
+
+def lesson_values(queryset):
+    """The lesson rows (as values() dicts) represent_lessons() expects"""
+    return queryset.values(*LESSON_COLUMNS)
+
+
+def represent_lessons(rows, fields=None):
+    """
+    Same data as LessonSerializer(lessons, many=True, fields=fields).data for
+    lesson rows from lesson_values(). Nested relations are queried only when
+    their field is included.
+    """
+    if fields is None:
+        plan = _full_plan
+    else:
+        plan = _plan(frozenset(fields) & frozenset(LessonSerializer.Meta.fields))
+    return plan.represent(list(rows))
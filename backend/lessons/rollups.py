@@ -0,0 +1,191 @@
+"""
+Incrementally maintained rollups of UserProgress.
+
+LessonProgressStats holds, per lesson, how many users have a progress row
+(started) and how many of those rows are completed. DailyCompletionStats
+holds how many completed rows have their completed_at on each day. Both are
+exact aggregates of the current UserProgress rows, so they can be rebuilt
+and verified from the raw data at any time (manage.py rebuild_progress_rollups).
+
+Every write path applies the delta between a row's old and new state:
+- single-row saves/deletes through the signal handlers in lessons/signals.py
+- bulk upserts through lessons.views.upsert_progress
+"""
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import UserProgress, LessonProgressStats, DailyCompletionStats
+
+
+def row_state(lesson_id, is_completed, completed_at):
+    """The part of a UserProgress row the rollups depend on"""
+    completed_on = None
+    if is_completed and completed_at is not None:
+        completed_on = timezone.localdate(completed_at)
+    return (lesson_id, bool(is_completed), completed_on)
+
+
+def instance_state(progress):
+    return row_state(progress.lesson_id, progress.is_completed, progress.completed_at)
+
+
+def stored_progress(user, lesson_ids):
+    """
+    Stored (is_completed, completed_at) of a user's progress rows, keyed by
+    lesson id. Must run in a transaction: the user row is locked first,
+    because rows that do not exist yet cannot be, and two concurrent first
+    upserts of the same lesson would otherwise both count as new.
+    """
+    list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+    rows = (
+        UserProgress.objects.select_for_update()
+        .filter(user=user, lesson_id__in=lesson_ids)
+        .values_list('lesson_id', 'is_completed', 'completed_at')
+    )
+    return {lesson_id: (is_completed, completed_at) for lesson_id, is_completed, completed_at in rows}
+
+
+def apply_changes(changes, create_missing=True):
+    """
+    Apply a list of (old_state, new_state) pairs to the rollups; a state of
+    None means the row did not exist before / no longer exists.
+    With create_missing=False only existing rollup rows are updated, which is
+    what deletes need: a cascading lesson delete may already have removed the
+    lesson's stats row.
+    """
+    started = Counter()
+    completed = Counter()
+    daily = Counter()
+    for old, new in changes:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            lesson_id, is_completed, completed_on = state
+            started[lesson_id] += sign
+            if is_completed:
+                completed[lesson_id] += sign
+            if completed_on is not None:
+                daily[completed_on] += sign
+
+    lesson_deltas = {
+        lesson_id: (started[lesson_id], completed[lesson_id])
+        for lesson_id in set(started) | set(completed)
+        if started[lesson_id] or completed[lesson_id]
+    }
+    day_deltas = {day: delta for day, delta in daily.items() if delta}
+    if not lesson_deltas and not day_deltas:
+        return
+
+    with transaction.atomic():
+        if lesson_deltas:
+            if create_missing:
+                LessonProgressStats.objects.bulk_create(
+                    [LessonProgressStats(lesson_id=lesson_id) for lesson_id in lesson_deltas],
+                    ignore_conflicts=True,
+                )
+            for lesson_id, (started_delta, completed_delta) in lesson_deltas.items():
+                LessonProgressStats.objects.filter(lesson_id=lesson_id).update(
+                    started_count=F('started_count') + started_delta,
+                    completed_count=F('completed_count') + completed_delta,
+                )
+        if day_deltas:
+            if create_missing:
+                DailyCompletionStats.objects.bulk_create(
+                    [DailyCompletionStats(date=day) for day in day_deltas],
+                    ignore_conflicts=True,
+                )
+            for day, delta in day_deltas.items():
+                DailyCompletionStats.objects.filter(date=day).update(
+                    completed_count=F('completed_count') + delta,
+                )
+
+
+def compute_from_raw():
+    """Aggregate the rollups directly from UserProgress (one GROUP BY per table)"""
+    lessons = {
+        row['lesson_id']: (row['started'], row['completed'])
+        for row in UserProgress.objects.order_by().values('lesson_id').annotate(
+            started=Count('pk'),
+            completed=Count('pk', filter=Q(is_completed=True)),
+        )
+    }
+    days = {
+        row['day']: row['completed']
+        for row in UserProgress.objects.filter(is_completed=True, completed_at__isnull=False)
+        .annotate(day=TruncDate('completed_at'))
+        .order_by().values('day').annotate(completed=Count('pk'))
+    }
+    return lessons, days
+
+
+def stored():
+    lessons = {
+        lesson_id: (started, completed)
+        for lesson_id, started, completed in LessonProgressStats.objects.filter(
+            Q(started_count__gt=0) | Q(completed_count__gt=0)
+        ).values_list('lesson_id', 'started_count', 'completed_count')
+    }
+    days = dict(DailyCompletionStats.objects.filter(completed_count__gt=0).values_list('date', 'completed_count'))
+    return lessons, days
+
+
+def rebuild():
+    """
+    Replace the rollups with fresh aggregates of the raw data, in one
+    transaction. The existing rollup rows are locked before the raw data is
+    read: incremental updates already holding them commit first and are
+    counted, later ones wait and then apply their delta on top of the
+    rebuilt counts, which is why rows are overwritten in place rather than
+    deleted and recreated.
+    """
+    with transaction.atomic():
+        stale_lessons = set(LessonProgressStats.objects.select_for_update().values_list('lesson_id', flat=True))
+        stale_days = set(DailyCompletionStats.objects.select_for_update().values_list('date', flat=True))
+        lessons, days = compute_from_raw()
+        LessonProgressStats.objects.bulk_create(
+            [
+                LessonProgressStats(lesson_id=lesson_id, started_count=started, completed_count=completed)
+                for lesson_id, (started, completed) in lessons.items()
+            ] + [LessonProgressStats(lesson_id=lesson_id) for lesson_id in stale_lessons - set(lessons)],
+            update_conflicts=True,
+            unique_fields=['lesson'],
+            update_fields=['started_count', 'completed_count'],
+            batch_size=1000,
+        )
+        DailyCompletionStats.objects.bulk_create(
+            [DailyCompletionStats(date=day, completed_count=count) for day, count in days.items()]
+            + [DailyCompletionStats(date=day) for day in stale_days - set(days)],
+            update_conflicts=True,
+            unique_fields=['date'],
+            update_fields=['completed_count'],
+            batch_size=1000,
+        )
+    return len(lessons), len(days)
+
+
+def verify():
+    """
+    Compare the rollups with the raw data.
+    Returns a list of human readable mismatches (empty when consistent).
+    """
+    raw_lessons, raw_days = compute_from_raw()
+    stored_lessons, stored_days = stored()
+    mismatches = []
+    for lesson_id in sorted(set(raw_lessons) | set(stored_lessons)):
+        expected = raw_lessons.get(lesson_id, (0, 0))
+        actual = stored_lessons.get(lesson_id, (0, 0))
+        if expected != actual:
+            mismatches.append(
+                f"lesson {lesson_id}: expected started/completed {expected}, stored {actual}"
+            )
+    for day in sorted(set(raw_days) | set(stored_days)):
+        expected = raw_days.get(day, 0)
+        actual = stored_days.get(day, 0)
+        if expected != actual:
+            mismatches.append(f"{day}: expected {expected} completions, stored {actual}")
+    return mismatches
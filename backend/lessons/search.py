@@ -0,0 +1,381 @@
+"""
+Arabic-aware full-text search over lessons, their quizzes and their FAQs.
+
+Each lesson has a LessonSearchDocument holding its title, description,
+question and choice texts and FAQs after normalize(): harakat, Quranic
+marks and tatweel are removed, alef variants become ا, alef maqsura and
+Farsi yeh become ي, taa marbuta becomes ه, Latin text is lowercased, and
+the definite article (with a leading و, ف, ب or ك, or as لل) is dropped
+from words long enough to keep three letters. Queries are normalized the
+same way, so "الْعَرَبِيَّة", "العربيـــة", "العربيه" and "عربية" all find
+"العربية". Every query word is matched as a prefix.
+
+The index over the documents depends on the database (see migration 0009):
+SQLite uses FTS5 ranked with bm25(), PostgreSQL a GIN-indexed tsvector
+ranked with ts_rank(); other databases fall back to substring matching,
+ordered by lesson number. Both indexes are updated by the database when a
+document row changes. The signal handlers in lessons/signals.py rewrite a
+lesson's document after any change to its content commits, and
+`python manage.py rebuild_search_index` rewrites all of them.
+
+Highlighting is done here rather than by the database, on the original
+(unnormalized) text of the few lessons returned, so snippets keep their
+diacritics.
+"""
+import re
+from bisect import bisect_right
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from .models import Lesson, LessonQuerySet, LessonSearchDocument, Question, Choice, LessonFAQ
+
+# Columns of LessonSearchDocument in index order, and their ranking weights
+# on SQLite (PostgreSQL weights them A, B, C and C in the migration)
+COLUMNS = ('title', 'description', 'questions', 'faqs')
+BM25_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+
+MAX_TERMS = 8
+MAX_LIMIT = 50
+SNIPPET_WORDS = 12
+
+_MARKS = (
+    'ؐ-ؚ'  # Quranic annotation signs
+    'ً-ٟ'  # harakat (fathatan ... wavy hamza below)
+    'ٰ'  # superscript alef
+    'ۖ-ۭ'  # Quranic small high and low signs
+    'ـ'  # tatweel
+)
+# Normalized letter -> the letters normalized to it
+_VARIANTS = {'ا': 'اأإآٱ', 'ي': 'يىی', 'ه': 'هة'}
+_TRANSLATION = str.maketrans({
+    **{chr(code): None for code in range(0x0600, 0x0700) if re.fullmatch(f'[{_MARKS}]', chr(code))},
+    **{variant: letter for letter, variants in _VARIANTS.items() for variant in variants if variant != letter},
+})
+_ARTICLE = re.compile(r'(?<!\w)(?:[وفبك]?ال|لل)(?=\w{3})')
+# A word of the original text, marks included
+_WORD = re.compile(f'(?:[^\\W_]|[{_MARKS}])+')
+# A word of normalized text, as the FTS5 unicode61 tokenizer splits it
+_TERM = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    """Search form of `text` (see the module docstring)"""
+    return _ARTICLE.sub('', text.translate(_TRANSLATION).lower())
+
+
+def parse_query(query):
+    """Normalized search terms of a user query, at most MAX_TERMS, without duplicates"""
+    terms = []
+    for term in _TERM.findall(normalize(query)):
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+def _question_texts(lesson_ids):
+    """lesson id -> its question texts, each followed by its choices, one per line"""
+    ordering = LessonQuerySet.CONTENT_ORDERING
+    lines = defaultdict(list)
+    question_lines = {}
+    for question_id, lesson_id, text in (
+        Question.objects.filter(lesson_id__in=lesson_ids)
+        .order_by(*ordering['questions'])
+        .values_list('pk', 'lesson_id', 'text')
+    ):
+        question_lines[question_id] = [text]
+        lines[lesson_id].append(question_lines[question_id])
+    for question_id, text in (
+        Choice.objects.filter(question_id__in=question_lines)
+        .order_by(*ordering['choices'])
+        .values_list('question_id', 'text')
+    ):
+        question_lines[question_id].append(text)
+    return {
+        lesson_id: '\n'.join(line for question in questions for line in question)
+        for lesson_id, questions in lines.items()
+    }
+
+
+def _faq_texts(lesson_ids):
+    """lesson id -> its FAQ questions and answers, one per line"""
+    lines = defaultdict(list)
+    for lesson_id, question, answer in (
+        LessonFAQ.objects.filter(lesson_id__in=lesson_ids)
+        .order_by(*LessonQuerySet.CONTENT_ORDERING['faqs'])
+        .values_list('lesson_id', 'question', 'answer')
+    ):
+        lines[lesson_id].extend((question, answer))
+    return {lesson_id: '\n'.join(faq_lines) for lesson_id, faq_lines in lines.items()}
+
+
+def _lesson_rows(lesson_ids):
+    return {
+        row['pk']: row
+        for row in Lesson.objects.filter(pk__in=lesson_ids).values('pk', 'number', 'title', 'description')
+    }
+
+
+def index_lessons(lesson_ids):
+    """
+    Rewrite the search documents of the given lessons from their current
+    content; documents of lessons that no longer exist are dropped.
+    """
+    lesson_ids = list(lesson_ids)
+    rows = _lesson_rows(lesson_ids)
+    questions = _question_texts(rows)
+    faqs = _faq_texts(rows)
+    documents = [
+        LessonSearchDocument(
+            lesson_id=lesson_id,
+            title=normalize(row['title']),
+            description=normalize(row['description']),
+            questions=normalize(questions.get(lesson_id, '')),
+            faqs=normalize(faqs.get(lesson_id, '')),
+        )
+        for lesson_id, row in rows.items()
+    ]
+    with transaction.atomic():
+        LessonSearchDocument.objects.filter(lesson_id__in=set(lesson_ids) - set(rows)).delete()
+        LessonSearchDocument.objects.bulk_create(
+            documents,
+            update_conflicts=True,
+            unique_fields=['lesson'],
+            update_fields=list(COLUMNS),
+        )
+    return len(documents)
+
+
+def rebuild(chunk_size=1000, on_progress=None):
+    """Rewrite every lesson's document in chunks; returns the number indexed"""
+    lesson_ids = list(Lesson.objects.order_by('pk').values_list('pk', flat=True))
+    indexed = 0
+    for offset in range(0, len(lesson_ids), chunk_size):
+        indexed += index_lessons(lesson_ids[offset:offset + chunk_size])
+        if on_progress is not None:
+            on_progress(indexed, len(lesson_ids))
+    if connection.vendor == 'sqlite':
+        # Also rebuild the FTS5 index itself from the documents, which
+        # repairs it should it ever have drifted from them
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO lessons_search_fts(lessons_search_fts) VALUES ('rebuild')")
+    return indexed
+
+
+def _visibility(active_only):
+    return 'AND lesson.is_active' if active_only else ''
+
+
+def _fts_match(terms):
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _tsquery(terms):
+    # Terms only hold letters and digits, so they are safe inside a tsquery
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def _search_sqlite(terms, active_only, limit):
+    match = _fts_match(terms)
+    weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+    sql = f'''
+        SELECT lessons_search_fts.rowid, bm25(lessons_search_fts, {weights}) AS score
+        FROM lessons_search_fts
+        JOIN lessons_lesson lesson ON lesson.id = lessons_search_fts.rowid
+        WHERE lessons_search_fts MATCH %s {_visibility(active_only)}
+        ORDER BY score, lesson.number
+    '''
+    params = [match]
+    if limit is not None:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        # bm25() is lower for better matches
+        return [(lesson_id, -score) for lesson_id, score in cursor.fetchall()]
+
+
+def _search_postgresql(terms, active_only, limit):
+    sql = f'''
+        SELECT document.lesson_id, ts_rank(document.search_vector, query) AS score
+        FROM lessons_lessonsearchdocument document
+        JOIN lessons_lesson lesson ON lesson.id = document.lesson_id,
+             to_tsquery('simple', %s) query
+        WHERE document.search_vector @@ query {_visibility(active_only)}
+        ORDER BY score DESC, lesson.number
+    '''
+    params = [_tsquery(terms)]
+    if limit is not None:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _fallback_documents(terms):
+    documents = LessonSearchDocument.objects.all()
+    for term in terms:
+        documents = documents.filter(
+            Q(title__contains=term) | Q(description__contains=term)
+            | Q(questions__contains=term) | Q(faqs__contains=term)
+        )
+    return documents
+
+
+def _search_fallback(terms, active_only, limit):
+    documents = _fallback_documents(terms)
+    if active_only:
+        documents = documents.filter(lesson__is_active=True)
+    lesson_ids = documents.order_by('lesson__number').values_list('lesson_id', flat=True)
+    if limit is not None:
+        lesson_ids = lesson_ids[:limit]
+    return [(lesson_id, None) for lesson_id in lesson_ids]
+
+
+def search(query, active_only=True, limit=20):
+    """
+    (lesson id, score) pairs of the lessons matching every word of `query`,
+    best first (score is None without a full-text index). `limit` None
+    returns every match.
+    """
+    terms = parse_query(query)
+    if not terms:
+        return []
+    if connection.vendor == 'sqlite':
+        return _search_sqlite(terms, active_only, limit)
+    if connection.vendor == 'postgresql':
+        return _search_postgresql(terms, active_only, limit)
+    return _search_fallback(terms, active_only, limit)
+
+
+def matching_lessons(query):
+    """
+    A subquery of the ids of every lesson (active or not) matching `query`,
+    unranked, for filtering a queryset with pk__in inside the database
+    """
+    terms = parse_query(query)
+    if not terms:
+        return LessonSearchDocument.objects.none().values('lesson_id')
+    if connection.vendor == 'sqlite':
+        return RawSQL('SELECT rowid FROM lessons_search_fts WHERE lessons_search_fts MATCH %s', [_fts_match(terms)])
+    if connection.vendor == 'postgresql':
+        return RawSQL(
+            "SELECT lesson_id FROM lessons_lessonsearchdocument WHERE search_vector @@ to_tsquery('simple', %s)",
+            [_tsquery(terms)],
+        )
+    return _fallback_documents(terms).values('lesson_id')
+
+
+def _term_pattern(terms):
+    """Regex finding words of normalized text that start with one of `terms`"""
+    return re.compile('(?<![^\\W_])(?:%s)' % '|'.join(map(re.escape, terms)))
+
+
+def highlight_pattern(terms):
+    """
+    Regex finding, in original text, the words whose normalized form starts
+    with one of `terms`: marks may follow any letter, each normalized letter
+    also matches its variants and the article may precede the term.
+    """
+    marks = f'[{_MARKS}]*'
+    alternatives = [
+        marks.join(f'[{_VARIANTS[char]}]' if char in _VARIANTS else re.escape(char) for char in term)
+        for term in terms
+    ]
+    article = f'(?:(?:[وفبك]{marks})?[{_VARIANTS["ا"]}]{marks}ل{marks}|ل{marks}ل{marks})'
+    return re.compile(
+        f'(?<![^\\W_])(?:{article})?(?:{"|".join(alternatives)})(?:[^\\W_]|[{_MARKS}])*',
+        re.IGNORECASE,
+    )
+
+
+def highlight(text, pattern, context=None):
+    """
+    HTML-escaped `text` with the words found by `pattern` (see
+    highlight_pattern) wrapped in <mark>. With `context`, only about that many
+    words around the first match are kept (None if nothing matches).
+    """
+    matches = pattern.finditer(text)
+    start, end = 0, len(text)
+    prefix = suffix = ''
+    if context is not None:
+        first_match = next(matches, None)
+        if first_match is None:
+            return None
+        words = [word.start() for word in _WORD.finditer(text)]
+        hit = bisect_right(words, first_match.start()) - 1
+        first = max(0, hit - context // 3)
+        last = min(len(words) - 1, first + context)
+        start = words[first] if first > 0 else 0
+        end = _WORD.match(text, words[last]).end() if last < len(words) - 1 else len(text)
+        prefix = '…' if first > 0 else ''
+        suffix = '…' if last < len(words) - 1 else ''
+        matches = pattern.finditer(text, start, end)
+
+    parts = [prefix]
+    position = start
+    for match in matches:
+        parts.append(escape(text[position:match.start()]))
+        parts.append(f'<mark>{escape(match.group())}</mark>')
+        position = match.end()
+    parts.append(escape(text[position:end]))
+    parts.append(suffix)
+    return ''.join(parts)
+
+
+def results(query, active_only=True, limit=20):
+    """
+    Search results for the API: lessons best first with their highlighted
+    title and a highlighted snippet of the first other column that matches.
+    The column is picked from the normalized documents, so the original
+    question and FAQ texts are only loaded for lessons whose snippet needs them.
+    """
+    terms = parse_query(query)
+    matches = search(query, active_only, limit)
+    if not matches:
+        return []
+    lesson_ids = [lesson_id for lesson_id, _ in matches]
+    pattern = _term_pattern(terms)
+    marker = highlight_pattern(terms)
+    rows = {}
+    matched_in = {}
+    for document in (
+        LessonSearchDocument.objects.filter(lesson_id__in=lesson_ids)
+        .values('lesson_id', 'lesson__number', 'lesson__title', 'lesson__description', *COLUMNS[1:])
+    ):
+        lesson_id = document['lesson_id']
+        rows[lesson_id] = {
+            'number': document['lesson__number'],
+            'title': document['lesson__title'],
+            'description': document['lesson__description'],
+        }
+        matched_in[lesson_id] = next((column for column in COLUMNS[1:] if pattern.search(document[column])), None)
+    texts = {
+        'description': {lesson_id: row['description'] for lesson_id, row in rows.items()},
+        'questions': _question_texts([i for i, column in matched_in.items() if column == 'questions']),
+        'faqs': _faq_texts([i for i, column in matched_in.items() if column == 'faqs']),
+    }
+
+    output = []
+    for lesson_id, score in matches:
+        row = rows.get(lesson_id)
+        if row is None:
+            continue
+        column = matched_in.get(lesson_id)
+        snippet = None
+        if column is not None:
+            snippet = highlight(texts[column].get(lesson_id, ''), marker, context=SNIPPET_WORDS)
+        output.append({
+            'id': lesson_id,
+            'number': row['number'],
+            'title': row['title'],
+            'score': round(score, 6) if score is not None else None,
+            'highlighted_title': highlight(row['title'], marker),
+            'snippet': snippet,
+            'matched_in': column if snippet is not None else None,
+        })
+    return output
@@ -1,4 +1,10 @@
+from django.contrib.auth.models import User
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from . import drive
+from .authentication import USER_CLAIMS, is_revoked_in_db
 from .models import Lesson, AudioFile, PDFFile, UserProgress, Question, Choice, LessonFAQ
 
 
@@ -6,7 +12,8 @@ class ChoiceSerializer(serializers.ModelSerializer):
     """Serializer for Choice model"""
     class Meta:
         model = Choice
-        fields = ['id', 'text', 'is_correct', 'order']
+        # is_correct stays on the server; quizzes are graded by lessons/quiz.py
+        fields = ['id', 'text', 'order']
 
 
 class QuestionSerializer(serializers.ModelSerializer):
@@ -25,24 +32,47 @@ class LessonFAQSerializer(serializers.ModelSerializer):
         fields = ['id', 'question', 'answer', 'order']
 
 
+class DriveURLField(serializers.Field):
+    """A URL built from the stored drive_file_id by `url` (see lessons/drive.py); null without one"""
+
+    def __init__(self, url, **kwargs):
+        self.url = url
+        kwargs.setdefault('source', 'drive_file_id')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return self.url(value)
+
+
 class AudioFileSerializer(serializers.ModelSerializer):
     """Serializer for AudioFile model"""
+    stream_url = DriveURLField(drive.stream_url)
+
     class Meta:
         model = AudioFile
-        fields = ['id', 'title', 'google_drive_link', 'order', 'created_at']
-        read_only_fields = ['created_at']
+        fields = ['id', 'title', 'google_drive_link', 'drive_file_id', 'stream_url', 'order', 'created_at']
+        read_only_fields = ['drive_file_id', 'created_at']
 
 
 class PDFFileSerializer(serializers.ModelSerializer):
     """Serializer for PDFFile model"""
+    stream_url = DriveURLField(drive.stream_url)
+    view_url = DriveURLField(drive.view_url)
+
     class Meta:
         model = PDFFile
-        fields = ['id', 'title', 'google_drive_link', 'order', 'created_at']
-        read_only_fields = ['created_at']
+        fields = ['id', 'title', 'google_drive_link', 'drive_file_id', 'stream_url', 'view_url', 'order', 'created_at']
+        read_only_fields = ['drive_file_id', 'created_at']
 
 
 class LessonSerializer(serializers.ModelSerializer):
-    """Serializer for Lesson model"""
+    """
+    Serializer for Lesson model.
+    Accepts an optional `fields` argument to render only a subset of fields.
+    """
+    NESTED_FIELDS = ('audio_files', 'pdf_files', 'questions', 'faqs')
+
     id = serializers.IntegerField(read_only=True)
     audio_files = AudioFileSerializer(many=True, read_only=True)
     pdf_files = PDFFileSerializer(many=True, read_only=True)
@@ -69,6 +99,13 @@ class LessonSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
 
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
     def validate_number(self, value):
         """Ensure lesson number is unique (excluding current instance)"""
         if self.instance:
@@ -100,3 +137,66 @@ class UserProgressSerializer(serializers.ModelSerializer):
         model = UserProgress
         fields = ['id', 'lesson', 'is_completed', 'completed_at', 'last_accessed']
         read_only_fields = ['last_accessed']
+
+
+class UserProgressEntrySerializer(serializers.Serializer):
+    """One entry of a batch progress sync"""
+    lesson = serializers.IntegerField(min_value=1)
+    is_completed = serializers.BooleanField(default=True)
+    completed_at = serializers.DateTimeField(required=False, allow_null=True)
+
+
+class UserProgressBatchSerializer(serializers.Serializer):
+    """Batch of progress entries, e.g. lessons finished while offline"""
+    MAX_ENTRIES = 500
+
+    entries = UserProgressEntrySerializer(many=True, allow_empty=False)
+
+    def validate_entries(self, value):
+        if len(value) > self.MAX_ENTRIES:
+            raise serializers.ValidationError(f"At most {self.MAX_ENTRIES} entries per batch.")
+        lesson_ids = {entry['lesson'] for entry in value}
+        known = set(Lesson.objects.filter(pk__in=lesson_ids).order_by().values_list('pk', flat=True))
+        missing = sorted(lesson_ids - known)
+        if missing:
+            raise serializers.ValidationError(f"Unknown lesson id(s): {missing}")
+        return value
+
+
+class QuizSubmissionSerializer(serializers.Serializer):
+    """Answers to a lesson's quiz: question id -> ids of the selected choices"""
+    MAX_CHOICES = 50
+
+    answers = serializers.DictField(
+        child=serializers.ListField(child=serializers.IntegerField(min_value=1), max_length=MAX_CHOICES),
+        allow_empty=True,
+    )
+
+    def validate_answers(self, value):
+        answers = {}
+        for question_id, choice_ids in value.items():
+            if not str(question_id).isdigit():
+                raise serializers.ValidationError(f"Invalid question id: {question_id!r}")
+            answers[int(question_id)] = choice_ids
+        return answers
+
+
+class JWTRefreshSerializer(TokenRefreshSerializer):
+    """
+    Exchange a refresh token for a new access token. Unlike the per-request
+    check this reads the RevokedToken table and the user row, so a revoked
+    refresh token is refused by every process at once, the new token carries
+    current claims and inactive users cannot refresh.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if is_revoked_in_db(refresh):
+            raise InvalidToken('Token has been revoked')
+
+        user = User.objects.filter(pk=refresh.get(jwt_settings.USER_ID_CLAIM), is_active=True).first()
+        if user is None:
+            raise InvalidToken('User not found or inactive')
+        for claim in USER_CLAIMS:
+            refresh[claim] = getattr(user, claim)
+        return {'access': str(refresh.access_token)}
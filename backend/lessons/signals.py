@@ -0,0 +1,165 @@
+"""
+Signal handlers that keep derived lesson data in sync with the content tables.
+"""
+import threading
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from . import catalog
+from . import quiz
+from . import rollups
+from . import search
+from .authentication import invalidate_tokens, revoke_user_tokens
+from .models import Lesson, AudioFile, PDFFile, Question, Choice, LessonFAQ, UserProgress
+
+
+class _PendingChanges(threading.local):
+    """Lessons whose content this thread changed since its last commit"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.changed = False
+        self.quiz_lesson_ids = set()
+        self.search_lesson_ids = set()
+
+
+_pending = _PendingChanges()
+
+
+def _flush_pending_changes():
+    """
+    Do the post-commit work of every content change in the committed
+    transaction once. Each change registers this callback, so all but the
+    first call of a commit find nothing left to do.
+    """
+    if not _pending.changed:
+        return
+    quiz_lesson_ids, search_lesson_ids = _pending.quiz_lesson_ids, _pending.search_lesson_ids
+    _pending.reset()
+    for lesson_id in quiz_lesson_ids:
+        quiz.invalidate_answer_key(lesson_id)
+    if search_lesson_ids:
+        search.index_lessons(search_lesson_ids)
+    catalog.schedule_rebuild()
+
+
+def _lesson_id_for(instance):
+    """Return the id of the lesson an instance of any content model belongs to"""
+    if isinstance(instance, Lesson):
+        return instance.pk
+    if isinstance(instance, Choice):
+        # The question may already be gone when a lesson delete cascades
+        return (
+            Question.objects.filter(pk=instance.question_id)
+            .values_list('lesson_id', flat=True)
+            .first()
+        )
+    return instance.lesson_id
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_save, sender=AudioFile)
+@receiver(post_delete, sender=AudioFile)
+@receiver(post_save, sender=PDFFile)
+@receiver(post_delete, sender=PDFFile)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+@receiver(post_save, sender=LessonFAQ)
+@receiver(post_delete, sender=LessonFAQ)
+def lesson_content_changed(sender, instance, **kwargs):
+    """
+    Bump the updated_at of the lesson whose content changed, and once the
+    change is committed retire the cached answer key (for quiz content),
+    rewrite its search document and schedule a rebuild of the catalog
+    snapshot. That work is collected per transaction,
+    so saving a lesson with many inline rows does it once per lesson.
+    Changes to nested content bump the lesson's updated_at too, so the
+    lesson row alone tells whether anything inside it changed; cached lesson
+    payloads are keyed by it and need no invalidation.
+    """
+    lesson_id = _lesson_id_for(instance)
+    if sender is not Lesson and lesson_id is not None:
+        Lesson.objects.filter(pk=lesson_id).update(updated_at=timezone.now())
+    _pending.changed = True
+    if sender in (Lesson, Question, Choice) and lesson_id is not None:
+        _pending.quiz_lesson_ids.add(lesson_id)
+    if sender not in (AudioFile, PDFFile) and lesson_id is not None:
+        # After the commit: a cascading lesson delete still sends this for its children
+        _pending.search_lesson_ids.add(lesson_id)
+    # After the commit, so no process can cache an old answer key under the new generation.
+    # A rolled back transaction leaves its lessons pending; redoing their work later is harmless.
+    transaction.on_commit(_flush_pending_changes)
+
+
+@receiver(pre_save, sender=UserProgress)
+def remember_progress_state(sender, instance, **kwargs):
+    """Capture the stored state of a progress row so post_save can compute the rollup delta"""
+    instance._rollup_old_state = None
+    if instance.pk is not None:
+        row = (
+            UserProgress.objects.filter(pk=instance.pk)
+            .values_list('lesson_id', 'is_completed', 'completed_at')
+            .first()
+        )
+        if row is not None:
+            instance._rollup_old_state = rollups.row_state(*row)
+
+
+@receiver(post_save, sender=UserProgress)
+def update_rollups_on_save(sender, instance, **kwargs):
+    old_state = getattr(instance, '_rollup_old_state', None)
+    rollups.apply_changes([(old_state, rollups.instance_state(instance))])
+
+
+@receiver(post_delete, sender=UserProgress)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    rollups.apply_changes([(rollups.instance_state(instance), None)], create_missing=False)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, created=False, **kwargs):
+    """Revoke cached credentials when a token is rotated or deleted (a brand new key cannot be cached yet)"""
+    if not created:
+        # In the same transaction, so the new generation is seen together with the change
+        invalidate_tokens()
+
+
+def _saves_is_active(kwargs):
+    update_fields = kwargs.get('update_fields')
+    return update_fields is None or 'is_active' in update_fields
+
+
+@receiver(pre_save, sender=User)
+def remember_user_state(sender, instance, **kwargs):
+    """Capture whether the stored user is active, so post_save sees a deactivation"""
+    instance._was_active = False
+    if instance.pk is not None and _saves_is_active(kwargs):
+        instance._was_active = bool(
+            User.objects.filter(pk=instance.pk).values_list('is_active', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """A deactivated user's tokens and JWTs must stop working immediately"""
+    if getattr(instance, '_was_active', False) and not instance.is_active:
+        # In the same transaction, so the new generation is seen together with the change
+        invalidate_tokens()
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # DRF tokens are deleted by the cascade; JWTs have to be revoked
+    revoke_user_tokens(instance.pk)
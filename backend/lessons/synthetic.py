@@ -0,0 +1,223 @@
+"""
+Deterministic synthetic data for development and capacity testing.
+
+The same seed and sizes always produce the same lessons, users and progress
+(apart from auto_now timestamps). Rows are inserted with batched
+bulk_create, one transaction per chunk, so memory stays bounded and a
+million progress rows take minutes. bulk_create sends no signals, so the
+search documents, quiz answer keys and progress rollups are refreshed here.
+"""
+import math
+import random
+import string
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from . import catalog
+from . import qr
+from . import quiz
+from . import rollups
+from . import search
+from .models import (
+    Lesson, AudioFile, PDFFile, Question, Choice, LessonFAQ, UserProgress,
+    LessonProgressStats, DailyCompletionStats, QuizAttempt, LessonSearchDocument,
+)
+
+WORDS = [
+    'الحروف', 'العربية', 'النطق', 'الصحيح', 'أمثلة', 'بسيطة', 'قواعد', 'النحو', 'الجمل',
+    'الاسمية', 'الفعلية', 'تمارين', 'القراءة', 'الكتابة', 'المهارات', 'النصوص', 'تحليل',
+    'الفهم', 'المفردات', 'الدرس', 'المراجعة', 'التقييم', 'الاستماع', 'المحادثة', 'الإملاء',
+    'الصرف', 'البلاغة', 'الأفعال', 'الأسماء', 'الضمائر', 'الحركات', 'التشكيل', 'القصة',
+    'الحوار', 'المعنى', 'السياق', 'الجذر', 'الوزن', 'المصدر', 'الصفة', 'الخبر', 'المبتدأ',
+    'الفاعل', 'المفعول', 'الحال', 'التمييز', 'النعت', 'العطف', 'التوكيد', 'البدل',
+]
+CONNECTORS = ['في', 'مع', 'من', 'إلى', 'على', 'حول', 'و', 'عن']
+
+_ID_ALPHABET = string.ascii_letters + string.digits + '-_'
+
+
+class Generator:
+    """
+    Inserts synthetic rows. `on_progress(stage, done, total)` is called after
+    every committed chunk.
+    """
+
+    def __init__(self, seed=1, batch_size=2000, chunk_size=20000, on_progress=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress or (lambda stage, done, total: None)
+        self.now = timezone.now()
+
+    def sentence(self, min_words=4, max_words=10):
+        words = []
+        for index in range(self.rng.randint(min_words, max_words)):
+            if index and self.rng.random() < 0.2:
+                words.append(self.rng.choice(CONNECTORS))
+            words.append(self.rng.choice(WORDS))
+        return ' '.join(words)
+
+    def paragraph(self, sentences=3):
+        return '. '.join(self.sentence() for _ in range(sentences)) + '.'
+
+    def _drive_file(self):
+        """Link fields of an audio/PDF file; bulk_create skips the file id extraction in save()"""
+        file_id = ''.join(self.rng.choice(_ID_ALPHABET) for _ in range(33))
+        return {'google_drive_link': f'https://drive.google.com/file/d/{file_id}/view', 'drive_file_id': file_id}
+
+    def lessons(self, count, audio_files=1, pdf_files=1, questions=3, choices=4, faqs=2,
+                start_number=1, inactive_ratio=0.0):
+        """Create `count` lessons with their nested content; returns the new lesson ids"""
+        lesson_ids = []
+        per_chunk = max(1, self.chunk_size // (1 + audio_files + pdf_files + questions * (1 + choices) + faqs))
+        for offset in range(0, count, per_chunk):
+            numbers = range(start_number + offset, start_number + min(count, offset + per_chunk))
+            # Draw every lesson's content in lesson order, so the data does not depend on the chunk size
+            lessons, audio, pdfs, faq_rows, question_rows = [], [], [], [], []
+            for number in numbers:
+                lesson = Lesson(
+                    number=number,
+                    title=f'الدرس {number}: {self.sentence(2, 4)}',
+                    description=self.paragraph(self.rng.randint(1, 3)),
+                    youtube_id=''.join(self.rng.choice(_ID_ALPHABET) for _ in range(11)),
+                    duration=f'{self.rng.randint(5, 45):02d}:{self.rng.randint(0, 59):02d}',
+                    is_active=self.rng.random() >= inactive_ratio,
+                )
+                lessons.append(lesson)
+                audio.extend(
+                    AudioFile(lesson=lesson, title=f'تسجيل {order + 1}', order=order,
+                              **self._drive_file())
+                    for order in range(audio_files)
+                )
+                pdfs.extend(
+                    PDFFile(lesson=lesson, title=f'ملف {order + 1}', order=order,
+                            **self._drive_file())
+                    for order in range(pdf_files)
+                )
+                for order in range(questions):
+                    question = Question(lesson=lesson, text=self.sentence() + '؟', order=order)
+                    correct = self.rng.randrange(choices) if choices else None
+                    question_rows.append((question, [
+                        Choice(question=question, text=self.sentence(1, 4), order=choice_order,
+                               is_correct=choice_order == correct)
+                        for choice_order in range(choices)
+                    ]))
+                faq_rows.extend(
+                    LessonFAQ(lesson=lesson, question=self.sentence() + '؟', answer=self.paragraph(2), order=order)
+                    for order in range(faqs)
+                )
+
+            with transaction.atomic():
+                # Children were built before their parents had primary keys;
+                # bulk_create copies the parent's key into the foreign key
+                Lesson.objects.bulk_create(lessons, batch_size=self.batch_size)
+                AudioFile.objects.bulk_create(audio, batch_size=self.batch_size)
+                PDFFile.objects.bulk_create(pdfs, batch_size=self.batch_size)
+                LessonFAQ.objects.bulk_create(faq_rows, batch_size=self.batch_size)
+                Question.objects.bulk_create([question for question, _ in question_rows], batch_size=self.batch_size)
+                Choice.objects.bulk_create(
+                    [choice for _, question_choices in question_rows for choice in question_choices],
+                    batch_size=self.batch_size,
+                )
+            # bulk_create sends no signals, so the search documents are written here
+            search.index_lessons(lesson.pk for lesson in lessons)
+            lesson_ids.extend(lesson.pk for lesson in lessons)
+            self.on_progress('lessons', len(lesson_ids), count)
+        quiz.invalidate_answer_key()
+        return lesson_ids
+
+    def users(self, count, prefix='user', start_index=0, password_hash='!'):
+        """
+        Create `count` users named `{prefix}{index}`; returns their ids.
+        All users share `password_hash` (unusable by default), hashing once per user would dominate.
+        """
+        user_ids = []
+        for offset in range(0, count, self.chunk_size):
+            indexes = range(start_index + offset, start_index + min(count, offset + self.chunk_size))
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=f'{prefix}{index}', email=f'{prefix}{index}@example.com',
+                         password=password_hash, date_joined=self.now)
+                    for index in indexes
+                ], batch_size=self.batch_size)
+            user_ids.extend(user.pk for user in users)
+            self.on_progress('users', len(user_ids), count)
+        return user_ids
+
+    def progress(self, user_ids, lesson_ids, density=0.1, completed_ratio=0.6, days=180):
+        """
+        Give every user progress rows on about `density` of the lessons;
+        returns the number of rows created. Rollups are rebuilt afterwards.
+        """
+        n = len(lesson_ids)
+        mean = n * density
+        spread = math.sqrt(n * density * (1 - density))
+        sizes = [min(n, max(0, round(self.rng.gauss(mean, spread)))) for _ in user_ids]
+        total = sum(sizes)
+
+        done = 0
+        pending = []
+        for user_id, size in zip(user_ids, sizes):
+            for lesson_id in self.rng.sample(lesson_ids, size):
+                completed = self.rng.random() < completed_ratio
+                pending.append(UserProgress(
+                    user_id=user_id,
+                    lesson_id=lesson_id,
+                    is_completed=completed,
+                    completed_at=self.now - timedelta(seconds=self.rng.randrange(days * 86400)) if completed else None,
+                ))
+            if len(pending) >= self.chunk_size:
+                done += self._insert_progress(pending)
+                pending = []
+                self.on_progress('progress', done, total)
+        if pending:
+            done += self._insert_progress(pending)
+            self.on_progress('progress', done, total)
+
+        rollups.rebuild()
+        return done
+
+    def _insert_progress(self, rows):
+        with transaction.atomic():
+            UserProgress.objects.bulk_create(rows, batch_size=self.batch_size)
+        return len(rows)
+
+
+def _delete_all(model):
+    """DELETE every row of a table in one statement, without loading rows or sending signals"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+
+
+def flush(user_prefix):
+    """
+    Delete every lesson (with its content and all progress) and the users
+    whose username starts with `user_prefix`. Plain DELETE statements are
+    used because per-row signal handlers would take hours on large datasets,
+    so the work of those handlers is done here: the lessons' QR images are
+    removed and the search index and catalog snapshot are rebuilt.
+    """
+    lesson_ids = list(Lesson.objects.values_list('pk', flat=True))
+    with transaction.atomic():
+        for model in (
+            UserProgress, LessonProgressStats, DailyCompletionStats, QuizAttempt,
+            Choice, Question, LessonFAQ, AudioFile, PDFFile, LessonSearchDocument, Lesson,
+        ):
+            _delete_all(model)
+        generated = User.objects.filter(username__startswith=user_prefix)
+        Token.objects.filter(user__in=generated).delete()
+        user_ids, params = generated.values('pk').query.sql_with_params()
+        quote_name = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {quote_name(User._meta.db_table)} WHERE {quote_name(User._meta.pk.column)} IN ({user_ids})',
+                params,
+            )
+    qr.delete(lesson_ids)
+    search.rebuild()
+    catalog.build()
+    quiz.invalidate_answer_key()
@@ -0,0 +1,771 @@
+import base64
+import importlib
+import json
+import os
+import random
+import threading
+import time
+import shutil
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import rsa
+from google.auth import crypt, jwt
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import catalog
+from . import drive
+from . import google_certs
+from . import media
+from . import quiz
+from . import search
+from . import rollups
+from .authentication import revocation_list, tokens_for_user
+from .last_accessed import LastAccessedBuffer
+from . import synthetic
+from .models import AudioFile, Choice, PDFFile, DailyCompletionStats, LessonFAQ, Lesson, LessonProgressStats, RevokedToken, UserProgress
+from .pagination import FileCursorPagination
+from .representations import lesson_values, represent_lessons
+from .serializers import LessonSerializer
+from .ttl_cache import TTLCache
+
+
+class LessonQueryCountTests(TestCase):
+    """The lesson list and detail endpoints run the same queries for 5 or 5,000 lessons"""
+
+    def setUp(self):
+        self.generator = synthetic.Generator(seed=1)
+        self.lesson_ids = self.generator.lessons(5, questions=2, choices=3, faqs=1)
+
+    def count_queries(self, url):
+        # Measure the uncached path
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assert_constant_queries(self, url):
+        small = self.count_queries(url)
+        self.generator.lessons(4995, questions=2, choices=3, faqs=1, start_number=6)
+        cache.clear()
+        with self.assertNumQueries(small):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list(self):
+        self.assert_constant_queries('/api/lessons/')
+
+    def test_retrieve(self):
+        self.assert_constant_queries(f'/api/lessons/{self.lesson_ids[0]}/')
+
+
+class LessonRepresentationTests(TestCase):
+    """The fast read path renders the same bytes as LessonSerializer"""
+
+    def setUp(self):
+        self.rng = random.Random(20240101)
+        generator = synthetic.Generator(seed=1)
+        # Groups with different amounts of nested content, including none
+        for group in range(6):
+            generator.lessons(
+                10,
+                audio_files=self.rng.randint(0, 3),
+                pdf_files=self.rng.randint(0, 2),
+                questions=self.rng.randint(0, 5),
+                choices=self.rng.randint(0, 5),
+                faqs=self.rng.randint(0, 3),
+                start_number=group * 10 + 1,
+                inactive_ratio=0.2,
+            )
+        ids = list(Lesson.objects.values_list('pk', flat=True))
+        Lesson.objects.filter(pk__in=self.rng.sample(ids, len(ids) // 2)).update(
+            thumbnail='https://img.youtube.com/vi/example/hqdefault.jpg'
+        )
+
+    def test_byte_identical_to_serializer(self):
+        names = list(LessonSerializer.Meta.fields)
+        total = Lesson.objects.count()
+        for sample in range(100):
+            queryset = Lesson.objects.all() if self.rng.random() < 0.5 else Lesson.objects.filter(is_active=True)
+            offset = self.rng.randrange(total)
+            queryset = queryset[offset:offset + self.rng.randint(0, 20)]
+            if self.rng.random() < 0.3:
+                fields = None
+            else:
+                fields = self.rng.sample(names, self.rng.randint(0, len(names)))
+                if self.rng.random() < 0.2:
+                    fields.append('no_such_field')
+            with self.subTest(sample=sample, fields=fields):
+                expected = LessonSerializer(queryset.with_content(relations=fields), many=True, fields=fields).data
+                actual = represent_lessons(lesson_values(queryset), fields)
+                self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+
+# Executed on-commit callbacks would start a real snapshot rebuild
+@mock.patch('lessons.catalog.schedule_rebuild')
+class LessonCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.lesson_id, = synthetic.Generator(seed=1).lessons(1)
+
+    def test_edit_is_served_after_commit(self, schedule_rebuild):
+        url = f'/api/lessons/{self.lesson_id}/'
+        self.client.get(url)
+        self.client.get('/api/lessons/')
+
+        lesson = Lesson.objects.get(pk=self.lesson_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson.title = 'عنوان جديد'
+            lesson.save()
+
+        self.assertEqual(self.client.get(url).json()['title'], 'عنوان جديد')
+        self.assertEqual(self.client.get('/api/lessons/').json()['results'][0]['title'], 'عنوان جديد')
+
+    def test_list_needs_no_invalidation(self, schedule_rebuild):
+        # Another process's edit: no signal reaches this process
+        etag = self.client.get('/api/lessons/')['ETag']
+        Lesson.objects.filter(pk=self.lesson_id).update(title='عنوان جديد', updated_at=timezone.now())
+        response = self.client.get('/api/lessons/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['title'], 'عنوان جديد')
+
+    def test_detail_needs_no_invalidation(self, schedule_rebuild):
+        # Another process's edit: this process never runs the invalidation
+        url = f'/api/lessons/{self.lesson_id}/'
+        etag = self.client.get(url)['ETag']
+        Lesson.objects.filter(pk=self.lesson_id).update(title='عنوان جديد', updated_at=timezone.now())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['title'], 'عنوان جديد')
+
+
+@mock.patch('lessons.catalog.schedule_rebuild')
+class ContentSignalTests(TestCase):
+    def test_post_commit_work_runs_once_per_transaction(self, schedule_rebuild):
+        lesson_id, = synthetic.Generator(seed=1).lessons(1, questions=3, choices=4, faqs=2)
+        lesson = Lesson.objects.get(pk=lesson_id)
+        # What saving the lesson with its inlines in the admin does
+        with mock.patch('lessons.search.index_lessons') as index_lessons, \
+                mock.patch('lessons.quiz.invalidate_answer_key') as invalidate_answer_key, \
+                self.captureOnCommitCallbacks(execute=True):
+            lesson.save()
+            for question in lesson.questions.all():
+                question.save()
+                for choice in question.choices.all():
+                    choice.save()
+            for faq in lesson.faqs.all():
+                faq.save()
+
+        index_lessons.assert_called_once_with({lesson_id})
+        invalidate_answer_key.assert_called_once_with(lesson_id)
+        schedule_rebuild.assert_called_once_with()
+
+
+@mock.patch('lessons.catalog.schedule_rebuild')
+class CatalogTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings = override_settings(CATALOG_ROOT=root, CATALOG_KEEP=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.root = Path(root)
+        self.lesson_id, = synthetic.Generator(seed=1).lessons(1)
+
+    def edit(self, title):
+        Lesson.objects.filter(pk=self.lesson_id).update(title=title, updated_at=timezone.now())
+
+    def build(self, age):
+        manifest = catalog.build()
+        # Pruning keeps the newest bundles by mtime; builds within a test may share one
+        os.utime(self.root / f'catalog-{manifest["hash"]}.json', (age, age))
+        return manifest['hash']
+
+    def test_rebuild_after_change_gives_new_hash_and_keeps_newest_bundles(self, schedule_rebuild):
+        hashes = [self.build(1)]
+        for age, title in ((2, 'a'), (3, 'b')):
+            self.edit(title)
+            hashes.append(self.build(age))
+
+        self.assertEqual(len(set(hashes)), 3)
+        self.assertEqual(sorted(path.name for path in self.root.glob('catalog-*.json')),
+                         sorted(f'catalog-{digest}.json' for digest in hashes[1:]))
+        self.assertEqual(catalog.read_manifest()['hash'], hashes[-1])
+
+    def test_stale_manifest_is_served_while_a_rebuild_is_scheduled(self, schedule_rebuild):
+        # No snapshot yet: built inside the request
+        first = self.client.get('/api/catalog/manifest').json()
+        schedule_rebuild.assert_not_called()
+
+        self.edit('a')
+        with mock.patch('lessons.representations.represent_lessons') as render:
+            second = self.client.get('/api/catalog/manifest').json()
+        render.assert_not_called()
+        self.assertEqual(second['hash'], first['hash'])
+        schedule_rebuild.assert_called_once_with()
+
+        rebuilt = catalog.build(if_stale=True)
+        self.assertNotEqual(rebuilt['hash'], first['hash'])
+        # A build queued behind that one finds the manifest current and renders nothing
+        with mock.patch('lessons.representations.represent_lessons') as render:
+            self.assertEqual(catalog.build(if_stale=True), rebuilt)
+        render.assert_not_called()
+
+
+@mock.patch.object(FileCursorPagination, 'page_size', 2)
+class FileCursorPaginationTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.lesson_id, other_lesson_id = synthetic.Generator(seed=1).lessons(2, audio_files=0)
+        for lesson_id in (self.lesson_id, other_lesson_id):
+            for order in range(5):
+                AudioFile.objects.create(lesson_id=lesson_id, title=f'a{order}', order=order,
+                                         google_drive_link='https://example.com/a')
+
+    def titles(self, response):
+        return [row['title'] for row in response.json()['results']]
+
+    def test_filtered_pages_seek_and_stay_stable(self):
+        first = self.client.get(f'/api/audio-files/?lesson={self.lesson_id}&pagination=cursor')
+        self.assertEqual(self.titles(first), ['a0', 'a1'])
+
+        # Sorts before the cursor, so it must neither shift nor repeat the next page
+        AudioFile.objects.create(lesson_id=self.lesson_id, title='new', order=0,
+                                 google_drive_link='https://example.com/a')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(first.json()['next'])
+        self.assertEqual(self.titles(second), ['a2', 'a3'])
+        self.assertFalse(any('OFFSET' in query['sql'] for query in queries))
+
+        third = self.client.get(second.json()['next'])
+        self.assertEqual(self.titles(third), ['a4'])
+        self.assertIsNone(third.json()['next'])
+
+        previous = self.client.get(third.json()['previous'])
+        self.assertEqual(self.titles(previous), ['a2', 'a3'])
+        self.assertEqual(self.titles(self.client.get(previous.json()['previous'])), ['new', 'a1'])
+
+    def test_unfiltered_pages_cover_every_file(self):
+        seen = []
+        url = '/api/audio-files/?pagination=cursor'
+        while url:
+            response = self.client.get(url).json()
+            seen.extend(row['id'] for row in response['results'])
+            url = response['next']
+        self.assertEqual(seen, list(AudioFile.objects.order_by(*FileCursorPagination.ordering).values_list('id', flat=True)))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/audio-files/?pagination=cursor&cursor=cD1bMV0=')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(ROOT_URLCONF='hindpesh_backend.asgi_urls')
+class AsyncViewTests(TestCase):
+    async def test_lesson_list(self):
+        response = await self.async_client.get('/api/lessons/')
+        self.assertEqual(response.status_code, 200)
+
+    async def test_non_object_json_body(self):
+        for body in ('[1]', '"x"', '1'):
+            response = await self.async_client.post('/api/lessons/login/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+
+# Executed on-commit callbacks would start a real snapshot rebuild
+@mock.patch('lessons.catalog.schedule_rebuild')
+class QuizTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        quiz.answer_keys.clear()
+        self.lesson_id, = synthetic.Generator(seed=1).lessons(1, questions=3, choices=4)
+        self.key = quiz.get_answer_key(self.lesson_id)
+        self.questions = list(self.key.questions.items())
+
+    def submit(self, answers):
+        return self.client.post(f'/api/lessons/{self.lesson_id}/submit_quiz/', {'answers': answers},
+                                content_type='application/json')
+
+    def test_score(self, schedule_rebuild):
+        (first, (_, first_correct)), (second, (second_choices, second_correct)), (third, _) = self.questions
+        wrong = sorted(second_choices - set(second_correct))[:1]
+        response = self.submit({first: list(first_correct), second: wrong})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'score': 1, 'total': 3, 'results': [
+            {'question': first, 'correct': True, 'correct_choices': list(first_correct)},
+            {'question': second, 'correct': False, 'correct_choices': list(second_correct)},
+            # Unanswered: its correct choices are not given away
+            {'question': third, 'correct': False},
+        ]})
+
+    def test_empty_submission_reveals_nothing(self, schedule_rebuild):
+        results = self.submit({}).json()['results']
+        self.assertTrue(all('correct_choices' not in result for result in results))
+
+    def test_cache_hit_reads_nothing(self, schedule_rebuild):
+        question_id, (_, correct) = self.questions[0]
+        with self.assertNumQueries(0):
+            result = quiz.grade(quiz.get_answer_key(self.lesson_id), {question_id: list(correct)})
+        self.assertEqual(result.score, 1)
+
+    def test_choice_edit_rebuilds_the_key(self, schedule_rebuild):
+        question_id, (choice_ids, correct) = self.questions[0]
+        choice = Choice.objects.get(pk=sorted(choice_ids - set(correct))[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            choice.is_correct = True
+            choice.save()
+        self.assertIn(choice.pk, quiz.get_answer_key(self.lesson_id).questions[question_id][1])
+
+
+class ProgressUpsertTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('student')
+        self.client.force_login(self.user)
+        self.lesson_id, = synthetic.Generator(seed=1).lessons(1)
+
+    def test_replayed_completion_keeps_completed_at(self):
+        entry = {'lesson': self.lesson_id, 'is_completed': True, 'completed_at': '2024-01-01T10:00:00Z'}
+        self.client.post('/api/progress/batch/', {'entries': [entry]}, content_type='application/json')
+        self.client.post('/api/progress/', {'lesson': self.lesson_id}, content_type='application/json')
+        self.client.post('/api/progress/batch/', {'entries': [entry]}, content_type='application/json')
+
+        progress = UserProgress.objects.get(user=self.user, lesson_id=self.lesson_id)
+        self.assertEqual(progress.completed_at.isoformat(), '2024-01-01T10:00:00+00:00')
+        self.assertEqual(list(DailyCompletionStats.objects.values_list('date', 'completed_count')),
+                         [(progress.completed_at.date(), 1)])
+        self.assertEqual(rollups.verify(), [])
+
+    def test_rebuild_overwrites_drifted_rollups(self):
+        self.client.post('/api/progress/', {'lesson': self.lesson_id}, content_type='application/json')
+        LessonProgressStats.objects.update(started_count=7)
+        DailyCompletionStats.objects.create(date='2024-01-01', completed_count=3)
+        self.assertNotEqual(rollups.verify(), [])
+        rollups.rebuild()
+        self.assertEqual(rollups.verify(), [])
+
+
+class LastAccessedBufferTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('student')
+        self.lesson_id, = synthetic.Generator(seed=1).lessons(1)
+        self.progress = UserProgress.objects.create(user=user, lesson_id=self.lesson_id)
+        self.buffer = LastAccessedBuffer(max_entries=1, max_staleness=3600)
+        self.addCleanup(lambda: self.buffer._timer and self.buffer._timer.cancel())
+
+    def test_failed_flush_keeps_touches(self):
+        touched_at = timezone.now() + timezone.timedelta(hours=1)
+        failing_update = mock.patch('django.db.models.query.QuerySet.update',
+                                    side_effect=OperationalError('database is locked'))
+        with failing_update, self.assertLogs('lessons.last_accessed', 'ERROR'):
+            # The size-triggered flush fails inside touch() without raising
+            self.buffer.touch(self.progress.user_id, self.lesson_id, touched_at)
+        self.assertEqual(self.buffer.stats()['pending'], 1)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.progress.refresh_from_db()
+        self.assertEqual(self.progress.last_accessed, touched_at)
+
+
+class TokenRevocationTests(TestCase):
+    # SessionAuthentication comes first and sends no WWW-Authenticate header, so DRF answers 403
+    REJECTED = 403
+
+    def setUp(self):
+        self.user = User.objects.create_user('student')
+        self.token = Token.objects.create(user=self.user)
+        self.headers = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+        # Cached by the first request
+        self.assertEqual(self.client.get('/api/lessons/me/', **self.headers).status_code, 200)
+
+    def test_deactivated_user_is_rejected_immediately(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get('/api/lessons/me/', **self.headers).status_code, self.REJECTED)
+
+    def test_only_deactivation_revokes(self):
+        self.user.is_active = False
+        self.user.save()
+        self.user.first_name = 'x'
+        self.user.save()
+        self.user.refresh_from_db()
+        self.user.save()
+        self.assertEqual(RevokedToken.objects.filter(user_id=self.user.pk).count(), 1)
+
+    def test_deleted_token_is_rejected_immediately(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(self.client.get('/api/lessons/me/', **self.headers).status_code, self.REJECTED)
+
+    def test_rotation_by_another_process(self):
+        # create_token run by another process: it has its own token cache and
+        # Django cache, so nothing in this process's memory is cleared
+        with mock.patch('lessons.authentication.token_cache', TTLCache()), \
+                mock.patch('lessons.authentication.cache', LocMemCache('other-process', {})), \
+                self.captureOnCommitCallbacks(execute=True):
+            call_command('create_token', self.user.username, token='f' * 40, stdout=StringIO())
+
+        self.assertEqual(self.client.get('/api/lessons/me/', **self.headers).status_code, self.REJECTED)
+        rotated = {'HTTP_AUTHORIZATION': f'Token {"f" * 40}'}
+        self.assertEqual(self.client.get('/api/lessons/me/', **rotated).status_code, 200)
+
+    def test_cache_hit_reads_only_the_generation(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/lessons/me/', **self.headers).status_code, 200)
+
+
+class JWTRevocationTests(TestCase):
+    REJECTED = TokenRevocationTests.REJECTED
+
+    def setUp(self):
+        # Revocations of earlier tests were rolled back, but may still be mirrored in memory
+        cache.clear()
+        revocation_list.clear()
+        self.user = User.objects.create_user('student')
+        self.tokens = tokens_for_user(self.user)
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {self.tokens["access"]}'}
+
+    def refresh(self):
+        return self.client.post('/api/auth/token/refresh/', {'refresh': self.tokens['refresh']},
+                                content_type='application/json')
+
+    def test_revoke_then_refresh(self):
+        self.assertEqual(self.refresh().status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/revoke/', {'refresh': self.tokens['refresh']},
+                                        content_type='application/json', **self.headers)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.refresh().status_code, 401)
+        self.assertEqual(self.client.get('/api/lessons/me/', **self.headers).status_code, self.REJECTED)
+
+    def test_revocation_by_another_process(self):
+        # Loads this process's revocation list
+        self.assertEqual(self.client.get('/api/lessons/me/', **self.headers).status_code, 200)
+        # Written by a process that does not share this one's cache: no generation bump is seen
+        RevokedToken.objects.create(user_id=self.user.pk, expires_at=timezone.now() + timezone.timedelta(days=7))
+
+        self.assertEqual(self.refresh().status_code, 401)
+        with override_settings(JWT_REVOCATION_RELOAD_INTERVAL=0):
+            self.assertEqual(self.client.get('/api/lessons/me/', **self.headers).status_code, self.REJECTED)
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        for header, size, expected in (
+            (None, 10, None),
+            ('bytes=2-5', 10, (2, 5)),
+            ('bytes=2-', 10, (2, 9)),
+            ('bytes=2-50', 10, (2, 9)),
+            ('bytes=-3', 10, (7, 9)),
+            ('bytes=-30', 10, (0, 9)),
+            # Invalid, unsupported or empty-file ranges: the whole file is sent
+            ('bytes=5-3', 10, None),
+            ('bytes=5-3', 0, None),
+            ('bytes=-3', 0, None),
+            ('bytes=0-1,4-5', 10, None),
+            ('items=0-1', 10, None),
+        ):
+            with self.subTest(header=header, size=size):
+                self.assertEqual(media.parse_range(header, size), expected)
+
+    def test_unsatisfiable(self):
+        for header, size in (('bytes=10-', 10), ('bytes=10-20', 10), ('bytes=-0', 10), ('bytes=0-', 0)):
+            with self.subTest(header=header, size=size), self.assertRaises(ValueError):
+                media.parse_range(header, size)
+
+
+def _b64url(number):
+    return base64.urlsafe_b64encode(number.to_bytes((number.bit_length() + 7) // 8, 'big')).rstrip(b'=').decode()
+
+
+class _JWKSHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.fetches += 1
+        body = json.dumps({'keys': [
+            {'kty': 'RSA', 'kid': kid, 'n': _b64url(public.n), 'e': _b64url(public.e)}
+            for kid, public in server.keys.items()
+        ]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Cache-Control', f'public, max-age={server.max_age}')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class GoogleCertsTests(SimpleTestCase):
+    """Verification against a local JWKS stand-in for Google's certificate endpoint"""
+    AUDIENCE = 'client-id'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.key_pairs = {kid: rsa.newkeys(1024) for kid in ('old', 'new')}
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _JWKSHandler)
+        self.server.fetches = 0
+        self.server.max_age = 3600
+        self.serve('old')
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        settings = override_settings(GOOGLE_OAUTH2_CERTS_URL=f'http://127.0.0.1:{self.server.server_port}/certs',
+                                     GOOGLE_CERTS_REFRESH_MARGIN=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(setattr, google_certs, '_cert_cache', None)
+
+        # Moves the certificate cache's clock forward
+        self.elapsed = 0
+        real_monotonic = time.monotonic
+        clock = mock.patch('lessons.google_certs.time.monotonic', lambda: real_monotonic() + self.elapsed)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def serve(self, *kids):
+        self.server.keys = {kid: self.key_pairs[kid][0] for kid in kids}
+
+    def token(self, kid, issuer='https://accounts.google.com'):
+        private = self.key_pairs[kid][1].save_pkcs1().decode()
+        now = int(time.time())
+        payload = {'iss': issuer, 'aud': self.AUDIENCE, 'sub': '42', 'iat': now, 'exp': now + 600}
+        return jwt.encode(crypt.RSASigner.from_string(private, kid), payload).decode()
+
+    def verify(self, token):
+        return google_certs.verify_oauth2_token(token, self.AUDIENCE)
+
+    def test_jwks_to_pem(self):
+        public = self.key_pairs['old'][0]
+        certs = google_certs.jwks_to_pem({'keys': [
+            {'kty': 'RSA', 'kid': 'old', 'n': _b64url(public.n), 'e': _b64url(public.e)},
+            {'kty': 'EC', 'kid': 'ec', 'crv': 'P-256', 'x': 'AA', 'y': 'AA'},
+            {'kty': 'RSA', 'n': _b64url(public.n), 'e': _b64url(public.e)},
+        ]})
+        self.assertEqual(list(certs), ['old'])
+        self.assertEqual(rsa.PublicKey.load_pkcs1(certs['old'].encode()), public)
+
+    def test_verifies_with_cached_certificates(self):
+        self.assertEqual(self.verify(self.token('old'))['sub'], '42')
+        self.assertEqual(self.verify(self.token('old'))['sub'], '42')
+        self.assertEqual(self.server.fetches, 1)
+        with self.assertRaises(ValueError):
+            self.verify(self.token('old', issuer='https://evil.example.com'))
+        with self.assertRaises(ValueError):
+            google_certs.verify_oauth2_token(self.token('old'), 'another-client')
+
+    def test_refetch_after_max_age(self):
+        self.server.max_age = 60
+        self.verify(self.token('old'))
+        self.elapsed = 30
+        self.verify(self.token('old'))
+        self.assertEqual(self.server.fetches, 1)
+        self.elapsed = 61
+        self.verify(self.token('old'))
+        self.assertEqual(self.server.fetches, 2)
+
+    def test_refetch_on_unknown_key_id(self):
+        self.verify(self.token('old'))
+        self.serve('old', 'new')
+        # Unknown key ids refetch at most every min_refresh_interval
+        with self.assertRaises(ValueError):
+            self.verify(self.token('new'))
+        self.assertEqual(self.server.fetches, 1)
+        self.elapsed = 61
+        self.assertEqual(self.verify(self.token('new'))['sub'], '42')
+        self.assertEqual(self.server.fetches, 2)
+
+
+class DriveFileIdTests(TestCase):
+    FILE_ID = '1AbCdEfGhIjKlMnOpQrStUvWxYz012345'
+
+    def test_extract_file_id(self):
+        for link, expected in (
+            (f'https://drive.google.com/file/d/{self.FILE_ID}/view?usp=sharing', self.FILE_ID),
+            (f'https://drive.google.com/file/d/{self.FILE_ID}', self.FILE_ID),
+            (f'https://drive.google.com/open?id={self.FILE_ID}', self.FILE_ID),
+            (f'https://drive.google.com/uc?id={self.FILE_ID}&export=download', self.FILE_ID),
+            (f'https://drive.google.com/uc?export=download&id={self.FILE_ID}', self.FILE_ID),
+            (f'https://docs.google.com/document/d/{self.FILE_ID}/edit', self.FILE_ID),
+            (f'https://example.com/file/d/{self.FILE_ID}/view', ''),
+            ('https://drive.google.com/open?id=short', ''),
+            (f'https://drive.google.com/open?id={self.FILE_ID}!', ''),
+            (f'https://drive.google.com/file/d/{"a" * (drive.MAX_ID_LENGTH + 1)}/view', ''),
+            ('https://drive.google.com/drive/folders', ''),
+            ('not a link', ''),
+            ('http://[::1', ''),
+            ('', ''),
+            (None, ''),
+        ):
+            with self.subTest(link=link):
+                self.assertEqual(drive.extract_file_id(link), expected)
+
+    def test_backfill(self):
+        lesson_id, = synthetic.Generator(seed=1).lessons(1, audio_files=0, pdf_files=0)
+        link = f'https://drive.google.com/open?id={self.FILE_ID}'
+        # bulk_create skips save(), like rows written before the column existed
+        AudioFile.objects.bulk_create([
+            AudioFile(lesson_id=lesson_id, title='a', google_drive_link=link, order=0),
+            AudioFile(lesson_id=lesson_id, title='b', google_drive_link='https://example.com/a.mp3', order=1),
+        ])
+        PDFFile.objects.bulk_create([PDFFile(lesson_id=lesson_id, title='c', google_drive_link=link, order=0)])
+
+        migration = importlib.import_module('lessons.migrations.0011_backfill_drive_file_ids')
+        migration.backfill(apps, None)
+
+        self.assertEqual(sorted(AudioFile.objects.values_list('title', 'drive_file_id')),
+                         [('a', self.FILE_ID), ('b', '')])
+        self.assertEqual(list(PDFFile.objects.values_list('drive_file_id', flat=True)), [self.FILE_ID])
+
+
+class FakeDriveFetcher:
+    """MEDIA_PROXY_FETCHER for the tests: serves CONTENT for every file id"""
+    CONTENT = bytes(range(256)) * 4
+    downloads = 0
+
+    def __call__(self, file_id, f):
+        type(self).downloads += 1
+        f.write(self.CONTENT)
+        return 'audio/mpeg'
+
+
+class MediaFileTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings = override_settings(MEDIA_CACHE_ROOT=root, MEDIA_PROXY_FETCHER='lessons.tests.FakeDriveFetcher')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        FakeDriveFetcher.downloads = 0
+
+        lesson_id, = synthetic.Generator(seed=1).lessons(1, audio_files=1)
+        self.url = f'/api/audio-files/{AudioFile.objects.get(lesson_id=lesson_id).pk}/stream'
+        self.content = FakeDriveFetcher.CONTENT
+
+    def get(self, **headers):
+        response = self.client.get(self.url, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_range(self):
+        response, body = self.get(HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 2-5/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '4')
+        self.assertEqual(body, self.content[2:6])
+
+    def test_invalid_range_sends_the_whole_file(self):
+        response, body = self.get(HTTP_RANGE='bytes=5-3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+
+    def test_unsatisfiable_range(self):
+        response, _ = self.get(HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_if_range(self):
+        etag = self.get()[0]['ETag']
+        response, body = self.get(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        # The client's copy is outdated: the whole current file is sent
+        response, body = self.get(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+
+    def test_cache_reuse(self):
+        first, first_body = self.get()
+        second, second_body = self.get()
+        self.assertEqual(FakeDriveFetcher.downloads, 1)
+        self.assertEqual(second_body, first_body)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=first['ETag'])[0].status_code, 304)
+        self.assertEqual(FakeDriveFetcher.downloads, 1)
+
+
+class SearchNormalizationTests(SimpleTestCase):
+    def test_normalize(self):
+        for text, expected in (
+            # Harakat, shadda and sukun
+            ('الْعَرَبِيَّة', 'عربيه'),
+            # Tatweel
+            ('العربيـــة', 'عربيه'),
+            # Alef variants (the article is only dropped from words keeping three letters)
+            ('أحمد إسلام آمن ٱسم', 'احمد اسلام امن اسم'),
+            # Alef maqsura and Farsi yeh
+            ('على فی', 'علي في'),
+            # Taa marbuta
+            ('مدرسة', 'مدرسه'),
+            # The article, also after و ف ب ك and as لل
+            ('والكتاب بالقلم للطالب', 'كتاب قلم طالب'),
+            ('الم', 'الم'),
+            ('Arabic LESSON', 'arabic lesson'),
+        ):
+            with self.subTest(text=text):
+                self.assertEqual(search.normalize(text), expected)
+
+    def test_parse_query(self):
+        self.assertEqual(search.parse_query('العربية، العربيه! عربية؟ الدرس'), ['عربيه', 'درس'])
+        self.assertEqual(search.parse_query('  ,;! '), [])
+        self.assertEqual(len(search.parse_query(' '.join(f'كلمة{i}' for i in range(20)))), search.MAX_TERMS)
+
+
+# Executed on-commit callbacks would start a real snapshot rebuild
+@mock.patch('lessons.catalog.schedule_rebuild')
+class SearchEndpointTests(TestCase):
+    def lesson(self, number, title, description='وصف', is_active=True, faq=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson = Lesson.objects.create(number=number, title=title, description=description,
+                                           youtube_id='x', duration='10:00', is_active=is_active)
+            if faq is not None:
+                LessonFAQ.objects.create(lesson=lesson, question=faq, answer='جواب', order=0)
+        return lesson.pk
+
+    def search(self, query):
+        response = self.client.get('/api/lessons/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_ranking_and_highlighting(self, schedule_rebuild):
+        in_faq = self.lesson(1, 'درس أول', faq='ما هي اللغة العربية؟')
+        in_title = self.lesson(2, 'قواعد اللغة العربيّة')
+        in_description = self.lesson(3, 'درس ثالث', description='مقدمة في العربية الفصحى')
+        self.lesson(4, 'درس رابع')
+
+        results = self.search('الْعَرَبِيَّة')
+        # Title matches outrank description matches, which outrank FAQ matches
+        self.assertEqual([result['id'] for result in results], [in_title, in_description, in_faq])
+        self.assertEqual(results[0]['highlighted_title'], 'قواعد اللغة <mark>العربيّة</mark>')
+        self.assertEqual([result['matched_in'] for result in results[1:]], ['description', 'faqs'])
+        self.assertIn('<mark>العربية</mark>', results[2]['snippet'])
+
+    def test_prefix_and_every_word(self, schedule_rebuild):
+        lesson_id = self.lesson(1, 'المدرسة الكبيرة')
+        self.lesson(2, 'المدرسة')
+        self.assertEqual([result['id'] for result in self.search('مدرس كبير')], [lesson_id])
+
+    def test_inactive_lessons_are_hidden_from_anonymous_users(self, schedule_rebuild):
+        self.lesson(1, 'العربية', is_active=False)
+        self.assertEqual(self.search('العربية'), [])
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(len(self.search('العربية')), 1)
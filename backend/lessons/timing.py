@@ -0,0 +1,167 @@
+"""
+Per-request performance instrumentation.
+
+ServerTimingMiddleware measures every request's total time, the time spent
+in SQL queries and their count, plus named spans such as `serialize` (see
+LessonViewSet), and reports them in a `Server-Timing` response header, e.g.
+
+    Server-Timing: db;dur=3.1;desc="4 queries", serialize;dur=1.2, total;dur=9.8
+
+Requests slower than SLOW_REQUEST_MS and queries slower than SLOW_QUERY_MS
+are logged (logger `lessons.timing`) with the view name and the SQL.
+
+The numbers of the current request live in a context variable, so queries
+that async views run in worker threads (sync_to_async copies the context)
+are counted too. The query wrapper is installed once on every database
+connection (connection.execute_wrappers) instead of being pushed and popped
+per request; outside a request it only costs a context variable lookup.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('server_timing', default=None)
+
+# Longest SQL text written to the slow request/query log
+MAX_LOGGED_SQL = 2000
+
+
+class RequestTimings:
+    """Numbers collected while serving one request"""
+
+    __slots__ = ('request', 'slow_query', 'db_time', 'queries', 'slowest_sql', 'slowest_time', 'spans')
+
+    def __init__(self, request, slow_query):
+        self.request = request
+        self.slow_query = slow_query
+        self.db_time = 0.0
+        self.queries = 0
+        self.slowest_sql = None
+        self.slowest_time = 0.0
+        self.spans = {}
+
+
+def view_name(request):
+    """Name of the URL pattern that served the request, or its path when unresolved"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return request.path
+    return match.view_name or match._func_path
+
+
+def _truncate(sql):
+    return sql if len(sql) <= MAX_LOGGED_SQL else sql[:MAX_LOGGED_SQL] + '...'
+
+
+def _execute(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        timings.db_time += duration
+        timings.queries += 1
+        if duration > timings.slowest_time:
+            timings.slowest_time = duration
+            timings.slowest_sql = sql
+        if duration >= timings.slow_query:
+            logger.warning(
+                'Slow query (%.1f ms) in %s: %s',
+                duration * 1000, view_name(timings.request), _truncate(sql),
+            )
+
+
+def install(db_connection):
+    """Time the queries of a database connection (idempotent)"""
+    if _execute not in db_connection.execute_wrappers:
+        db_connection.execute_wrappers.append(_execute)
+
+
+def _connection_created(sender, connection, **kwargs):
+    install(connection)
+
+
+connection_created.connect(_connection_created, dispatch_uid='lessons.timing')
+
+
+@contextmanager
+def span(name):
+    """Add the time spent in the block to the current request's `name` metric"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.spans[name] = timings.spans.get(name, 0.0) + time.perf_counter() - started
+
+
+class ServerTimingMiddleware:
+    """Adds a Server-Timing header and logs slow requests; place it first in MIDDLEWARE"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = getattr(settings, 'SERVER_TIMING_HEADER', True)
+        self.slow_request = getattr(settings, 'SLOW_REQUEST_MS', 500) / 1000
+        self.slow_query = getattr(settings, 'SLOW_QUERY_MS', 100) / 1000
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Connections opened before this module was imported missed the signal
+        install(connection)
+        timings = RequestTimings(request, self.slow_query)
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        timings = RequestTimings(request, self.slow_query)
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, time.perf_counter() - started)
+
+    def _finish(self, request, response, timings, total):
+        if self.header:
+            metrics = [f'db;dur={timings.db_time * 1000:.1f};desc="{timings.queries} queries"']
+            metrics.extend(f'{name};dur={duration * 1000:.1f}' for name, duration in timings.spans.items())
+            metrics.append(f'total;dur={total * 1000:.1f}')
+            if response.has_header('Server-Timing'):
+                metrics.insert(0, response['Server-Timing'])
+            response['Server-Timing'] = ', '.join(metrics)
+
+        if total >= self.slow_request:
+            logger.warning(
+                'Slow request (%.1f ms) %s %s -> %s in %s: %d queries in %.1f ms%s; slowest query (%.1f ms): %s',
+                total * 1000, request.method, request.get_full_path(), response.status_code,
+                view_name(request), timings.queries, timings.db_time * 1000,
+                ''.join(f', {name} {duration * 1000:.1f} ms' for name, duration in timings.spans.items()),
+                timings.slowest_time * 1000, _truncate(timings.slowest_sql or '-'),
+            )
+        return response
@@ -1,6 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import LessonViewSet, AudioFileViewSet, PDFFileViewSet, UserProgressViewSet, GoogleLoginView
+from .views import (
+    LessonViewSet, AudioFileViewSet, PDFFileViewSet, UserProgressViewSet, GoogleLoginView,
+    JWTRefreshView, JWTRevokeView, lesson_qr_code, catalog_manifest, media_file,
+)
 
 router = DefaultRouter()
 router.register(r'lessons', LessonViewSet, basename='lesson')
@@ -11,5 +14,11 @@ router.register(r'progress', UserProgressViewSet, basename='userprogress')
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/google/', GoogleLoginView.as_view(), name='google_login'),
+    path('auth/token/refresh/', JWTRefreshView.as_view(), name='token_refresh'),
+    path('auth/token/revoke/', JWTRevokeView.as_view(), name='token_revoke'),
+    path('lessons/<int:pk>/qr.<str:image_format>', lesson_qr_code, name='lesson_qr_code'),
+    path('catalog/manifest', catalog_manifest, name='catalog_manifest'),
+    path('audio-files/<int:pk>/stream', media_file, {'kind': 'audio'}, name='audio_file_stream'),
+    path('pdf-files/<int:pk>/stream', media_file, {'kind': 'pdf'}, name='pdf_file_stream'),
 ]
 
@@ -1,25 +1,110 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.views import APIView
+import hashlib
+from datetime import timedelta
 from django.contrib.auth import authenticate
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
 from django.contrib.auth.models import User
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET, require_safe
 from rest_framework.authtoken.models import Token
-from rest_framework_simplejwt.tokens import RefreshToken
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
-from .models import Lesson, AudioFile, PDFFile, UserProgress
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.views import TokenRefreshView
+from django.conf import settings
+from . import cache as lesson_cache
+from . import catalog
+from . import drive
+from . import media
+from . import progress_export
+from . import qr
+from . import quiz
+from . import representations
+from .last_accessed import buffer as last_accessed_buffer
+from . import rollups
+from . import search as lesson_search
+from . import timing
+from .authentication import token_cache, tokens_for_user, revoke_token
+from .google_certs import verify_oauth2_token
+from .pagination import LessonPagination, FilePagination
+from .models import Lesson, AudioFile, PDFFile, UserProgress, LessonProgressStats, DailyCompletionStats
 from .serializers import (
     LessonSerializer, 
     AudioFileSerializer, 
     PDFFileSerializer,
     AudioFileCreateSerializer,
     PDFFileCreateSerializer,
-    UserProgressSerializer
+    UserProgressSerializer,
+    UserProgressBatchSerializer,
+    QuizSubmissionSerializer,
+    JWTRefreshSerializer,
 )
 
 
+LOGIN_MISSING_ERROR = 'اسم المستخدم وكلمة المرور مطلوبان'
+LOGIN_INVALID_ERROR = 'اسم المستخدم أو كلمة المرور غير صحيحة'
+
+
+LOGIN_TOKEN_TYPES = ('token', 'jwt')
+LOGIN_TOKEN_TYPE_ERROR = f"token_type must be one of: {', '.join(LOGIN_TOKEN_TYPES)}"
+
+
+def get_login_token_type(data):
+    """Token type requested by a login body (LOGIN_TOKEN_TYPE by default); None if unknown"""
+    token_type = data.get('token_type') or getattr(settings, 'LOGIN_TOKEN_TYPE', 'token')
+    return token_type if token_type in LOGIN_TOKEN_TYPES else None
+
+
+def password_login_payload(user, token_type='token'):
+    """Response body of a successful username/password login"""
+    if token_type == 'jwt':
+        return {
+            **tokens_for_user(user),
+            'user_id': user.id,
+            'username': user.username
+        }
+    token, created = Token.objects.get_or_create(user=user)
+    return {
+        'token': token.key,
+        'user_id': user.id,
+        'username': user.username
+    }
+
+
+def google_login_payload(idinfo):
+    """Get or create the user behind a verified Google ID token and mint JWTs for them"""
+    # Get user info
+    email = idinfo['email']
+    first_name = idinfo.get('given_name', '')
+    last_name = idinfo.get('family_name', '')
+
+    # Get or create user
+    user, created = User.objects.get_or_create(username=email, defaults={
+        'email': email,
+        'first_name': first_name,
+        'last_name': last_name
+    })
+
+    # Generate JWT
+    return {
+        **tokens_for_user(user),
+        'user': {
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name
+        }
+    }
+
+
 class LessonViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing lessons.
@@ -28,14 +113,26 @@ class LessonViewSet(viewsets.ModelViewSet):
     - POST /api/lessons/ - Create lesson (authenticated only)
     - PUT/PATCH /api/lessons/{id}/ - Update lesson (authenticated only)
     - DELETE /api/lessons/{id}/ - Delete lesson (authenticated only)
+    - GET /api/lessons/search/?q=... - Full-text search (public)
+    - POST /api/lessons/{id}/submit_quiz/ - Grade answers to the lesson's quiz (public)
+    - GET /api/lessons/drive_files/?id=... - Audio/PDF files using a Drive file (admin only)
+
+    List and retrieve accept `?fields=number,title,...` to return only the given
+    fields; nested relations are neither queried nor serialized unless listed.
+    The list accepts `?pagination=cursor` for keyset pagination on `number`.
     """
     queryset = Lesson.objects.filter(is_active=True)
     serializer_class = LessonSerializer
+    pagination_class = LessonPagination
 
     def get_permissions(self):
         """
         Allow read-only access to everyone, but require authentication for write operations.
+        Extra actions that declare their own permission_classes (login, me, search, submit_quiz, drive_files, cache_stats) keep them.
         """
+        handler = getattr(self, self.action, None) if self.action else None
+        if 'permission_classes' in getattr(handler, 'kwargs', {}):
+            return super().get_permissions()
         if self.action in ['list', 'retrieve']:
             permission_classes = [AllowAny]
         else:
@@ -51,6 +148,136 @@ class LessonViewSet(viewsets.ModelViewSet):
             return Lesson.objects.all()
         return Lesson.objects.filter(is_active=True)
 
+    def get_requested_fields(self):
+        """Parse the `?fields=` query parameter into a list of field names (None = all)"""
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        return [name.strip() for name in fields.split(',') if name.strip()]
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ['list', 'retrieve']:
+            kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def _serialize(self, rows):
+        """
+        LessonSerializer's representation of lesson rows from lesson_values(),
+        built by the fast read path in lessons/representations.py (which also
+        queries the nested content); timed as the request's `serialize` metric.
+        """
+        with timing.span('serialize'):
+            return representations.represent_lessons(rows, self.get_requested_fields())
+
+    def _list_response(self):
+        queryset = representations.lesson_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self._serialize(queryset))
+        return self.get_paginated_response(self._serialize(page))
+
+    def _retrieve_response(self):
+        queryset = representations.lesson_values(self.filter_queryset(self.get_queryset()))
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return Response(self._serialize([row])[0])
+
+    def _validators(self, request, count, last_modified):
+        """
+        Build a strong ETag and a Last-Modified timestamp from a content version.
+        Child edits bump Lesson.updated_at (see lessons/signals.py), so the
+        lesson rows alone are enough to detect any change.
+        """
+        version = ':'.join([
+            representations.LAYOUT_VERSION,
+            lesson_cache.scope_for(request),
+            request.META.get('QUERY_STRING', ''),
+            str(count),
+            last_modified.isoformat() if last_modified else '',
+        ])
+        etag = '"%s"' % hashlib.md5(version.encode('utf-8')).hexdigest()
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        return etag, timestamp
+
+    def _conditional_response(self, request, etag, timestamp):
+        """Return a 304 response if the client's copy is still current, else None"""
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is not None:
+            self._set_validators(response, etag, timestamp)
+        return response
+
+    def _set_validators(self, response, etag, timestamp):
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            # Clients must revalidate instead of trusting a heuristic freshness lifetime
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """
+        List lessons, answering conditional requests from the content version
+        and serving the assembled page from the cache when possible. The
+        version is read from the database on every request and the page is
+        cached under its ETag, so it is never sent with another version's.
+        """
+        version = self.filter_queryset(self.get_queryset()).aggregate(
+            count=Count('pk'), last_modified=Max('updated_at')
+        )
+        etag, timestamp = self._validators(request, version['count'], version['last_modified'])
+        not_modified = self._conditional_response(request, etag, timestamp)
+        if not_modified is not None:
+            return not_modified
+
+        key = lesson_cache.list_key(lesson_cache.scope_for(request), request, etag)
+        payload = lesson_cache.get_payload(key)
+        if payload is None:
+            response = self._list_response()
+            if response.status_code == status.HTTP_200_OK:
+                lesson_cache.set_payload(key, response.data)
+        else:
+            response = Response(payload)
+        return self._set_validators(response, etag, timestamp)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieve a lesson, answering conditional requests from its updated_at
+        and serving its serialized payload from the cache when possible. The
+        payload is cached under its ETag (and so its updated_at): an edit
+        moves every process to a new key, whatever its cache backend.
+        """
+        pk = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if not str(pk).isdigit() or str(int(pk)) != str(pk):
+            # Only canonical ids are cached, so each lesson version has a single key
+            return self._retrieve_response()
+        use_cache = self.get_requested_fields() is None
+
+        last_modified = self.get_queryset().filter(pk=pk).values_list('updated_at', flat=True).first()
+        if last_modified is None:
+            # Unknown or hidden lesson; let the regular lookup produce the 404
+            return self._retrieve_response()
+        etag, timestamp = self._validators(request, 1, last_modified)
+        not_modified = self._conditional_response(request, etag, timestamp)
+        if not_modified is not None:
+            return not_modified
+
+        if not use_cache:
+            # Sparse representations are cheap to build and are not cached per lesson
+            response = self._retrieve_response()
+            return self._set_validators(response, etag, timestamp)
+
+        key = lesson_cache.detail_key(lesson_cache.scope_for(request), pk, etag)
+        payload = lesson_cache.get_payload(key)
+        if payload is None:
+            response = self._retrieve_response()
+            if response.status_code == status.HTTP_200_OK:
+                lesson_cache.set_payload(key, response.data)
+        else:
+            response = Response(payload)
+        return self._set_validators(response, etag, timestamp)
+
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def add_audio(self, request, pk=None):
         """Add an audio file to a lesson"""
@@ -71,35 +298,128 @@ class LessonViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def search(self, request):
+        """
+        Arabic-aware full-text search over lesson titles, descriptions,
+        quizzes and FAQs (see lessons/search.py), best matches first.
+        GET /api/lessons/search/?q=...&limit=20
+        `highlighted_title` and `snippet` are HTML-escaped text with the
+        matching words wrapped in <mark>; `matched_in` names the column the
+        snippet comes from.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, lesson_search.MAX_LIMIT))
+
+        with timing.span('search'):
+            # Same visibility as the lesson list
+            results = lesson_search.results(query, active_only=not request.user.is_authenticated, limit=limit)
+        return Response({'query': query, 'results': results})
+
+    @action(detail=True, methods=['post'], permission_classes=[AllowAny])
+    def submit_quiz(self, request, pk=None):
+        """
+        Grade answers to the lesson's quiz against its cached answer key (see
+        lessons/quiz.py); attempts of signed-in users are recorded.
+        POST /api/lessons/{id}/submit_quiz/
+        Body: {"answers": {"<question id>": [<choice id>, ...], ...}}
+        Returns the score and, per question in display order, whether it was
+        answered correctly and, for answered questions only, the ids of its
+        correct choices.
+        """
+        if not str(pk).isdigit():
+            raise Http404
+        answer_key = quiz.get_answer_key(int(pk))
+        # Same visibility as retrieve: inactive lessons only for signed-in users
+        if answer_key is None or not (answer_key.is_active or request.user.is_authenticated):
+            raise Http404
+
+        serializer = QuizSubmissionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            result = quiz.grade(answer_key, serializer.validated_data['answers'])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.user.is_authenticated:
+            quiz.record_attempt(request.user, int(pk), result)
+        return Response({'score': result.score, 'total': result.total, 'results': result.results})
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def drive_files(self, request):
+        """
+        Audio and PDF files by Google Drive file id (see lessons/drive.py).
+        GET /api/lessons/drive_files/?id=<file id or share link> - every file using it
+        GET /api/lessons/drive_files/ - every file id used more than once, with its files
+        Both are answered from the drive_file_id indexes.
+        """
+        value = request.query_params.get('id')
+        if value is not None:
+            file_id = drive.normalize(value)
+            if not file_id:
+                return Response({'error': 'id must be a Google Drive file id or link'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            return Response(self._drive_file_usages([file_id])[0])
+
+        duplicated = set(
+            AudioFile.objects.filter(drive_file_id__in=PDFFile.objects.values('drive_file_id'))
+            .exclude(drive_file_id='').values_list('drive_file_id', flat=True).distinct()
+        )
+        for model in (AudioFile, PDFFile):
+            duplicated.update(
+                model.objects.exclude(drive_file_id='').values('drive_file_id').order_by()
+                .annotate(count=Count('pk')).filter(count__gt=1).values_list('drive_file_id', flat=True)
+            )
+        return Response({'duplicates': self._drive_file_usages(sorted(duplicated))})
+
+    @staticmethod
+    def _drive_file_usages(file_ids):
+        """{drive_file_id, audio_files, pdf_files} for each of `file_ids`, with two queries"""
+        usages = {file_id: {'drive_file_id': file_id, 'audio_files': [], 'pdf_files': []} for file_id in file_ids}
+        for model, key in ((AudioFile, 'audio_files'), (PDFFile, 'pdf_files')):
+            rows = (
+                model.objects.filter(drive_file_id__in=file_ids)
+                .order_by('lesson__number', 'order', 'pk')
+                .values('drive_file_id', 'id', 'title', 'lesson_id', 'lesson__number')
+            )
+            for row in rows:
+                usages[row['drive_file_id']][key].append({
+                    'id': row['id'],
+                    'title': row['title'],
+                    'lesson': row['lesson_id'],
+                    'lesson_number': row['lesson__number'],
+                })
+        return list(usages.values())
+
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
     def login(self, request):
         """
         Custom login endpoint that returns a token.
         POST /api/lessons/login/
         Body: {"username": "admin", "password": "your_password"}
+        Add "token_type": "jwt" to get a JWT access/refresh pair instead.
         """
         username = request.data.get('username')
         password = request.data.get('password')
 
         if not username or not password:
-            return Response(
-                {'error': 'اسم المستخدم وكلمة المرور مطلوبان'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            return Response({'error': LOGIN_MISSING_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+
+        token_type = get_login_token_type(request.data)
+        if token_type is None:
+            return Response({'error': LOGIN_TOKEN_TYPE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
 
         user = authenticate(username=username, password=password)
         if user:
-            token, created = Token.objects.get_or_create(user=user)
-            return Response({
-                'token': token.key,
-                'user_id': user.id,
-                'username': user.username
-            })
+            return Response(password_login_payload(user, token_type))
         else:
-            return Response(
-                {'error': 'اسم المستخدم أو كلمة المرور غير صحيحة'},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
+            return Response({'error': LOGIN_INVALID_ERROR}, status=status.HTTP_401_UNAUTHORIZED)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def me(self, request):
@@ -113,18 +433,141 @@ class LessonViewSet(viewsets.ModelViewSet):
             'is_staff': request.user.is_staff
         })
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        """
+        Hit/miss counters of the lesson payload cache, plus the token
+        authentication, quiz answer key and media file caches of this server
+        process.
+        GET /api/lessons/cache_stats/
+        """
+        return Response({
+            **lesson_cache.stats(),
+            'token_auth': token_cache.stats(),
+            'quiz_answer_keys': quiz.answer_keys.stats(),
+            'media': media.get_media_cache().stats(),
+        })
+
+
+@require_GET
+def lesson_qr_code(request, pk, image_format):
+    """
+    Serve a lesson's QR code image from the on-disk store.
+    GET /api/lessons/{id}/qr.png  or  /api/lessons/{id}/qr.svg
+    URLs carrying the current `?v=` digest are cached by clients for a year.
+    """
+    if image_format not in qr.FORMATS or not Lesson.objects.filter(pk=pk).exists():
+        raise Http404
+    path = qr.get_or_create(pk, image_format)
+    response = FileResponse(open(path, 'rb'), content_type=qr.FORMATS[image_format])
+    if request.GET.get('v') == qr.url_digest(qr.lesson_url(pk)):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+
+MEDIA_MODELS = {'audio': AudioFile, 'pdf': PDFFile}
+
+
+def _media_file_response(request, f, entry, etag):
+    """The whole cached file, or the byte range asked for when `If-Range` (if sent) still matches"""
+    byte_range = None
+    if request.headers.get('If-Range', etag) == etag:
+        try:
+            byte_range = media.parse_range(request.headers.get('Range'), entry.size)
+        except ValueError:
+            f.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{entry.size}'
+            return response
+    if byte_range is None:
+        return FileResponse(f, content_type=entry.content_type)
+    start, end = byte_range
+    response = FileResponse(media.RangeFile(f, start, end), status=206, content_type=entry.content_type)
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{entry.size}'
+    return response
+
+
+@require_safe
+def media_file(request, kind, pk):
+    """
+    Stream an audio or PDF file of an active lesson through the caching
+    proxy (see lessons/media.py).
+    GET /api/audio-files/{id}/stream  or  /api/pdf-files/{id}/stream
+    Honors a single-range `Range` header (206, or 416 when unsatisfiable),
+    `If-Range` and `If-None-Match` on the content digest.
+    """
+    file_id = (
+        MEDIA_MODELS[kind].objects.filter(pk=pk, lesson__is_active=True)
+        .values_list('drive_file_id', flat=True).first()
+    )
+    if not file_id:
+        raise Http404
+
+    media_cache = media.get_media_cache()
+    try:
+        with timing.span('media'):
+            entry = media_cache.get(file_id)
+            try:
+                f = open(entry.path, 'rb')
+            except FileNotFoundError:
+                # Evicted between the lookup and the open
+                entry = media_cache.get(file_id)
+                f = open(entry.path, 'rb')
+    except media.UpstreamError as e:
+        return JsonResponse({'error': str(e)}, status=502)
+
+    etag = '"%s"' % entry.digest
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = _media_file_response(request, f, entry, etag)
+    else:
+        f.close()
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = f"public, max-age={getattr(settings, 'MEDIA_PROXY_MAX_AGE', 86400)}"
+    return response
+
+
+@require_GET
+def catalog_manifest(request):
+    """
+    Hash and URL of the current catalog snapshot (see lessons/catalog.py).
+    GET /api/catalog/manifest
+    Clients download the bundle at `url` only when `hash` differs from theirs.
+    """
+    manifest = catalog.get_manifest()
+    etag = '"%s"' % manifest['hash']
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse({
+            key: manifest[key] for key in ('hash', 'url', 'size', 'lessons', 'built_at')
+        })
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
 
 class AudioFileViewSet(viewsets.ModelViewSet):
     """ViewSet for managing audio files"""
     queryset = AudioFile.objects.all()
     serializer_class = AudioFileSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = FilePagination
 
     def get_queryset(self):
+        queryset = AudioFile.objects.all()
         lesson_id = self.request.query_params.get('lesson', None)
         if lesson_id:
-            return AudioFile.objects.filter(lesson_id=lesson_id)
-        return AudioFile.objects.all()
+            queryset = queryset.filter(lesson_id=lesson_id)
+        # ?drive_file=<file id or share link>, looked up through the drive_file_id index
+        drive_file = self.request.query_params.get('drive_file', None)
+        if drive_file:
+            file_id = drive.normalize(drive_file)
+            queryset = queryset.filter(drive_file_id=file_id) if file_id else queryset.none()
+        return queryset
 
 
 class PDFFileViewSet(viewsets.ModelViewSet):
@@ -132,6 +575,19 @@ class PDFFileViewSet(viewsets.ModelViewSet):
     queryset = PDFFile.objects.all()
     serializer_class = PDFFileSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = FilePagination
+
+    def get_queryset(self):
+        queryset = PDFFile.objects.all()
+        lesson_id = self.request.query_params.get('lesson', None)
+        if lesson_id:
+            queryset = queryset.filter(lesson_id=lesson_id)
+        # ?drive_file=<file id or share link>, looked up through the drive_file_id index
+        drive_file = self.request.query_params.get('drive_file', None)
+        if drive_file:
+            file_id = drive.normalize(drive_file)
+            queryset = queryset.filter(drive_file_id=file_id) if file_id else queryset.none()
+        return queryset
 
 
 class GoogleLoginView(APIView):
@@ -143,64 +599,205 @@ class GoogleLoginView(APIView):
             return Response({'error': 'No token provided'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Verify token
-            idinfo = id_token.verify_oauth2_token(token, google_requests.Request())
-            
-            # Get user info
-            email = idinfo['email']
-            first_name = idinfo.get('given_name', '')
-            last_name = idinfo.get('family_name', '')
-            
-            # Get or create user
-            user, created = User.objects.get_or_create(username=email, defaults={
-                'email': email,
-                'first_name': first_name,
-                'last_name': last_name
-            })
-            
-            # Generate JWT
-            refresh = RefreshToken.for_user(user)
-            
-            return Response({
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-                'user': {
-                    'username': user.username,
-                    'email': user.email,
-                    'first_name': user.first_name,
-                    'last_name': user.last_name
-                }
-            })
+            # Verify token against the cached Google certificates
+            idinfo = verify_oauth2_token(
+                token, audience=getattr(settings, 'GOOGLE_OAUTH2_CLIENT_ID', None)
+            )
             
+            return Response(google_login_payload(idinfo))
+
         except ValueError as e:
             return Response({'error': f'Invalid token: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+class JWTRefreshView(TokenRefreshView):
+    """
+    POST /api/auth/token/refresh/
+    Body: {"refresh": "..."} -> {"access": "..."}
+    """
+    serializer_class = JWTRefreshSerializer
+
+
+class JWTRevokeView(APIView):
+    """
+    Log out a JWT session: revoke the refresh token and, when the request is
+    authenticated with a JWT, its access token too.
+    POST /api/auth/token/revoke/
+    Body: {"refresh": "..."}
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        try:
+            refresh = RefreshToken(request.data.get('refresh', ''))
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        revoke_token(refresh)
+        if isinstance(request.auth, AccessToken):
+            revoke_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def upsert_progress(user, entries):
+    """
+    Insert or update the user's progress for many lessons with one
+    INSERT ... ON CONFLICT (user, lesson) DO UPDATE statement.
+    `entries` are dicts with `lesson`, `is_completed` and optional `completed_at`;
+    when a lesson appears more than once the last entry wins. A lesson that
+    is already completed keeps its stored completed_at, so replaying a
+    completion does not move it (nor the daily completion rollup).
+    Returns the resulting UserProgress rows.
+    """
+    now = timezone.now()
+    rows = {}
+    for entry in entries:
+        is_completed = entry.get('is_completed', True)
+        completed_at = (entry.get('completed_at') or now) if is_completed else None
+        rows[entry['lesson']] = UserProgress(
+            user=user,
+            lesson_id=entry['lesson'],
+            is_completed=is_completed,
+            completed_at=completed_at,
+        )
+
+    with transaction.atomic():
+        stored = rollups.stored_progress(user, list(rows))
+        for lesson_id, progress in rows.items():
+            was_completed, stored_completed_at = stored.get(lesson_id, (False, None))
+            if progress.is_completed and was_completed and stored_completed_at is not None:
+                progress.completed_at = stored_completed_at
+        UserProgress.objects.bulk_create(
+            rows.values(),
+            update_conflicts=True,
+            unique_fields=['user', 'lesson'],
+            update_fields=['is_completed', 'completed_at', 'last_accessed'],
+        )
+        # bulk_create sends no signals, so the rollups are updated here
+        rollups.apply_changes([
+            (
+                rollups.row_state(lesson_id, *stored[lesson_id]) if lesson_id in stored else None,
+                rollups.instance_state(progress),
+            )
+            for lesson_id, progress in rows.items()
+        ])
+        return list(UserProgress.objects.filter(user=user, lesson_id__in=rows).order_by('lesson_id'))
+
+
 class UserProgressViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for the current user's lesson progress.
+    - GET /api/progress/ - List progress (optionally ?lesson={id})
+    - POST /api/progress/ - Record progress for one lesson
+    - POST /api/progress/batch/ - Record progress for many lessons at once
+    - POST /api/progress/touch/ - Heartbeat updating last_accessed (buffered)
+    - GET /api/progress/stats/ - Completion dashboard from the rollup tables (staff only)
+    - GET /api/progress/export/ - Streaming CSV/JSONL export of everyone's progress (staff only)
+    """
     permission_classes = [IsAuthenticated]
     serializer_class = UserProgressSerializer
-    
+
     def get_queryset(self):
-        return UserProgress.objects.filter(user=self.request.user)
-        
+        queryset = UserProgress.objects.filter(user=self.request.user)
+        lesson_id = self.request.query_params.get('lesson', None)
+        if lesson_id:
+            queryset = queryset.filter(lesson_id=lesson_id)
+        return queryset.order_by('lesson_id')
+
     def create(self, request, *args, **kwargs):
         lesson_id = request.data.get('lesson')
         is_completed = request.data.get('is_completed', True)
-        
+
         if not lesson_id:
-             return Response({'error': 'Lesson ID required'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'error': 'Lesson ID required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        progress, created = UserProgress.objects.update_or_create(
-            user=request.user,
-            lesson_id=lesson_id,
-            defaults={'is_completed': is_completed}
-        )
-        
+        batch = UserProgressBatchSerializer(data={'entries': [{
+            'lesson': lesson_id,
+            'is_completed': is_completed,
+            'completed_at': request.data.get('completed_at'),
+        }]})
+        batch.is_valid(raise_exception=True)
+
+        progress, = upsert_progress(request.user, batch.validated_data['entries'])
         serializer = self.get_serializer(progress)
         return Response(serializer.data)
 
-    def get_queryset(self):
-        lesson_id = self.request.query_params.get('lesson', None)
-        if lesson_id:
-            return PDFFile.objects.filter(lesson_id=lesson_id)
-        return PDFFile.objects.all()
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Record progress for many lessons in one transaction.
+        POST /api/progress/batch/
+        Body: {"entries": [{"lesson": 1, "is_completed": true, "completed_at": "..."}, ...]}
+        """
+        batch = UserProgressBatchSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        progress = upsert_progress(request.user, batch.validated_data['entries'])
+        serializer = self.get_serializer(progress, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def touch(self, request):
+        """
+        Mark a lesson as accessed now without writing to the database right away;
+        touches are coalesced and flushed in batches (see lessons/last_accessed.py).
+        Only updates an existing progress row.
+        POST /api/progress/touch/
+        Body: {"lesson": 1}
+        """
+        try:
+            lesson_id = int(request.data.get('lesson'))
+        except (TypeError, ValueError):
+            return Response({'error': 'Lesson ID required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        last_accessed_buffer.touch(request.user.pk, lesson_id, timezone.now())
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def stats(self, request):
+        """
+        Completion statistics read only from the rollup tables.
+        GET /api/progress/stats/?days=30
+        """
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 1), 366)
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        since = timezone.localdate() - timedelta(days=days - 1)
+        lessons = LessonProgressStats.objects.select_related('lesson').order_by('lesson__number')
+        daily = DailyCompletionStats.objects.filter(date__gte=since).order_by('date')
+        return Response({
+            'lessons': [
+                {
+                    'lesson': stats.lesson_id,
+                    'number': stats.lesson.number,
+                    'title': stats.lesson.title,
+                    'started': stats.started_count,
+                    'completed': stats.completed_count,
+                }
+                for stats in lessons
+            ],
+            'daily_completions': [
+                {'date': stats.date, 'completed': stats.completed_count}
+                for stats in daily
+            ],
+            # Counters of this server process only
+            'last_accessed_buffer': last_accessed_buffer.stats(),
+        })
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """
+        Stream every user's progress as CSV (default) or JSON Lines.
+        GET /api/progress/export/?output=jsonl&completed=true&date_from=2024-01-01&lesson_to=20
+        Filters: completed, date_field (last_accessed|completed_at), date_from, date_to,
+        lesson_from, lesson_to (see lessons/progress_export.py).
+        """
+        try:
+            export = progress_export.ProgressExport(
+                progress_export.parse_filters(request.query_params),
+                output=request.query_params.get('output', 'csv'),
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return progress_export.streaming_response(request, export)
@@ -1,20 +1,26 @@
 import React, { useState } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { CheckCircle, XCircle, HelpCircle, ChevronDown, ChevronUp } from 'lucide-react';
-import { Question, Choice } from '../types';
+import { Question, QuizQuestionResult } from '../types';
+import { lessonsAPI } from '../services/api';
 
 interface QuizSectionProps {
+  lessonId: string;
   questions: Question[];
   onComplete: (score: number) => void;
 }
 
-const QuizSection: React.FC<QuizSectionProps> = ({ questions, onComplete }) => {
+const QuizSection: React.FC<QuizSectionProps> = ({ lessonId, questions, onComplete }) => {
   const [userAnswers, setUserAnswers] = useState<Record<number, number[]>>({});
   const [isSubmitted, setIsSubmitted] = useState(false);
+  const [isSubmitting, setIsSubmitting] = useState(false);
+  const [submitError, setSubmitError] = useState<string | null>(null);
   const [score, setScore] = useState(0);
+  // Per-question grading returned by the server, keyed by question id
+  const [results, setResults] = useState<Record<number, QuizQuestionResult>>({});
 
   const handleSelectChoice = (questionId: number, choiceId: number) => {
-    if (isSubmitted) return;
+    if (isSubmitted || isSubmitting) return;
     setUserAnswers(prev => {
       const currentAnswers = prev[questionId] || [];
       const newAnswers = currentAnswers.includes(choiceId)
@@ -28,24 +34,26 @@ const QuizSection: React.FC<QuizSectionProps> = ({ questions, onComplete }) => {
     });
   };
 
-  const handleSubmit = () => {
-    let newScore = 0;
-    questions.forEach(q => {
-      const selectedChoiceIds = userAnswers[q.id] || [];
-      const correctChoiceIds = q.choices.filter(c => c.is_correct).map(c => c.id);
-      
-      // Check if arrays have same elements (ignoring order)
-      const isCorrect = 
-        selectedChoiceIds.length === correctChoiceIds.length &&
-        selectedChoiceIds.every(id => correctChoiceIds.includes(id));
-
-      if (isCorrect) {
-        newScore++;
-      }
-    });
-    setScore(newScore);
-    setIsSubmitted(true);
-    onComplete(newScore);
+  const handleSubmit = async () => {
+    // Correct answers are not part of the lesson payload; the server grades the quiz
+    setIsSubmitting(true);
+    setSubmitError(null);
+    try {
+      const result = await lessonsAPI.submitQuiz(lessonId, userAnswers);
+      const byQuestion: Record<number, QuizQuestionResult> = {};
+      result.results.forEach(r => {
+        byQuestion[r.question] = r;
+      });
+      setResults(byQuestion);
+      setScore(result.score);
+      setIsSubmitted(true);
+      onComplete(result.score);
+    } catch (err) {
+      setSubmitError(err instanceof Error ? err.message : 'فشل إرسال الإجابات');
+      console.error('Error submitting quiz:', err);
+    } finally {
+      setIsSubmitting(false);
+    }
   };
 
   const allAnswered = questions.every(q => (userAnswers[q.id]?.length || 0) > 0);
@@ -72,7 +80,7 @@ const QuizSection: React.FC<QuizSectionProps> = ({ questions, onComplete }) => {
             <div className="space-y-3">
               {question.choices.map((choice) => {
                 const isSelected = (userAnswers[question.id] || []).includes(choice.id);
-                const isCorrect = choice.is_correct;
+                const isCorrect = (results[question.id]?.correct_choices || []).includes(choice.id);
                 
                 let choiceClass = "w-full text-right p-4 rounded-xl border-2 transition-all duration-200 flex items-center justify-between group ";
                 
@@ -96,7 +104,7 @@ const QuizSection: React.FC<QuizSectionProps> = ({ questions, onComplete }) => {
                   <button
                     key={choice.id}
                     onClick={() => handleSelectChoice(question.id, choice.id)}
-                    disabled={isSubmitted}
+                    disabled={isSubmitted || isSubmitting}
                     className={choiceClass}
                   >
                     <span className="font-medium">{choice.text}</span>
@@ -113,17 +121,20 @@ const QuizSection: React.FC<QuizSectionProps> = ({ questions, onComplete }) => {
       </div>
 
       {!isSubmitted ? (
-        <div className="mt-8 flex justify-end">
+        <div className="mt-8 flex items-center justify-end gap-4">
+          {submitError && (
+            <p className="text-red-600 dark:text-red-400 text-sm">{submitError}</p>
+          )}
           <button
             onClick={handleSubmit}
-            disabled={!allAnswered}
+            disabled={!allAnswered || isSubmitting}
             className={`px-8 py-3 rounded-xl font-bold text-white transition-all ${
-              allAnswered 
+              allAnswered && !isSubmitting
                 ? 'bg-brand-blue hover:bg-brand-blue-dark shadow-lg hover:shadow-xl transform hover:-translate-y-1' 
                 : 'bg-gray-300 dark:bg-gray-700 cursor-not-allowed'
             }`}
           >
-            إرسال الإجابات
+            {isSubmitting ? 'جاري التصحيح...' : 'إرسال الإجابات'}
           </button>
         </div>
       ) : (
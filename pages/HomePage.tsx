@@ -40,7 +40,7 @@ const HomePage: React.FC<HomePageProps> = ({ searchTerm = '' }) => {
     const fetchLessons = async () => {
       try {
         setIsLoading(true);
-        const fetchedLessons = await lessonsAPI.getAll();
+        const fetchedLessons = await lessonsAPI.getSummaries();
         // Ensure stable sort by lesson number
         const sortedLessons = fetchedLessons.sort((a, b) => a.number - b.number);
         setLessons(sortedLessons);
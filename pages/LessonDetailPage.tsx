@@ -186,8 +186,10 @@ const LessonDetailPage: React.FC = () => {
                 </h3>
                 <div className="space-y-4">
                   {sortedAudioFiles.map((audioFile, index) => {
-                    // Use the audio streaming URL function for better compatibility
-                    const audioUrl = getGoogleDriveAudioStreamUrl(audioFile.google_drive_link);
+                    // Drive files are streamed through the server's caching proxy (seekable, no CORS issues)
+                    const audioUrl = audioFile.drive_file_id
+                      ? lessonsAPI.audioStreamUrl(audioFile.id)
+                      : getGoogleDriveAudioStreamUrl(audioFile.google_drive_link);
                     return (
                       <div key={audioFile.id} className="bg-brand-blue-light/30 dark:bg-gray-800/50 p-4 rounded-2xl border border-transparent dark:border-gray-700">
                         <AudioPlayer 
@@ -218,8 +220,13 @@ const LessonDetailPage: React.FC = () => {
               
               <div className="grid grid-cols-1 sm:grid-cols-2 gap-4">
                 {sortedPDFFiles.map((pdfFile) => {
-                  const downloadUrl = getGoogleDriveDownloadLink(pdfFile.google_drive_link);
-                  const viewUrl = convertGoogleDriveLink(pdfFile.google_drive_link, 'pdf');
+                  // Drive files are served by the server's caching proxy; parse the link only for older data
+                  const downloadUrl = pdfFile.drive_file_id
+                    ? lessonsAPI.pdfStreamUrl(pdfFile.id)
+                    : getGoogleDriveDownloadLink(pdfFile.google_drive_link);
+                  const viewUrl = pdfFile.drive_file_id
+                    ? lessonsAPI.pdfStreamUrl(pdfFile.id)
+                    : convertGoogleDriveLink(pdfFile.google_drive_link, 'pdf');
                   
                   return (
                     <a
@@ -258,9 +265,10 @@ const LessonDetailPage: React.FC = () => {
           {/* Quiz Section */}
           {lesson.questions && lesson.questions.length > 0 && (
             <QuizSection 
+              lessonId={String(lesson.id)}
               questions={lesson.questions} 
               onComplete={(score) => {
-                // Optional: You can save the score to the backend here if needed
+                // Attempts of logged-in users are recorded by the server when grading
                 console.log('Quiz completed with score:', score);
               }} 
             />
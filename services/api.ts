@@ -1,4 +1,4 @@
-import { Lesson, LessonAPIResponse, AudioFile, AudioFileAPIResponse, PDFFile, PDFFileAPIResponse } from '../types';
+import { Lesson, LessonAPIResponse, AudioFile, AudioFileAPIResponse, PDFFile, PDFFileAPIResponse, QuizResult } from '../types';
 
 // Use environment variable or default to relative path (works with Vite proxy)
 // In production, set VITE_API_URL to your API domain
@@ -15,6 +15,8 @@ const mapAudioFileFromAPI = (apiAudio: AudioFileAPIResponse): AudioFile => {
     id: apiAudio.id,
     title: apiAudio.title,
     google_drive_link: apiAudio.google_drive_link,
+    drive_file_id: apiAudio.drive_file_id,
+    stream_url: apiAudio.stream_url,
     order: apiAudio.order,
     created_at: apiAudio.created_at,
   };
@@ -25,6 +27,9 @@ const mapPDFFileFromAPI = (apiPDF: PDFFileAPIResponse): PDFFile => {
     id: apiPDF.id,
     title: apiPDF.title,
     google_drive_link: apiPDF.google_drive_link,
+    drive_file_id: apiPDF.drive_file_id,
+    stream_url: apiPDF.stream_url,
+    view_url: apiPDF.view_url,
     order: apiPDF.order,
     created_at: apiPDF.created_at,
   };
@@ -104,6 +109,9 @@ export const authAPI = {
   },
 };
 
+// Fields needed to render lesson cards; nested files, questions and FAQs are skipped
+const LESSON_SUMMARY_FIELDS = ['id', 'number', 'title', 'description', 'youtube_id', 'duration', 'thumbnail', 'is_active'];
+
 // Lessons API
 export const lessonsAPI = {
   // Get all lessons (public)
@@ -113,12 +121,29 @@ export const lessonsAPI = {
     return lessons.map(mapLessonFromAPI);
   },
 
+  // Get all lessons without nested content, for listings (public)
+  getSummaries: async (): Promise<Lesson[]> => {
+    const response = await apiRequest<{ results?: LessonAPIResponse[] } | LessonAPIResponse[]>(
+      `/lessons/?fields=${LESSON_SUMMARY_FIELDS.join(',')}`
+    );
+    const lessons = Array.isArray(response) ? response : (response.results || []);
+    return lessons.map(mapLessonFromAPI);
+  },
+
   // Get a single lesson by ID (public)
   getById: async (id: string): Promise<Lesson> => {
     const apiLesson = await apiRequest<LessonAPIResponse>(`/lessons/${id}/`);
     return mapLessonFromAPI(apiLesson);
   },
 
+  // Grade quiz answers on the server (public; attempts are recorded when logged in)
+  submitQuiz: async (lessonId: string, answers: Record<number, number[]>): Promise<QuizResult> => {
+    return apiRequest<QuizResult>(`/lessons/${lessonId}/submit_quiz/`, {
+      method: 'POST',
+      body: JSON.stringify({ answers }),
+    });
+  },
+
   // Create a new lesson (authenticated)
   create: async (lesson: Omit<Lesson, 'id' | 'created_at' | 'updated_at' | 'is_active' | 'audioFiles' | 'pdfFiles'>): Promise<Lesson> => {
     const apiLesson = await apiRequest<LessonAPIResponse>('/lessons/', {
@@ -192,6 +217,10 @@ export const lessonsAPI = {
     });
   },
 
+  // Audio/PDF content through the server's caching proxy (supports seeking)
+  audioStreamUrl: (audioFileId: number): string => `${API_BASE_URL}/audio-files/${audioFileId}/stream`,
+  pdfStreamUrl: (pdfFileId: number): string => `${API_BASE_URL}/pdf-files/${pdfFileId}/stream`,
+
   // Delete a lesson (authenticated)
   delete: async (id: string): Promise<void> => {
     await apiRequest(`/lessons/${id}/`, {
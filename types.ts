@@ -2,6 +2,9 @@ export interface AudioFile {
   id: number;
   title: string;
   google_drive_link: string;
+  // Extracted from the link by the server; empty/null for non-Drive links
+  drive_file_id?: string;
+  stream_url?: string | null;
   order: number;
   created_at: string;
 }
@@ -10,6 +13,9 @@ export interface PDFFile {
   id: number;
   title: string;
   google_drive_link: string;
+  drive_file_id?: string;
+  stream_url?: string | null;
+  view_url?: string | null;
   order: number;
   created_at: string;
 }
@@ -17,7 +23,6 @@ export interface PDFFile {
 export interface Choice {
   id: number;
   text: string;
-  is_correct: boolean;
   order: number;
 }
 
@@ -28,6 +33,20 @@ export interface Question {
   choices: Choice[];
 }
 
+// Quiz answers are graded by the server (POST /api/lessons/{id}/submit_quiz/)
+export interface QuizQuestionResult {
+  question: number;
+  correct: boolean;
+  // Only for questions that were answered
+  correct_choices?: number[];
+}
+
+export interface QuizResult {
+  score: number;
+  total: number;
+  results: QuizQuestionResult[];
+}
+
 export interface LessonFAQ {
   id: number;
   question: string;
@@ -57,6 +76,8 @@ export interface AudioFileAPIResponse {
   id: number;
   title: string;
   google_drive_link: string;
+  drive_file_id: string;
+  stream_url: string | null;
   order: number;
   created_at: string;
 }
@@ -65,6 +86,9 @@ export interface PDFFileAPIResponse {
   id: number;
   title: string;
   google_drive_link: string;
+  drive_file_id: string;
+  stream_url: string | null;
+  view_url: string | null;
   order: number;
   created_at: string;
 }
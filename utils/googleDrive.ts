@@ -4,6 +4,8 @@
 
 /**
  * Extracts file ID from various Google Drive URL formats
+ * The API already returns the extracted ID and ready-made URLs (drive_file_id,
+ * stream_url, view_url); this is only the fallback for data without them.
  */
 const extractFileId = (link: string): string => {
   if (!link) return '';
@@ -46,6 +48,15 @@ export const convertGoogleDriveLink = (link: string, type: 'audio' | 'pdf' = 'pd
   return `https://drive.google.com/uc?export=view&id=${fileId}`;
 };
 
+/**
+ * Wraps a URL in a CORS proxy
+ * This bypasses CORS restrictions for audio streaming
+ * If you host your own CORS proxy, replace corsproxy.io with your proxy URL
+ */
+const withCorsProxy = (url: string): string => {
+  return `https://corsproxy.io/?${encodeURIComponent(url)}`;
+};
+
 /**
  * Gets a direct streaming URL for Google Drive audio files
  * Uses multiple fallback methods to ensure audio plays
@@ -62,12 +73,7 @@ export const getGoogleDriveAudioStreamUrl = (link: string): string => {
   const directUrl = `https://drive.google.com/uc?export=download&id=${fileId}`;
   
   // Method 2: Use CORS proxy for better compatibility
-  // This bypasses CORS restrictions for audio streaming
-  const proxyUrl = `https://corsproxy.io/?${encodeURIComponent(directUrl)}`;
-  
-  // Return proxy URL for better compatibility
-  // If you host your own CORS proxy, replace corsproxy.io with your proxy URL
-  return proxyUrl;
+  return withCorsProxy(directUrl);
   
   // Alternative: Return direct URL if you've configured CORS on your server
   // return directUrl;